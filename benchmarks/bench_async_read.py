@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+bench_async_read.py
+
+chart reads of many codes with NumPy processing: sequential StockDB loop vs AsyncStockDB.as_completed.
+with config path, MariaDB is used, otherwise synthetic charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_async_read [config.json]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from benchmarks.bench_backend_read import make_db, fill_sqlite
+from kostock.asyncdb import AsyncStockDB
+from kostock.configurer import Configurer
+from kostock.dbpool import ConnectionPool
+
+IN_FLIGHT = (1, 2, 4, 8)
+
+
+def process(data):
+    closes = np.array([row[2] for row in data], dtype=np.float64)
+    return np.std(np.diff(np.log(closes)))
+
+
+def read_sequential(db, codes):
+    with db:
+        return [process(db.get_all_from_chart(code)) for code in codes]
+
+
+async def read_async(adb, codes):
+    return [process(data) async for _, data in adb.as_completed('get_all_from_chart', [(code,) for code in codes])]
+
+
+def bench(db, codes):
+    start = timeit.default_timer()
+    read_sequential(db, codes)
+    print(f"{'sequential':<20}: {timeit.default_timer() - start:8.3f} sec")
+    for max_in_flight in IN_FLIGHT:
+        db.set_pool(ConnectionPool(db._backend.connect, max_size=max_in_flight))
+        adb = AsyncStockDB(db, max_in_flight=max_in_flight)
+        start = timeit.default_timer()
+        asyncio.run(read_async(adb, codes))
+        print(f"{f'async (in flight {max_in_flight})':<20}: {timeit.default_timer() - start:8.3f} sec")
+        adb.close()
+        db._pool.close_all()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        Configurer(sys.argv[1])
+        db = make_db(Configurer.DB)
+        with db:
+            codes = db.get_code_list_from_sinfo()
+        bench(db, codes)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+            bench(db, fill_sqlite(db))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+bench_backend_read.py
+
+main StockDB read paths in SQLite backend vs MariaDB backend.
+with config path, charts of NUMBER_OF_CODES companies are copied from MariaDB into a temporary SQLite file.
+without config path, only SQLite backend is measured with synthetic charts.
+usage: python -m benchmarks.bench_backend_read [config.json]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from kostock._pattern import Singleton
+from kostock.configurer import Configurer
+from kostock.stockdb import StockDB
+
+NUMBER_OF_CODES = 50
+NUMBER_OF_CHART_DAYS = 5000
+REPEAT = 3
+
+
+def make_db(config):
+    config_, instance = Configurer.DB, Singleton._instances.pop(StockDB, None)
+    Configurer.DB = config
+    try:
+        db = StockDB()
+    finally:
+        Configurer.DB = config_
+        Singleton._instances.pop(StockDB, None)
+        if instance is not None:
+            Singleton._instances[StockDB] = instance
+    return db
+
+
+def fill_sqlite(sqlite_db, mariadb=None):
+    index = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS)
+    codes = [f"{i:06d}" for i in range(NUMBER_OF_CODES)]
+    if mariadb is not None:
+        with mariadb:
+            codes = mariadb.get_code_list_from_sinfo()[:NUMBER_OF_CODES]
+            charts = {code: mariadb.get_all_from_chart(code) for code in codes}
+    with sqlite_db:
+        for code in codes:
+            if mariadb is not None:
+                df = pd.DataFrame(data=list(charts[code]), columns=('date', 'open', 'close', 'high', 'low',
+                                                                    'volume_q', 'fore', 'inst', 'indi'))
+                df = df.set_index(pd.DatetimeIndex(df['date'])).fillna(0)
+            else:
+                data = np.random.randint(1000, 100000, size=(NUMBER_OF_CHART_DAYS, 8))
+                df = pd.DataFrame(data=data, index=index, columns=('open', 'close', 'high', 'low',
+                                                                   'volume_q', 'fore', 'inst', 'indi'))
+            sqlite_db.create_chart_schema(code)
+            sqlite_db.upsert_ohlc_df_into_chart(code, df, batch_size=10000)
+            sqlite_db.upsert_investor_df_into_chart(code, df, batch_size=10000)
+    return codes
+
+
+def bench(db, codes):
+    start_date, end_date = datetime.date(2005, 1, 1), datetime.date(2010, 12, 31)
+    paths = {'get_all_from_chart': lambda code: db.get_all_from_chart(code),
+             'get_range_from_chart': lambda code: db.get_range_from_chart(code, start_date, end_date),
+             'get_ohlc_prev_from_chart': lambda code: db.get_ohlc_prev_from_chart(code, end_date, 60),
+             'get_future_price_list': lambda code: db.get_future_price_list(code, start_date, 130)}
+    result = {}
+    with db:
+        for name, path in paths.items():
+            elapsed = timeit.repeat(lambda: [path(code) for code in codes], number=1, repeat=REPEAT)
+            result[name] = min(elapsed) / len(codes)
+    return result
+
+
+if __name__ == '__main__':
+    mariadb = None
+    if len(sys.argv) > 1:
+        Configurer(sys.argv[1])
+        mariadb = make_db(Configurer.DB)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sqlite_db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_sqlite(sqlite_db, mariadb)
+        results = {'sqlite': bench(sqlite_db, codes)}
+        if mariadb is not None:
+            results['mariadb'] = bench(mariadb, codes)
+        sqlite_db._pool.close_all()
+
+    print(f"{'read path (ms/call)':<26}" + ''.join(f"{name:>10}" for name in results))
+    for path in results['sqlite']:
+        print(f"{path:<26}" + ''.join(f"{result[path] * 1000:>10.3f}" for result in results.values()))
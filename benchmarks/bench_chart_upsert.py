@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+bench_chart_upsert.py
+
+rows/sec of chart ingestion: per-row insert_ohlc_into_chart vs upsert_ohlc_df_into_chart.
+SQLite backend in a temporary file is used as a stand-in of MariaDB.
+usage: python -m benchmarks.bench_chart_upsert
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db as make_stockdb
+
+NUMBER_OF_ROWS = 20000
+BATCH_SIZES = (100, 1000, 10000)
+
+
+def make_ohlc_df(number_of_rows):
+    index = pd.date_range('1990-01-01', periods=number_of_rows, freq='D')
+    data = np.random.randint(1000, 100000, size=(number_of_rows, 6))
+    return pd.DataFrame(data=data, index=index, columns=('open', 'close', 'high', 'low', 'volume_q', 'volume_p'))
+
+
+def make_db(tmp_dir, name):
+    db = make_stockdb({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, name + '.db')})
+    db.create_chart_schema('000000')
+    return db
+
+
+def bench_row_insert(df, tmp_dir):
+    db = make_db(tmp_dir, 'row')
+    start = timeit.default_timer()
+    for row in df.itertuples():
+        db.insert_ohlc_into_chart('000000', getattr(row, 'Index'), getattr(row, 'open'),
+                                  getattr(row, 'close'), getattr(row, 'high'),
+                                  getattr(row, 'low'), getattr(row, 'volume_q'))
+    db.commit()
+    return timeit.default_timer() - start
+
+
+def bench_df_upsert(df, batch_size, tmp_dir):
+    db = make_db(tmp_dir, f"batch{batch_size}")
+    start = timeit.default_timer()
+    db.upsert_ohlc_df_into_chart('000000', df, batch_size)
+    return timeit.default_timer() - start
+
+
+if __name__ == '__main__':
+    df = make_ohlc_df(NUMBER_OF_ROWS)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        elapsed = bench_row_insert(df, tmp_dir)
+        print(f"{'row insert':<24}: {NUMBER_OF_ROWS / elapsed:>12,.0f} rows/sec")
+        for batch_size in BATCH_SIZES:
+            elapsed = bench_df_upsert(df, batch_size, tmp_dir)
+            print(f"{f'df upsert (batch {batch_size})':<24}: {NUMBER_OF_ROWS / elapsed:>12,.0f} rows/sec")
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+bench_coarse.py
+
+frechet pattern scan with long windows: full resolution only vs coarse-to-fine (coarse factor 2, 4, 8).
+window counts of each stage show how many windows the coarse bounds reject or accept before the full table.
+each scan uses the default threshold of ChartExtractor.capture_chart_pattern.
+synthetic random walk charts.
+usage: python -m benchmarks.bench_coarse
+"""
+import timeit
+
+from benchmarks.bench_pattern_scan import make_charts, NUMBER_OF_CODES, PATTERN
+from kostock.chart_extractor import ChartExtractor
+from kostock.patternscan import scan_chart_pattern
+
+WINDOW_SIZES = (120, 250)
+COARSE_FACTORS = (None, 2, 4, 8)
+
+
+def scan(charts, window_size, coarse, stats):
+    fr_pat = ChartExtractor._get_frpat(tuple(PATTERN), window_size)
+    threshold = ChartExtractor._get_default_threshold(PATTERN, window_size)
+    return [scan_chart_pattern(chart.to_numpy(), PATTERN, fr_pat, window_size, window_size // 10, threshold,
+                               stats=stats, coarse=coarse).tolist() for chart in charts]
+
+
+if __name__ == '__main__':
+    charts = make_charts()
+    for coarse in COARSE_FACTORS:
+        scan(charts[:1], WINDOW_SIZES[0], coarse, None)  # compile
+
+    for window_size in WINDOW_SIZES:
+        results = {}
+        for coarse in COARSE_FACTORS:
+            stats = {}
+            start = timeit.default_timer()
+            results[coarse] = scan(charts, window_size, coarse, stats)
+            elapsed = timeit.default_timer() - start
+            print(f"window {window_size} coarse {str(coarse):<4}: {elapsed:8.3f} sec "
+                  f"({elapsed / NUMBER_OF_CODES * 1000:8.2f} ms/code) | {stats['windows']} windows, "
+                  f"bounds pruned {stats['endpoint_pruned'] + stats['envelope_pruned']}, "
+                  f"coarse pruned {stats['coarse_pruned']}, coarse matched {stats['coarse_matched']}, "
+                  f"full table {stats['evaluated']}, matched {stats['matched']}")
+            assert results[coarse] == results[None]
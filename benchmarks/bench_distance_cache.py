@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+bench_distance_cache.py
+
+threshold sweep of one pattern over all charts: capture_chart_pattern for each threshold
+vs ChartExtractor.sweep_chart_pattern with DistanceCache (distances once, then walks of cached arrays).
+synthetic random walk charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_distance_cache
+"""
+import os
+import tempfile
+import timeit
+
+from benchmarks.bench_backend_read import make_db
+from benchmarks.bench_pattern_index import fill_db, NUMBER_OF_CODES, WINDOW_SIZE, WINDOW_MOVE
+from kostock.chart_extractor import ChartExtractor
+from kostock.distcache import DistanceCache
+
+PATTERN = [1, 3, 2, 5, 4]
+THRESHOLDS = [0.5 * i for i in range(1, 21)]
+
+
+def sweep_by_scan(db, codes):
+    return [sum(len(ChartExtractor.capture_chart_pattern(code, PATTERN, db, threshold, WINDOW_SIZE, WINDOW_MOVE))
+                for code in codes) for threshold in THRESHOLDS]
+
+
+def sweep_by_cache(db, codes, cache):
+    return ChartExtractor.sweep_chart_pattern(db, codes, PATTERN, THRESHOLDS, cache, WINDOW_SIZE, WINDOW_MOVE)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_db(db)
+        sweep_by_scan(db, codes[:1])  # numba compile
+        sweep_by_cache(db, codes[:1], DistanceCache())
+
+        start = timeit.default_timer()
+        answer = sweep_by_scan(db, codes)
+        scan_time = timeit.default_timer() - start
+
+        cache = DistanceCache(os.path.join(tmp_dir, 'cache'))
+        start = timeit.default_timer()
+        counts = sweep_by_cache(db, codes, cache)
+        cache.save()
+        build_time = timeit.default_timer() - start
+        assert counts == answer
+
+        start = timeit.default_timer()
+        counts = sweep_by_cache(db, codes, DistanceCache(cache.path))
+        cached_time = timeit.default_timer() - start
+        assert counts == answer
+
+        print(f"{len(THRESHOLDS)} thresholds, {NUMBER_OF_CODES} codes, window {WINDOW_SIZE}/{WINDOW_MOVE}")
+        print(f"scan per threshold     : {scan_time:8.3f} sec")
+        print(f"cache build + sweep    : {build_time:8.3f} sec")
+        print(f"sweep from saved cache : {cached_time:8.3f} sec "
+              f"({cached_time / len(THRESHOLDS) * 1000:.1f} ms/threshold)")
+        db._pool.close_all()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+bench_dtw.py
+
+windows/sec of the compiled pattern scan by measure: frechet vs dtw (Sakoe-Chiba band),
+without and with lower bound pruning (frechet: endpoint + envelope, dtw: LB_Kim + LB_Keogh + early abandon).
+each measure uses its default threshold of ChartExtractor.capture_chart_pattern (similar number of matches).
+synthetic random walk charts.
+usage: python -m benchmarks.bench_dtw
+"""
+import timeit
+
+from benchmarks.bench_pattern_scan import make_charts, NUMBER_OF_CODES, PATTERN, WINDOW_SIZE
+from kostock.chart_extractor import ChartExtractor
+from kostock.patternscan import scan_chart_pattern
+
+BAND = WINDOW_SIZE // 10
+WINDOW_MOVE = 1  # every window
+
+
+def scan(charts, measure, prune, stats):
+    fr_pat = ChartExtractor._get_frpat(tuple(PATTERN), WINDOW_SIZE)
+    threshold = ChartExtractor._get_default_threshold(PATTERN, WINDOW_SIZE, measure)
+    return [scan_chart_pattern(chart.to_numpy(), PATTERN, fr_pat, WINDOW_SIZE, WINDOW_MOVE, threshold,
+                               prune=prune, stats=stats, measure=measure, band=BAND).tolist() for chart in charts]
+
+
+if __name__ == '__main__':
+    charts = make_charts()
+    for measure in ('frechet', 'dtw'):
+        scan(charts[:1], measure, True, None)  # compile
+
+    for measure in ('frechet', 'dtw'):
+        results = {}
+        for prune in (False, True):
+            stats = {}
+            start = timeit.default_timer()
+            results[prune] = scan(charts, measure, prune, stats)
+            elapsed = timeit.default_timer() - start
+            print(f"{measure:<7} {'prune' if prune else 'full':<5}: {elapsed:8.3f} sec "
+                  f"({stats['windows'] / elapsed:12,.0f} windows/sec, {stats['evaluated']} of {stats['windows']} "
+                  f"evaluated, {stats['matched']} matched, {NUMBER_OF_CODES} codes)")
+        assert results[False] == results[True]
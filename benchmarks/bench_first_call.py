@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+bench_first_call.py
+
+first-call latency of numba kernels in a new process (like every PatternPool worker):
+cold (empty numba cache, kernels are compiled) vs warm (compiled code is loaded from the disk cache).
+each case runs in a new interpreter with its own NUMBA_CACHE_DIR.
+usage: python -m benchmarks.bench_first_call
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import json, timeit
+start = timeit.default_timer()
+from kostock.kernels import warmup
+elapsed = {'import': timeit.default_timer() - start}
+elapsed.update(warmup())
+print(json.dumps(elapsed))
+"""
+
+
+def run_child(cache_dir):
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    out = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results = {'cold (compile)': run_child(cache_dir), 'warm (disk cache)': run_child(cache_dir)}
+    names = list(results['cold (compile)'])
+    print(f"{'':<18}" + ''.join(f"{name:>14}" for name in names) + f"{'total':>10}")
+    for case, elapsed in results.items():
+        print(f"{case:<18}" + ''.join(f"{elapsed[name]:13.3f}s" for name in names)
+              + f"{sum(elapsed.values()):9.3f}s")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+bench_frdist.py
+
+frdist regression benchmark (former tests/test_frdist5): 5000 calls of 80 point curves.
+recursive full-table kernel (before) vs row-by-row kernel without and with threshold.
+usage: python -m benchmarks.bench_frdist
+"""
+import math
+import timeit
+
+import numpy as np
+from numba import jit
+
+from kostock.frechetdist import frdist
+
+N = 80
+NUMBER_OF_CALLS = 5000
+
+
+@jit(nopython=True)
+def _c(ca, i, j, p, q):
+    # recursive kernel before the row-by-row kernel
+    if ca[i, j] > -1:
+        return ca[i, j]
+    elif i == 0 and j == 0:
+        ca[i, j] = np.linalg.norm(p[i]-q[j])
+    elif i > 0 and j == 0:
+        ca[i, j] = max(_c(ca, i-1, 0, p, q), np.linalg.norm(p[i]-q[j]))
+    elif i == 0 and j > 0:
+        ca[i, j] = max(_c(ca, 0, j-1, p, q), np.linalg.norm(p[i]-q[j]))
+    elif i > 0 and j > 0:
+        ca[i, j] = max(min(_c(ca, i-1, j, p, q), _c(ca, i-1, j-1, p, q), _c(ca, i, j-1, p, q)),
+                       np.linalg.norm(p[i]-q[j]))
+    else:
+        ca[i, j] = math.inf
+    return ca[i, j]
+
+
+def recursive_frdist(p, q):
+    p = np.array(p, np.float64)
+    q = np.array(q, np.float64)
+    ca = (np.ones((len(p), len(q)), dtype=np.float64) * -1)
+    return _c(ca, len(p)-1, len(q)-1, p, q)
+
+
+def bench(func):
+    P = [[i, i] for i in range(N)]
+    Q = [[N+i, N+i] for i in range(N)]
+    func(P, Q)  # compile
+    start = timeit.default_timer()
+    for _ in range(NUMBER_OF_CALLS):
+        func(P, Q)
+    return timeit.default_timer() - start
+
+
+if __name__ == '__main__':
+    results = [('recursive', bench(recursive_frdist)),
+               ('rolling rows', bench(frdist)),
+               ('rolling rows, threshold', bench(lambda p, q: frdist(p, q, threshold=N / 2)))]
+    for name, elapsed in results:
+        print(f"{name:<24}: {elapsed:8.3f} sec ({elapsed / NUMBER_OF_CALLS * 1e6:8.1f} us/call)")
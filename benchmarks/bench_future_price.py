@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+bench_future_price.py
+
+BackTester.back_test price fetching: get_future_price_list per entry vs get_future_price_matrix.
+ChartStore with synthetic charts is used, so only the fetch pattern is compared.
+usage: python -m benchmarks.bench_future_price
+"""
+import datetime
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from kostock.chartstore import ChartStore
+
+NUMBER_OF_CODES = 200
+NUMBER_OF_CHART_DAYS = 5000
+NUMBER_OF_ENTRIES = (1000, 10000, 100000)
+NUMBER_OF_DAYS = 130
+
+
+def make_store(path):
+    store = ChartStore()
+    store.set_path(path)
+    index = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS)
+    with store:
+        for i in range(NUMBER_OF_CODES):
+            data = np.random.randint(1000, 100000, size=(NUMBER_OF_CHART_DAYS, 5))
+            df = pd.DataFrame(data=data, index=index, columns=('open', 'close', 'high', 'low', 'volume_q'))
+            store.create_chart_schema(f"{i:06d}")
+            store.upsert_ohlc_df_into_chart(f"{i:06d}", df)
+    return store, index
+
+
+def make_entries(index, number_of_entries):
+    codes = np.random.randint(0, NUMBER_OF_CODES, size=number_of_entries)
+    dates = np.random.choice(index, size=number_of_entries)
+    return [(f"{code:06d}", pd.Timestamp(date).date()) for code, date in zip(codes, dates)]
+
+
+def bench_list(store, entries):
+    start = timeit.default_timer()
+    prices = [store.get_future_price_list(code, date, NUMBER_OF_DAYS) for code, date in entries]
+    return timeit.default_timer() - start, np.array(prices, dtype=np.float64)
+
+
+def bench_matrix(store, entries):
+    start = timeit.default_timer()
+    prices = store.get_future_price_matrix(entries, NUMBER_OF_DAYS)
+    return timeit.default_timer() - start, prices
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as path:
+        store, index = make_store(path)
+        for number_of_entries in NUMBER_OF_ENTRIES:
+            entries = make_entries(index, number_of_entries)
+            list_time, list_prices = bench_list(store, entries)
+            matrix_time, matrix_prices = bench_matrix(store, entries)
+            assert np.array_equal(list_prices, matrix_prices, equal_nan=True)
+            print(f"entries {number_of_entries:>7,} : list {list_time:8.3f}s / matrix {matrix_time:8.3f}s "
+                  f"/ speedup x{list_time / matrix_time:.1f}")
+        store.close()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+bench_import.py
+
+import time of each public kostock module in a new interpreter (like a worker process or a short CLI call)
+and heavy dependencies loaded by the import.
+plotting, html, Qt, SQLAlchemy and crawling packages must be loaded only when they are first used.
+usage: python -m benchmarks.bench_import
+"""
+import json
+import subprocess
+import sys
+
+MODULES = ('stockdb', 'asyncdb', 'chartstore', 'qutils', 'logs', 'backtester', 'update', 'chart_extractor',
+           'patternpool', 'patternindex', 'screener', 'flowscan', 'kiwoom', 'plot', 'html_generator')
+HEAVY = ('pandas', 'numba', 'sqlalchemy', 'matplotlib', 'mplfinance', 'jinja2', 'MySQLdb', 'PyQt5', 'bs4', 'tqdm',
+         'requests')
+REPEAT = 5
+
+CHILD = """
+import json, sys, timeit
+start = timeit.default_timer()
+try:
+    import kostock.{module}
+    error = None
+except ImportError as e:
+    error = e.name
+elapsed = timeit.default_timer() - start
+print(json.dumps([elapsed, error, [name for name in {heavy} if name in sys.modules]]))
+"""
+
+
+def time_import(module):
+    """
+    :return: [tuple] (best seconds of REPEAT new interpreters, missing package or None, loaded heavy packages)
+    """
+    results = []
+    for _ in range(REPEAT):
+        out = subprocess.run([sys.executable, '-c', CHILD.format(module=module, heavy=HEAVY)],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(elapsed for elapsed, _, _ in results), results[0][1], results[0][2]
+
+
+if __name__ == '__main__':
+    print(f"{'module':<18}{'import':>10}  loaded")
+    for module in MODULES:
+        elapsed, missing, loaded = time_import(module)
+        note = f"  (stops at missing '{missing}')" if missing else ''
+        print(f"{module:<18}{elapsed * 1000:8.1f}ms  {', '.join(loaded) or '-'}{note}")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+bench_inst_cond.py
+
+investor flow screening of the whole market over the full history:
+former row loop per code vs capture_inst_cond per code vs capture_inst_cond_market (one call on the market panel).
+synthetic charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_inst_cond
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+from kostock.chart_extractor import ChartExtractor
+
+NUMBER_OF_CODES = 200
+NUMBER_OF_CHART_DAYS = 5000
+TH_FORE, TH_INST, DAYS = 1000, 1000, 3
+
+
+def fill_db(db):
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS)
+    codes = [f"{i:06d}" for i in range(NUMBER_OF_CODES)]
+    with db:
+        db.create_meta_schema()
+        for code in codes:
+            df = pd.DataFrame({'open': 1000, 'close': 1000, 'high': 1000, 'low': 1000, 'volume_q': 10,
+                               'fore': rng.integers(-3000, 6000, size=len(index)),
+                               'inst': rng.integers(-3000, 6000, size=len(index)), 'indi': 0}, index=index)
+            db.create_chart_schema(code)
+            db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 3))
+            db.upsert_ohlc_df_into_chart(code, df, batch_size=10000)
+            db.upsert_investor_df_into_chart(code, df, batch_size=10000)
+            db.update_chart_date_in_meta(code, index[-1].date())
+        db.commit()
+    return codes
+
+
+def capture_by_loop(db, code):
+    # row loop of capture_inst_cond before the vectorized condition ('BOTH' mode)
+    with db:
+        chart = db.get_all_from_chart(code)
+    captured = []
+    day_cnt = 0
+    for c in chart:
+        date, fore, inst = c[0], c[6], c[7]
+        day_cnt = day_cnt + 1 if fore and inst and fore >= TH_FORE and inst >= TH_INST else 0
+        if day_cnt == DAYS:
+            captured.append([code, date, '1'])
+    return captured
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+        codes = fill_db(db)
+        start = timeit.default_timer()
+        with db:
+            db.refresh_market_panel()
+        print(f"market panel build  : {timeit.default_timer() - start:8.3f} sec (once, refreshed by Update)")
+        ChartExtractor.capture_inst_cond_market(db, TH_FORE, TH_INST, DAYS, codes=codes[:1])  # compile
+
+        results = {}
+        for name, capture in (
+                ('row loop per code', lambda: [row for code in codes for row in capture_by_loop(db, code)]),
+                ('vectorized per code', lambda: [row for code in codes for row in ChartExtractor.capture_inst_cond(
+                    db, code, TH_FORE, TH_INST, DAYS)]),
+                ('market at once', lambda: ChartExtractor.capture_inst_cond_market(db, TH_FORE, TH_INST, DAYS))):
+            start = timeit.default_timer()
+            results[name] = capture()
+            print(f"{name:<20}: {timeit.default_timer() - start:8.3f} sec ({len(results[name])} captured, "
+                  f"{NUMBER_OF_CODES} codes x {NUMBER_OF_CHART_DAYS} days)")
+        assert results['row loop per code'] == results['vectorized per code'] == results['market at once']
+        db._pool.close_all()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+bench_market_panel.py
+
+whole-market close price matrix: get_all_from_chart for every code and DataFrame merge
+vs memory-mapped market panel (first build, incremental refresh and load).
+synthetic charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_market_panel
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+
+NUMBER_OF_CODES = 300
+NUMBER_OF_CHART_DAYS = 2500
+
+
+def fill_db(db):
+    index = pd.bdate_range('2005-01-03', periods=NUMBER_OF_CHART_DAYS)
+    with db:
+        db.create_meta_schema()
+        for i in range(NUMBER_OF_CODES):
+            code = f"{i:06d}"
+            data = np.random.randint(1000, 100000, size=(NUMBER_OF_CHART_DAYS, 8))
+            df = pd.DataFrame(data=data, index=index, columns=('open', 'close', 'high', 'low',
+                                                               'volume_q', 'fore', 'inst', 'indi'))
+            db.create_chart_schema(code)
+            db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 1))
+            db.upsert_ohlc_df_into_chart(code, df, batch_size=10000)
+            db.upsert_investor_df_into_chart(code, df, batch_size=10000)
+            db.update_chart_date_in_meta(code, index[-1].date())
+        db.commit()
+    return index[-1].date()
+
+
+def merge_charts(db):
+    closes = {}
+    for code in sorted(table_name[2:] for table_name, _, _ in db.get_chart_from_meta()):
+        data = db.get_all_from_chart(code)
+        closes[code] = pd.Series([row[2] for row in data], index=pd.DatetimeIndex([row[0] for row in data]))
+    return pd.DataFrame(closes).astype(np.float32)
+
+
+def add_one_day(db, last_date):
+    date = last_date + datetime.timedelta(days=1)
+    for i in range(NUMBER_OF_CODES):
+        code = f"{i:06d}"
+        db.insert_ohlc_into_chart(code, date, 1, 2, 3, 4, 5)
+        db.update_chart_date_in_meta(code, date)
+    db.commit()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+        last_date = fill_db(db)
+        with db:
+            start = timeit.default_timer()
+            df = merge_charts(db)
+            merge_time = timeit.default_timer() - start
+
+            start = timeit.default_timer()
+            db.refresh_market_panel(rebuild=True)
+            build_time = timeit.default_timer() - start
+
+            add_one_day(db, last_date)
+            start = timeit.default_timer()
+            db.refresh_market_panel()
+            refresh_time = timeit.default_timer() - start
+
+            db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))  # drop opened memory maps
+            start = timeit.default_timer()
+            dates, codes, panel = db.get_market_panel(('close',))
+            np.nanmean(panel['close'], axis=0)
+            load_time = timeit.default_timer() - start
+        db._pool.close_all()
+
+    print(f"{NUMBER_OF_CODES} codes x {NUMBER_OF_CHART_DAYS} days, matrix {df.shape} -> {panel['close'].shape}")
+    print(f"merge get_all_from_chart : {merge_time * 1000:10.1f} ms")
+    print(f"panel build              : {build_time * 1000:10.1f} ms")
+    print(f"panel refresh (1 day)    : {refresh_time * 1000:10.1f} ms")
+    print(f"panel load + mean        : {load_time * 1000:10.1f} ms")
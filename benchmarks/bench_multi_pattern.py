@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+bench_multi_pattern.py
+
+pattern catalogue against many companies: capture_chart_pattern once per pattern
+(chart is read and normalized for every pattern) vs capture_chart_patterns (once for all patterns).
+synthetic random walk charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_multi_pattern
+"""
+import os
+import tempfile
+import timeit
+
+from benchmarks.bench_backend_read import make_db
+from benchmarks.bench_pattern_index import fill_db, NUMBER_OF_CODES
+from kostock.chart_extractor import ChartExtractor
+
+PATTERNS = ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], [5, 1, 5], [5, 1, 5, 1, 5], [1, 3, 2, 5, 4], [10, 1],
+            [1, 5, 1], [3, 1, 2, 1, 5], [1, 1, 5, 5], [5, 5, 1, 1], [2, 1, 4, 3, 6, 5])
+THRESHOLDS = [3] * len(PATTERNS)
+GROUPS = [f"p{i}" for i in range(len(PATTERNS))]
+WINDOW_SIZE = 60
+WINDOW_MOVE = 6
+
+
+def capture_each(db, codes):
+    captured = []
+    for pattern, threshold, group in zip(PATTERNS, THRESHOLDS, GROUPS):
+        for code in codes:
+            captured.extend(ChartExtractor.capture_chart_pattern(code, pattern, db, threshold, WINDOW_SIZE,
+                                                                 WINDOW_MOVE, group))
+    return captured
+
+
+def capture_once(db, codes):
+    captured = []
+    for code in codes:
+        captured.extend(ChartExtractor.capture_chart_patterns(code, PATTERNS, db, THRESHOLDS, WINDOW_SIZE,
+                                                              WINDOW_MOVE, GROUPS))
+    return captured
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_db(db)
+        capture_once(db, codes[:1])  # compile
+
+        results = {}
+        for name, capture in (('pattern by pattern', capture_each), ('single pass', capture_once)):
+            start = timeit.default_timer()
+            results[name] = capture(db, codes)
+            elapsed = timeit.default_timer() - start
+            print(f"{name:<18}: {elapsed:8.3f} sec ({elapsed / NUMBER_OF_CODES * 1000:8.2f} ms/code, "
+                  f"{len(PATTERNS)} patterns)")
+        key = lambda row: (row[2], row[0], row[1])
+        assert sorted(results['pattern by pattern'], key=key) == sorted(results['single pass'], key=key)
+        db._pool.close_all()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+bench_pattern_index.py
+
+ChartExtractor.capture_chart_pattern of many companies: full scan (every chart is read and scanned)
+vs PatternIndex query (only charts with candidate windows are read, only candidate windows are tested).
+synthetic random walk charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_pattern_index
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+from kostock.chart_extractor import ChartExtractor
+from kostock.patternindex import PatternIndex
+
+NUMBER_OF_CODES = 50
+NUMBER_OF_CHART_DAYS = 5000
+PATTERNS = ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], [5, 1, 5, 1, 5], [1, 3, 2, 5, 4])
+WINDOW_SIZE = 60
+WINDOW_MOVE = 6
+
+
+def fill_db(db):
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS)
+    codes = [f"{i:06d}" for i in range(NUMBER_OF_CODES)]
+    with db:
+        db.create_meta_schema()
+        for code in codes:
+            close = np.round(10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=NUMBER_OF_CHART_DAYS))))
+            df = pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume_q': 1000},
+                              index=index)
+            db.create_chart_schema(code)
+            db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 3))
+            db.upsert_ohlc_df_into_chart(code, df, batch_size=10000)
+            db.update_chart_date_in_meta(code, index[-1].date())
+        db.commit()
+    return codes
+
+
+def capture_all(db, codes, pattern, threshold, index=None):
+    stats = {}
+    captured = [ChartExtractor.capture_chart_pattern(code, pattern, db, threshold=threshold, window_size=WINDOW_SIZE,
+                                                     window_move=WINDOW_MOVE, index=index, stats=stats)
+                for code in codes]
+    return captured, stats
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_db(db)
+        index = PatternIndex(os.path.join(tmp_dir, 'index'), window_size=WINDOW_SIZE, window_move=WINDOW_MOVE)
+        start = timeit.default_timer()
+        index.refresh(db)
+        print(f"index build        : {timeit.default_timer() - start:8.3f} sec ({NUMBER_OF_CODES} codes)")
+        capture_all(db, codes[:1], PATTERNS[0], 1, index)  # compile
+
+        for pattern in PATTERNS:
+            for threshold in (1, 3, (WINDOW_SIZE * (max(pattern) - min(pattern))) / 200):
+                print(f"pattern {pattern}, threshold {threshold}")
+                results = {}
+                for name, query_index in (('full scan', None), ('index query', index)):
+                    start = timeit.default_timer()
+                    results[name], stats = capture_all(db, codes, pattern, threshold, query_index)
+                    elapsed = timeit.default_timer() - start
+                    print(f"  {name:<17}: {elapsed:8.3f} sec ({elapsed / NUMBER_OF_CODES * 1000:8.2f} ms/code), "
+                          f"index_pruned {stats['index_pruned']}/{stats['windows']}, matched {stats['matched']}")
+                assert results['full scan'] == results['index query']
+        db._pool.close_all()
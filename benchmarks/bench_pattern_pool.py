@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+bench_pattern_pool.py
+
+capture of a pattern catalogue over many companies in 1, 2, 4, 8 and 16 processes.
+per-call pool: new Pool for the call, StockDB pickled into every task, every chart read in workers (former mp path).
+PatternPool: workers read their share of charts in parallel at startup into one memory-mapped file,
+then persistent workers get (code, offset, length) tasks. startup includes worker spawn, kernel warmup and chart read.
+warm query time is the mean of repeated queries after the first (numba compile) query.
+synthetic random walk charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_pattern_pool
+"""
+import os
+import tempfile
+import timeit
+from multiprocessing import Pool
+
+from benchmarks.bench_backend_read import make_db
+from benchmarks.bench_multi_pattern import PATTERNS, THRESHOLDS, GROUPS, WINDOW_SIZE, WINDOW_MOVE
+from benchmarks.bench_pattern_index import fill_db
+from kostock.chart_extractor import ChartExtractor
+from kostock.patternpool import PatternPool
+
+PROCESS_COUNTS = (1, 2, 4, 8, 16)
+REPEAT = 3
+
+
+def capture_code(args):
+    code, db = args
+    return ChartExtractor.capture_chart_patterns(code, PATTERNS, db, THRESHOLDS, WINDOW_SIZE, WINDOW_MOVE, GROUPS)
+
+
+def capture_per_call_pool(db, codes, process_count):
+    with Pool(process_count) as p:
+        return p.map(capture_code, [(code, db) for code in codes])
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_db(db)
+        kwargs = {'thresholds': THRESHOLDS, 'groups': GROUPS, 'window_size': WINDOW_SIZE, 'window_move': WINDOW_MOVE}
+
+        answers = {}
+        print(f"{len(codes)} codes, {len(PATTERNS)} patterns, {os.cpu_count()} cpu")
+        for process_count in PROCESS_COUNTS:  # before numba threads start in this process (fork)
+            start = timeit.default_timer()
+            answers[process_count] = capture_per_call_pool(db, codes, process_count)
+            print(f"per-call pool {process_count:>2} processes: {timeit.default_timer() - start:8.3f} sec")
+
+        base = None
+        for process_count in PROCESS_COUNTS:
+            start = timeit.default_timer()
+            with PatternPool(db, codes, process_count) as pool:
+                startup = timeit.default_timer() - start
+                start = timeit.default_timer()
+                captured = pool.capture(PATTERNS, chunksize=1, **kwargs)
+                first = timeit.default_timer() - start
+                start = timeit.default_timer()
+                for _ in range(REPEAT):
+                    assert pool.capture(PATTERNS, **kwargs) == captured
+                warm = (timeit.default_timer() - start) / REPEAT
+            assert captured == answers[process_count]
+            base = warm if base is None else base
+            print(f"PatternPool   {process_count:>2} processes: startup {startup:7.3f} sec, first query "
+                  f"{first:7.3f} sec, warm query {warm:7.3f} sec, speedup {base / warm:5.2f}, "
+                  f"efficiency {base / warm / process_count:5.2f}")
+        db._pool.close_all()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+bench_pattern_scan.py
+
+window scan of ChartExtractor.capture_chart_pattern: Python window loop vs compiled all-windows scan
+without and with lower bound pruning.
+synthetic random walk charts.
+usage: python -m benchmarks.bench_pattern_scan
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor
+from kostock.frechetdist import frdist
+from kostock.patternscan import scan_chart_pattern, normalize_windows
+
+NUMBER_OF_CODES = 20
+NUMBER_OF_CHART_DAYS = 5000
+PATTERN = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+WINDOW_SIZE = 60
+WINDOW_MOVE = 6
+
+
+def make_charts():
+    rng = np.random.default_rng(0)
+    return [pd.Series(10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=NUMBER_OF_CHART_DAYS))))
+            for _ in range(NUMBER_OF_CODES)]
+
+
+def scan_by_loop(chart, pattern, threshold, window_size, window_move):
+    # window loop of ChartExtractor.capture_chart_pattern before the compiled scan
+    fr_pat = ChartExtractor._trans_pat_to_frpat(pattern, window_size)
+    max_pat, min_pat = max(pattern), min(pattern)
+    pat_diff = max_pat - min_pat
+    days = 0
+    captured = []
+    while days < len(chart):
+        part_chart = chart[days:days + window_size]
+        if len(part_chart) < window_size:
+            break
+        max_val, min_val = max(part_chart), min(part_chart)
+        cht_diff = max_val - min_val
+        if min_val == 0 or cht_diff == 0:
+            days += window_move
+            continue
+        fr_cht = (part_chart - min_val) * (pat_diff / cht_diff) + min_pat
+        fr_cht = [[j, data] for j, data in enumerate(fr_cht)]
+        if frdist(fr_cht, fr_pat) < threshold:
+            captured.append(days)
+            days += window_size
+            continue
+        days += window_move
+    return captured
+
+
+def filter_by_loop(chart, pattern, window_size, window_move):
+    # per window min/max, diff ratio filter and rescale factor of the former loop
+    pat_diff = max(pattern) - min(pattern)
+    valid = []
+    for days in range(0, len(chart) - window_size + 1, window_move):
+        part_chart = chart[days:days + window_size]
+        max_val, min_val = max(part_chart), min(part_chart)
+        cht_diff = max_val - min_val
+        valid.append(min_val != 0 and cht_diff != 0 and pat_diff / cht_diff > 0)
+    return valid
+
+
+def scan_compiled(chart, pattern, threshold, window_size, window_move, prune=False, stats=None):
+    fr_pat = ChartExtractor._trans_pat_to_frpat(pattern, window_size)
+    return scan_chart_pattern(chart.to_numpy(), pattern, fr_pat, window_size, window_move, threshold,
+                              prune=prune, stats=stats).tolist()
+
+
+if __name__ == '__main__':
+    charts = make_charts()
+    threshold = (WINDOW_SIZE * (max(PATTERN) - min(PATTERN))) / 200
+    scan_compiled(charts[0], PATTERN, threshold, WINDOW_SIZE, WINDOW_MOVE)  # compile
+
+    stats = {}
+    scans = (('python loop', scan_by_loop),
+             ('compiled scan', scan_compiled),
+             ('compiled + prune', lambda *args: scan_compiled(*args, prune=True, stats=stats)))
+    results = {}
+    for name, scan in scans:
+        start = timeit.default_timer()
+        results[name] = [scan(chart, PATTERN, threshold, WINDOW_SIZE, WINDOW_MOVE) for chart in charts]
+        elapsed = timeit.default_timer() - start
+        print(f"{name:<17}: {elapsed:8.3f} sec ({elapsed / NUMBER_OF_CODES * 1000:8.1f} ms/code)")
+    assert results['python loop'] == results['compiled scan'] == results['compiled + prune']
+    print(stats)
+
+    normalize_windows(charts[0].to_numpy(), WINDOW_SIZE, PATTERN)  # compile
+    for name, window_filter in (('filter loop', lambda chart: filter_by_loop(chart, PATTERN, WINDOW_SIZE,
+                                                                              WINDOW_MOVE)),
+                                ('filter vectorized', lambda chart: normalize_windows(chart.to_numpy(), WINDOW_SIZE,
+                                                                                       PATTERN))):
+        start = timeit.default_timer()
+        for chart in charts:
+            window_filter(chart)
+        elapsed = timeit.default_timer() - start
+        print(f"{name:<17}: {elapsed:8.3f} sec ({elapsed / NUMBER_OF_CODES * 1000:8.2f} ms/code)")
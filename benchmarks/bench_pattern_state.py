@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+bench_pattern_state.py
+
+daily re-scan after one new bar of every chart: full scan of capture_chart_patterns
+vs PatternState (scan continues from the last call, only windows with the new bar are tested).
+synthetic random walk charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_pattern_state
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+from benchmarks.bench_multi_pattern import PATTERNS, THRESHOLDS, GROUPS, WINDOW_SIZE, WINDOW_MOVE
+from benchmarks.bench_pattern_index import fill_db, NUMBER_OF_CODES, NUMBER_OF_CHART_DAYS
+from kostock.chart_extractor import ChartExtractor
+from kostock.patternstate import PatternState
+
+NUMBER_OF_NEW_DAYS = 5
+
+
+def append_day(db, codes, date):
+    with db:
+        for code in codes:
+            close = float(db.get_one_from_chart(code)[2]) * np.exp(np.random.default_rng().normal(scale=0.02))
+            df = pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume_q': 1000},
+                              index=[date])
+            db.upsert_ohlc_df_into_chart(code, df)
+            db.update_chart_date_in_meta(code, date.date())
+        db.commit()
+
+
+def capture(db, codes, state=None):
+    stats = {}
+    captured = [row for code in codes
+                for row in ChartExtractor.capture_chart_patterns(code, PATTERNS, db, THRESHOLDS, WINDOW_SIZE,
+                                                                 WINDOW_MOVE, GROUPS, stats=stats, state=state)]
+    return captured, stats
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        codes = fill_db(db)
+        state = PatternState(os.path.join(tmp_dir, 'state.json'))
+        start = timeit.default_timer()
+        history, _ = capture(db, codes, state)
+        state.save()
+        print(f"first state scan : {timeit.default_timer() - start:8.3f} sec (once)")
+
+        dates = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS + NUMBER_OF_NEW_DAYS)
+        full_time = state_time = full_windows = state_windows = 0
+        for date in dates[NUMBER_OF_CHART_DAYS:]:
+            append_day(db, codes, date)
+            start = timeit.default_timer()
+            answer, full_stats = capture(db, codes)
+            full_time += timeit.default_timer() - start
+            start = timeit.default_timer()
+            state = PatternState(state.path)
+            new, stats = capture(db, codes, state)
+            state.save()
+            state_time += timeit.default_timer() - start
+            history.extend(new)
+            full_windows += full_stats['windows']
+            state_windows += stats.get('windows', 0)
+            key = lambda row: (row[0], row[2], row[1])
+            assert sorted(history, key=key) == sorted(answer, key=key)
+        for name, elapsed, windows in (('full scan', full_time, full_windows),
+                                       ('pattern state', state_time, state_windows)):
+            print(f"{name:<17}: {elapsed / NUMBER_OF_NEW_DAYS:8.3f} sec/day "
+                  f"({windows / NUMBER_OF_NEW_DAYS:9.1f} windows/day tested, "
+                  f"{NUMBER_OF_CODES} codes x {len(PATTERNS)} patterns)")
+        db._pool.close_all()
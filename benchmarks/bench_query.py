@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+bench_query.py
+
+per-query latency of StockDB with SQL formatted every call (old way) vs bound parameters and reused SQL.
+synthetic data in a temporary SQLite file.
+usage: python -m benchmarks.bench_query
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+
+NUMBER_OF_CALLS = 5000
+NUMBER_OF_SINFO_ROWS = 2000
+
+
+def fill_db(db):
+    index = pd.bdate_range('2000-01-03', periods=5000)
+    df = pd.DataFrame(data=np.random.randint(1000, 100000, size=(len(index), 5)), index=index,
+                      columns=('open', 'close', 'high', 'low', 'volume_q'))
+    with db:
+        db.create_sinfo_schema()
+        db.create_chart_schema('005930')
+        db.upsert_ohlc_df_into_chart('005930', df, batch_size=10000)
+        db.commit()
+    return [d.date() for d in index[np.random.randint(100, len(index), NUMBER_OF_CALLS)]]
+
+
+def old_recent_stock_price(db, code, date):
+    sql = "SELECT close FROM c_{0} WHERE date <= '{1}' ORDER BY date DESC LIMIT 1;".format(code, date)
+    db.cur.execute(sql)
+    return db.cur.fetchone()
+
+
+def old_ohlc_prev_from_chart(db, code, date, prev_days):
+    sql = f"SELECT date, open, close, high, low, volume FROM c_{code} WHERE date <= '{date}' "\
+          f"ORDER BY date DESC LIMIT {prev_days};"
+    db.cur.execute(sql)
+    return db.cur.fetchall()[::-1]
+
+
+def old_add_row_into_sinfo(db, *values):
+    upsert = db._backend.get_upsert_clause(('code',), ('name', 'wics_ls', 'wics_ms', 'market', 'num_stocks'))
+    sql = "INSERT INTO stock_info VALUES {0} {1};".format((*values, 0), upsert)
+    db.cur.execute(sql)
+
+
+def measure(func, args_list):
+    start = timeit.default_timer()
+    for args in args_list:
+        func(*args)
+    return (timeit.default_timer() - start) / len(args_list) * 1e6  # us
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        dates = fill_db(db)
+        sinfo_rows = [(f"{i:06d}", f"name{i}", 'IT', 'semiconductor', 'KOSPI', i) for i in range(NUMBER_OF_SINFO_ROWS)]
+        results = []
+        with db:
+            results.append(('get_recent_stock_price',
+                            measure(lambda d: old_recent_stock_price(db, '005930', d), [(d,) for d in dates]),
+                            measure(lambda d: db.get_recent_stock_price('005930', d), [(d,) for d in dates])))
+            results.append(('get_ohlc_prev_from_chart',
+                            measure(lambda d: old_ohlc_prev_from_chart(db, '005930', d, 20), [(d,) for d in dates]),
+                            measure(lambda d: db.get_ohlc_prev_from_chart('005930', d, 20), [(d,) for d in dates])))
+            old = measure(lambda *row: old_add_row_into_sinfo(db, *row), sinfo_rows)
+            new = measure(lambda *row: db.add_row_into_sinfo(*row), sinfo_rows)
+            start = timeit.default_timer()
+            db.add_rows_into_sinfo(sinfo_rows)
+            bulk = (timeit.default_timer() - start) / len(sinfo_rows) * 1e6
+            db.rollback()
+            results.append(('add_row_into_sinfo', old, new))
+            results.append(('add_rows_into_sinfo (per row)', old, bulk))
+        db._pool.close_all()
+
+    print(f"{'query':<32}{'format (us)':>12}{'bound (us)':>12}{'speedup':>9}")
+    for name, old, new in results:
+        print(f"{name:<32}{old:>12.1f}{new:>12.1f}{old / new:>8.2f}x")
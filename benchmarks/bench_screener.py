@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+bench_screener.py
+
+"close crosses its 20-day MA while inst buys 3 days in a row" over the whole market:
+ad hoc pandas loop per code vs ChartExtractor.capture_rule (compiled rule on the market panel).
+synthetic charts in a temporary SQLite file.
+usage: python -m benchmarks.bench_screener
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backend_read import make_db
+from kostock.chart_extractor import ChartExtractor
+
+NUMBER_OF_CODES = 200
+NUMBER_OF_CHART_DAYS = 5000
+RULE = "cross_over(close, ma(close, 20)) and run(inst > 0) >= 3"
+
+
+def fill_db(db):
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2000-01-03', periods=NUMBER_OF_CHART_DAYS)
+    codes = [f"{i:06d}" for i in range(NUMBER_OF_CODES)]
+    with db:
+        db.create_meta_schema()
+        for code in codes:
+            close = np.round(10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=len(index)))))
+            df = pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume_q': 10,
+                               'fore': 0, 'inst': rng.integers(-3000, 6000, size=len(index)), 'indi': 0},
+                              index=index)
+            db.create_chart_schema(code)
+            db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 3))
+            db.upsert_ohlc_df_into_chart(code, df, batch_size=10000)
+            db.upsert_investor_df_into_chart(code, df, batch_size=10000)
+            db.update_chart_date_in_meta(code, index[-1].date())
+        db.commit()
+    return codes
+
+
+def capture_by_loop(db, code):
+    # ad hoc loop of the rule
+    with db:
+        chart = db.get_all_from_chart(code)
+    captured = []
+    closes = [row[2] for row in chart]
+    ma = pd.Series(closes, dtype=np.float64).rolling(20).mean().tolist()
+    run = 0
+    for i, row in enumerate(chart):
+        run = run + 1 if row[7] is not None and row[7] > 0 else 0
+        if i > 0 and closes[i] > ma[i] and closes[i - 1] <= ma[i - 1] and run >= 3:
+            captured.append([code, row[0], '1'])
+    return captured
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db({"BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp_dir, 'stock.db')})
+        db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+        codes = fill_db(db)
+        with db:
+            db.refresh_market_panel()
+        ChartExtractor.capture_rule(db, RULE, codes=codes[:1])  # compile
+
+        results = {}
+        for name, capture in (('pandas loop per code', lambda: [row for code in codes
+                                                                 for row in capture_by_loop(db, code)]),
+                              ('compiled rule', lambda: ChartExtractor.capture_rule(db, RULE))):
+            start = timeit.default_timer()
+            results[name] = capture()
+            print(f"{name:<20}: {timeit.default_timer() - start:8.3f} sec ({len(results[name])} captured, "
+                  f"{NUMBER_OF_CODES} codes x {NUMBER_OF_CHART_DAYS} days)")
+        assert results['pandas loop per code'] == results['compiled rule']
+        db._pool.close_all()
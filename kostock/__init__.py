@@ -3,6 +3,8 @@ __version__ = 1.0
 __all__ = ['kiwoom',
            'backtester',
            'stockdb',
+           'asyncdb',
+           'chartstore',
            'logs',
            'plot',
            'update',
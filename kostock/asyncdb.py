@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+asyncdb.py
+
+asyncio facade of StockDB.
+queries run in executor threads, every thread borrows its own connection from the StockDB connection pool,
+so many chart reads are in flight together and callers can process results while other queries wait.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from kostock.stockdb import StockDB
+
+
+class AsyncStockDB:
+    def __init__(self, db=None, max_in_flight=None):
+        """
+        :param db: [StockDB] (default: StockDB())
+        :param max_in_flight: [int] maximum number of queries running together (default: connection pool size)
+        """
+        self.db = StockDB() if db is None else db
+        if max_in_flight is None:
+            max_in_flight = self.db.get_pool_stats()['max_size']
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be 1 or more')
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='AsyncStockDB')
+        self._semaphore = None
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, name):
+        """
+        StockDB method as coroutine function, ex) await adb.get_all_from_chart(code)
+        """
+        method = getattr(StockDB, name, None)
+        if not callable(method) or name.startswith('_'):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        async def call(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
+
+    def close(self):
+        """
+        Wait running queries and stop executor threads. their connections stay in the pool.
+        """
+        self._executor.shutdown(wait=True)
+
+    async def call(self, name, *args, **kwargs):
+        """
+        Run one StockDB method in executor thread.
+        :param name: [str] StockDB method name
+        :return: result of the method
+        """
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._run, name, args, kwargs)
+
+    async def as_completed(self, name, args_list):
+        """
+        Run one StockDB method with many arguments, results are yielded in completed order.
+        ex) async for (code,), data in adb.as_completed('get_all_from_chart', [(code,) for code in codes]):
+        :param name: [str] StockDB method name
+        :param args_list: [2-dim] arguments of each call
+        :return: [async generator] (args, result)
+        """
+        async def call(args):
+            return args, await self.call(name, *args)
+
+        tasks = [asyncio.ensure_future(call(tuple(args))) for args in args_list]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:  # generator is closed before the end
+                task.cancel()
+
+    async def gather(self, name, args_list):
+        """
+        :return: [list] results in the order of args_list
+        """
+        return await asyncio.gather(*(self.call(name, *args) for args in args_list))
+
+    def _get_semaphore(self):
+        # semaphore belongs to one event loop, asyncio.run makes new loop every time
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def _run(self, name, args, kwargs):
+        with self.db:
+            return getattr(self.db, name)(*args, **kwargs)
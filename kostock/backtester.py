@@ -11,22 +11,20 @@ import datetime
 import copy
 import os
 
-from sqlalchemy import create_engine
-from sqlalchemy.dialects.mysql import DATE, FLOAT, INTEGER, VARCHAR
-
 from kostock import qutils
-from kostock.plot import Plot
-from kostock.html_generator import TestResultHtmlGenerator
 from kostock.stockdb import StockDB
 
 
 class BackTester:
-    def __init__(self):
+    def __init__(self, db=None):
+        """
+        :param db: [StockDB or ChartStore] chart data source (default StockDB)
+        """
         self._test_list = []  # (,3) dim list. [['code', 'date', 'group'], ...]
         self._code_nums = defaultdict(int)
         self._tax = 0.3
         self._commission = 0.015
-        self._db = StockDB()
+        self._db = StockDB() if db is None else db
 
     def set_tax(self, tax):
         self._tax = tax
@@ -78,22 +76,21 @@ class BackTester:
         column_list.extend(days)
 
 
-        # input list iteration
+        # input list iteration, each company chart is read once
+        entries = [(code[:6], date) for code, date, _ in self._test_list]
         with self._db:
-            for i in range(len(self._test_list)):
-                code = self._test_list[i][0]
-                date = self._test_list[i][1]
-                group = self._test_list[i][2]
-                if group not in group_list:
-                    group_list.append(group)
-                row = [group, code, date]
-                price = self._db.get_future_price_list(code[:6], date, number_of_days)
-                if np.isnan(price[1]):
-                    continue
-                row.extend(price)
-                row.insert(5, 0)  # 'captured' column
+            prices = self._db.get_future_price_matrix(entries, number_of_days)
 
-                data_list.append(row)
+        for (code, date, group), price in zip(self._test_list, prices):
+            if group not in group_list:
+                group_list.append(group)
+            if np.isnan(price[1]):
+                continue
+            row = [group, code, date]
+            row.extend(price.tolist())
+            row.insert(5, 0)  # 'captured' column
+
+            data_list.append(row)
 
         # add mean, g_mean, stddev, median row
         static = {'mean': np.nanmean, 'g_mean': qutils.nangmean, 'stddev': np.nanstd, 'median': np.nanmedian}
@@ -194,7 +191,8 @@ class TestResult:
         for row in test_codes.itertuples():
             code = getattr(row, 'code')
             date = getattr(row, 'date')
-            ohlc = self._db.get_ohlc_prev_from_chart(code[:6], date, number_of_days)
+            with self._db:
+                ohlc = self._db.get_ohlc_prev_from_chart(code[:6], date, number_of_days)
 
             df_ohlc = pd.DataFrame(data=ohlc, columns=cols)
             df_ohlc['Date'] = df_ohlc['Date'].astype('datetime64[ns]')
@@ -233,10 +231,14 @@ class TestResult:
         Show two graph in different window.
         one is mean/geometric mean graph, another is standard deviation graph over time
         """
+        from kostock.plot import Plot
+
         plt = Plot()
         plt.plot_profit(self._groups, self._means, self._gmeans, self._stddevs)
 
     def show_test_code_chart(self, number_of_days=60):
+        from kostock.plot import Plot
+
         if number_of_days not in self._chart_data:
             self._chart_data[number_of_days] = self._make_chart_data(number_of_days)
         plt = Plot()
@@ -249,6 +251,9 @@ class TestResult:
         :param save_path: save path.
         :param number_of_days: prev days to plot chart data
         """
+        from kostock.plot import Plot
+        from kostock.html_generator import TestResultHtmlGenerator
+
         folder_path = save_path + "\\result_" + title \
                       + "_{}".format(datetime.datetime.now().strftime('%Y-%m-%d_%Hh-%Mm-%Ss'))
         graph_path = folder_path + "\\graph"
@@ -273,6 +278,9 @@ class TestResult:
         return self._result.copy()
     
     def save(self, table_name, msg, path):
+        from sqlalchemy import create_engine
+        from sqlalchemy.dialects.mysql import DATE, FLOAT, INTEGER, VARCHAR
+
         con_str = f"mysql+mysqldb://{self._bt_info['USER_ID']}:{self._bt_info['NORM_PWD']}"\
                   f"@localhost/{self._bt_info['DB_NAME']}"
         engine = create_engine(con_str)
@@ -293,6 +301,8 @@ class TestResult:
             f.write(f"[{date}] {table_name} : {msg}\n")
 
     def load(self, table_name):
+        from sqlalchemy import create_engine
+
         con_str = f"mysql+mysqldb://{self._bt_info['USER_ID']}:{self._bt_info['NORM_PWD']}"\
                   f"@localhost/{self._bt_info['DB_NAME']}"
         engine = create_engine(con_str)
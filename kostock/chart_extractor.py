@@ -3,38 +3,73 @@ chart_extractor.py
 
 The module captures the chart data you want and returns that moment.
 """
+import datetime
+import math
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-from multiprocessing import Pool
 from tqdm import tqdm
 
-from kostock.frechetdist import frdist
+from kostock.patternscan import scan_chart_patterns, add_scan_stats
+from kostock.patternpool import PatternPool
+from kostock.patternstate import get_days, scan_from
+from kostock.chartstore import conv_date_to_day, conv_day_to_date
+from kostock.distcache import DistanceCache, window_distances, walk_distances
+from kostock.panel import NO_VERSION
+from kostock.flowscan import flow_condition, run_hits
+from kostock.screener import Rule, compile_rule
 
 
 class ChartExtractor:
 
     @classmethod
-    def capture_chart_pattern_mp(cls, db, codes, pattern, process_count=1, **kwargs):
-        captured = []
-        arguments = [{'code': code, 'pattern': pattern, 'db': db, **kwargs} for code in codes]
-
-        with Pool(process_count) as p:
-            partial = p.map(cls._proxy_chart_pattern, arguments)
-            captured.extend(partial)
-        return captured
+    def capture_chart_pattern_mp(cls, db, codes, pattern, process_count=1, stats=None, pool=None, threshold=None,
+                                 group='1', **kwargs):
+        """
+        capture_chart_pattern of many codes in processes.
+        index and cache of capture_chart_pattern are not supported (ValueError), use capture_chart_pattern.
+        :param stats: [dict] window counts of all codes are added into it (keys: patternscan.SCAN_STATS)
+        :param pool: [PatternPool] persistent worker pool (default: pool of codes made and closed in this call)
+        :return: [list] captured list of each code
+        """
+        return cls.capture_chart_patterns_mp(db, codes, [pattern], process_count, stats, pool,
+                                             thresholds=[threshold], groups=[group], **kwargs)
 
     @classmethod
-    def _proxy_chart_pattern(cls, kwargs):
-        return cls.capture_chart_pattern(**kwargs)
+    def capture_chart_patterns_mp(cls, db, codes, patterns, process_count=1, stats=None, pool=None, price_opt='c',
+                                  **kwargs):
+        """
+        capture_chart_patterns of many codes in processes.
+        charts are read once into PatternPool, workers get only code and offset of the prices.
+        index and cache of capture_chart_patterns are not supported (ValueError), use capture_chart_patterns.
+        :param stats: [dict] window counts of all codes and patterns are added into it
+        :param pool: [PatternPool] persistent worker pool (default: pool of codes made and closed in this call)
+        :return: [list] captured list of each code
+        """
+        options = {name: kwargs.pop(name, None) for name in ('index', 'cache')}  # not arguments of PatternPool.imap
+        unsupported = [name for name, value in options.items() if value is not None]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} is not supported in processes, "
+                             "use capture_chart_patterns instead")
+        if pool is not None:
+            if pool.price_opt != price_opt:
+                raise ValueError('price_opt must be same with price_opt of pool')
+            return pool.capture(patterns, codes, stats=stats, **kwargs)
+        with PatternPool(db, codes, process_count, price_opt) as pool:
+            return pool.capture(patterns, codes, stats=stats, **kwargs)
 
     @classmethod
     def capture_chart_pattern(cls, code, pattern, db, threshold=None, window_size=60, window_move=None, group='1',
                               price_opt='c', moving_avg=None, min_diff_ratio=0, max_diff_ratio=float('inf'),
-                              start_date=None, end_date=None):
+                              start_date=None, end_date=None, index=None, stats=None, measure='frechet', band=None,
+                              state=None, coarse=None, cache=None):
         """
-        Insert data into this class when chart pattern is found by frechet distance way.
+        Insert data into this class when chart pattern is found by frechet distance way (or dtw distance way).
         :param code:[str]company code
         :param pattern: [(1,) int list] pattern to find out (its length must be window size or less)
         :param threshold: [float]chart similarity threshold
+                          (default: window_size * pattern range / 200, dtw: pattern range / 6)
         :param window_size: [int]chart pattern window size
         :param window_move: [int]window moving value in chart
         :param group: [str]when inserting, set group value (default '1')
@@ -44,52 +79,205 @@ class ChartExtractor:
         :param max_diff_ratio: [float] maximum chart difference ratio (percent unit)
         :param start_date: [date]chart start date
         :param end_date: [date]chart end date
+        :param index: [PatternIndex] windows rejected by index words are not tested, chart is not read
+                      when no window is candidate (used for whole chart only, result is same)
+        :param stats: [dict] window counts (tested, skipped, pruned, evaluated windows) are added into it
+        :param measure: [str] 'frechet' or 'dtw' (dynamic time warping in a Sakoe-Chiba band,
+                        its distance is root mean square price difference on the best warping path)
+        :param band: [int] band radius of dtw (default: window_size // 10)
+        :param state: [PatternState] resume point of the last call, only windows with new bars are tested
+                      (see capture_chart_patterns)
+        :param coarse: [int] coarse-to-fine frechet, windows are compared downsampled by this factor first
+                       and only the survivors at full resolution (ex. 4 for window_size 120 ~ 250, result is same)
+        :param cache: [DistanceCache] window distances are kept in it and captures of another threshold or
+                      diff ratio range are taken from it without distances (see capture_chart_patterns)
         :return: no return, this method insert test data that pattern matched
         """
+        return cls.capture_chart_patterns(code, [pattern], db, [threshold], window_size, window_move, [group],
+                                          price_opt, moving_avg, min_diff_ratio, max_diff_ratio,
+                                          start_date, end_date, index, stats, measure, band, state, coarse, cache)
+
+    @classmethod
+    def capture_chart_patterns(cls, code, patterns, db, thresholds=None, window_size=60, window_move=None,
+                               groups=None, price_opt='c', moving_avg=None, min_diff_ratio=0,
+                               max_diff_ratio=float('inf'), start_date=None, end_date=None, index=None, stats=None,
+                               measure='frechet', band=None, state=None, coarse=None, cache=None):
+        """
+        capture_chart_pattern of many patterns, chart is read and normalized once for all patterns.
+        :param patterns: [list] patterns to find out
+        :param thresholds: [list] threshold of each pattern (None means default threshold of capture_chart_pattern)
+        :param groups: [list] group value of each pattern, captured data is tagged with it (default '1', '2', ...)
+        :param index: [PatternIndex] used for frechet measure only
+        :param state: [PatternState] scan continues from the state of the last call and only windows with new bars
+                      are tested, captured data after the last call is returned (whole chart only, index is not used)
+        :param cache: [DistanceCache] distances of all windows are computed once (no pruning, slower than a scan)
+                      and reused until update_date of the chart in meta_update changes.
+                      threshold, min_diff_ratio and max_diff_ratio are not in the cache key (index is not used)
+        :return: [list] [code, date, group] of every pattern in patterns order
+        """
         if window_move is None:
             window_move = window_size // 10
+        if thresholds is None:
+            thresholds = [None] * len(patterns)
+        if groups is None:
+            groups = [str(i + 1) for i in range(len(patterns))]
+        if not len(patterns) == len(thresholds) == len(groups):
+            raise ValueError('patterns, thresholds and groups must have same length')
+        fr_pats = [cls._get_frpat(tuple(pattern), window_size) for pattern in patterns]
+        thresholds = [cls._get_default_threshold(pattern, window_size, measure) if threshold is None else threshold
+                      for pattern, threshold in zip(patterns, thresholds)]
+
+        if state is not None:
+            if start_date or end_date:
+                raise ValueError('state is used for whole chart only')
+            if cache is not None:
+                raise ValueError('state and cache can not be used together')
+            return cls._resume_chart_patterns(code, patterns, fr_pats, db, thresholds, window_size, window_move,
+                                              groups, price_opt, moving_avg, min_diff_ratio, max_diff_ratio, stats,
+                                              measure, band, state, coarse)
+        if cache is not None:
+            entries = cls._get_window_distances(code, patterns, fr_pats, db, window_size, window_move, price_opt,
+                                                moving_avg, start_date, end_date, measure, band, cache)
+            captured = []
+            for entry, threshold, group in zip(entries, thresholds, groups):
+                hits = walk_distances(entry, window_size, window_move, threshold, min_diff_ratio, max_diff_ratio,
+                                      measure, stats)
+                captured.extend([code, conv_day_to_date(day), group] for day in entry['days'][hits].tolist())
+            return captured
 
+        candidates = None
         with db:
             if start_date and end_date:
                 chart = db.get_range_from_chart(code, start_date, end_date)
             else:
+                if index is not None and measure == 'frechet':  # index words bound frechet distance only
+                    update_date = db.get_chart_update_date(code)
+                    candidates = [index.get_candidates(code, update_date, pattern, fr_pat, threshold, window_size,
+                                                       window_move, price_opt, moving_avg)
+                                  for pattern, fr_pat, threshold in zip(patterns, fr_pats, thresholds)]
+                    if all(pattern_candidates is not None and not pattern_candidates.any()
+                           for pattern_candidates in candidates):
+                        if stats is not None:
+                            windows = sum(len(pattern_candidates) for pattern_candidates in candidates)
+                            add_scan_stats(stats, {'windows': windows, 'index_pruned': windows})
+                        return []
                 chart = db.get_all_from_chart(code)
 
         chart = cls._choose_chart_price(chart, price_opt, moving_avg)  # DataFrame type
-        fr_pat = cls._trans_pat_to_frpat(pattern, window_size)
-
-        max_pat, min_pat = max(pattern), min(pattern)
-        pat_diff = max_pat - min_pat
-
-        if threshold is None:
-            threshold = (window_size * pat_diff) / 200
-
-        days = 0
-        captured = []
-        while days < len(chart):
-            part_chart = chart[days:days + window_size]
-            if len(part_chart) < window_size:
-                break
-            max_val, min_val = max(part_chart), min(part_chart)
-            cht_diff = max_val - min_val
-            cht_diff_ratio = cht_diff / min_val * 100  # percent unit
-            if min_val == 0 or cht_diff == 0:
-                days += window_move
-                continue
-
-            if min_diff_ratio <= cht_diff_ratio <= max_diff_ratio:
-                fr_cht = (part_chart - min_val) * (pat_diff / cht_diff) + min_pat
-                fr_cht = [[j, data] for j, data in enumerate(fr_cht)]  # convert pd.Series to list
-
-                if frdist(fr_cht, fr_pat) < threshold:
-                    date = chart.index[days + window_size - 1]
-                    captured.append([code, date, group])
-                    days += window_size
-                    continue
-            days += window_move
+        if candidates is not None:
+            grid_windows = len(range(0, len(chart) - window_size + 1, window_move))
+            # chart is changed after update_date was read
+            candidates = [None if pattern_candidates is None or len(pattern_candidates) != grid_windows
+                          else pattern_candidates for pattern_candidates in candidates]
 
+        all_starts = scan_chart_patterns(chart.to_numpy(dtype=np.float64), patterns, fr_pats, window_size,
+                                         window_move, thresholds, min_diff_ratio, max_diff_ratio,
+                                         candidates=candidates, stats=stats, measure=measure, band=band,
+                                         coarse=coarse)
+        captured = [[code, chart.index[days + window_size - 1], group]
+                    for starts, group in zip(all_starts, groups) for days in starts.tolist()]
         return captured
 
+    @classmethod
+    def _resume_chart_patterns(cls, code, patterns, fr_pats, db, thresholds, window_size, window_move, groups,
+                               price_opt, moving_avg, min_diff_ratio, max_diff_ratio, stats, measure, band, state,
+                               coarse):
+        """
+        capture_chart_patterns from PatternState, chart is read from the earliest date kept in state.
+        patterns without state (or whose date is not in the chart) are scanned from the chart start.
+        """
+        keys = [state.make_key(code, pattern, threshold, window_size, window_move, price_opt, moving_avg,
+                               min_diff_ratio, max_diff_ratio, measure, band)
+                for pattern, threshold in zip(patterns, thresholds)]
+        read_day = state.get_read_day(keys)
+        positions = None
+        with db:
+            if read_day is not None:
+                chart = db.get_range_from_chart(code, conv_day_to_date(read_day), datetime.date.max)
+                days = get_days([row[0] for row in chart])
+                positions = [state.get_position(key, days) for key in keys]
+            if positions is None or None in positions:
+                chart = db.get_all_from_chart(code)
+                days = get_days([row[0] for row in chart])
+                positions = [state.get_position(key, days) or 0 for key in keys]
+
+        chart = cls._choose_chart_price(chart, price_opt, moving_avg)
+        all_starts, positions = scan_from(chart.to_numpy(dtype=np.float64), positions, patterns, fr_pats,
+                                          window_size, window_move, thresholds, moving_avg, min_diff_ratio,
+                                          max_diff_ratio, stats, measure, band, coarse)
+        for key, position in zip(keys, positions):
+            state.set_position(key, days, position, moving_avg)
+        return [[code, chart.index[start + window_size - 1], group]
+                for starts, group in zip(all_starts, groups) for start in starts.tolist()]
+
+    @classmethod
+    def _get_window_distances(cls, code, patterns, fr_pats, db, window_size, window_move, price_opt, moving_avg,
+                              start_date, end_date, measure, band, cache):
+        """
+        window distances of each pattern from cache, chart is read only when a pattern has no fresh entry.
+        :return: [list] {'scores', 'ratios', 'days'} of each pattern
+        """
+        band = (window_size // 10 if band is None else band) if measure == 'dtw' else None
+        keys = [cache.make_key(code, pattern, window_size, window_move, price_opt, moving_avg, measure, band,
+                               start_date, end_date) for pattern in patterns]
+        with db:
+            update_date = db.get_chart_update_date(code)
+            version = NO_VERSION if update_date is None else conv_date_to_day(update_date)
+            entries = [cache.get(key, version) for key in keys]
+            if None not in entries:
+                return entries
+            if start_date and end_date:
+                chart = db.get_range_from_chart(code, start_date, end_date)
+            else:
+                chart = db.get_all_from_chart(code)
+
+        chart = cls._choose_chart_price(chart, price_opt, moving_avg)
+        prices = chart.to_numpy(dtype=np.float64)
+        step = math.gcd(window_size, window_move)
+        days = get_days(chart.index)[window_size - 1::step]  # end day of each window
+        for p, (pattern, fr_pat, key) in enumerate(zip(patterns, fr_pats, keys)):
+            if entries[p] is None:
+                entries[p] = window_distances(prices, pattern, fr_pat, window_size, window_move, measure, band)
+                entries[p]['days'] = days
+                cache.set(key, version, entries[p])
+        return entries
+
+    @classmethod
+    def sweep_chart_pattern(cls, db, codes, pattern, thresholds, cache=None, window_size=60, window_move=None,
+                            price_opt='c', moving_avg=None, min_diff_ratio=0, max_diff_ratio=float('inf'),
+                            start_date=None, end_date=None, measure='frechet', band=None):
+        """
+        Capture counts of many thresholds for tuning, window distances are computed once for each code.
+        :param codes: [list] company codes
+        :param thresholds: [list] thresholds to count
+        :param cache: [DistanceCache] kept distances are reused and new ones are added
+                      (default: distances are not kept after the call)
+        :return: [list] capture count of all codes for each threshold
+        """
+        if window_move is None:
+            window_move = window_size // 10
+        cache = DistanceCache() if cache is None else cache
+        fr_pat = cls._get_frpat(tuple(pattern), window_size)
+        counts = [0] * len(thresholds)
+        for code in codes:
+            entry, = cls._get_window_distances(code, [pattern], [fr_pat], db, window_size, window_move, price_opt,
+                                               moving_avg, start_date, end_date, measure, band, cache)
+            for i, threshold in enumerate(thresholds):
+                counts[i] += len(walk_distances(entry, window_size, window_move, threshold, min_diff_ratio,
+                                                max_diff_ratio, measure))
+        return counts
+
+    @staticmethod
+    def _get_default_threshold(pattern, window_size, measure='frechet'):
+        """
+        default threshold of pattern.
+        dtw distance is a mean of the window, so its default is smaller
+        (about same number of matches with frechet default at window size 60).
+        """
+        if measure == 'dtw':
+            return (max(pattern) - min(pattern)) / 6
+        return (window_size * (max(pattern) - min(pattern))) / 200
+
     @staticmethod
     def _choose_chart_price(chart, price_opt, avg_window=None):
         """
@@ -116,6 +304,18 @@ class ChartExtractor:
             ret_chart = ret_chart.rolling(window=avg_window, center=True, min_periods=1).mean()
         return ret_chart
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _get_frpat(pattern, window_size):
+        """
+        _trans_pat_to_frpat cached by (pattern, window_size)
+        :param pattern: [tuple] pattern
+        :return: [(window_size, 2) float array] read-only pattern points
+        """
+        fr_pat = np.array(ChartExtractor._trans_pat_to_frpat(pattern, window_size), dtype=np.float64)
+        fr_pat.flags.writeable = False
+        return fr_pat
+
     @staticmethod
     def _trans_pat_to_frpat(pattern, window_size):
         p = (window_size - 1) // (len(pattern) - 1)
@@ -150,39 +350,72 @@ class ChartExtractor:
             else:
                 chart = db.get_all_from_chart(code)
 
-        if th_fore != 0 and th_inst != 0:
-            mode = 'BOTH'
-        elif th_fore != 0:
-            mode = 'FORE'
-        elif th_inst != 0:
-            mode = 'INST'
-        else:
-            raise ValueError('th_fore or th_inst should be more than 0')
-
-        captured = []
-        day_cnt = 0
-        for c in chart:
-            date, fore, inst = c[0], c[6], c[7]
-            if cls.__class__._compare_quantity(mode, th_fore, th_inst, fore, inst):
-                day_cnt += 1
-            else:
-                day_cnt = 0
-            if day_cnt == days:
-                captured.append([code, date, group])
+        fore = np.array([row[6] for row in chart], dtype=np.float64).reshape(-1, 1)  # NULL is NaN
+        inst = np.array([row[7] for row in chart], dtype=np.float64).reshape(-1, 1)
+        cond = flow_condition(fore, inst, th_fore, th_inst)
+        hits = run_hits(cond, np.ones(cond.shape, dtype=np.bool_), days)
+        captured = [[code, chart[i][0], group] for i in np.flatnonzero(hits[:, 0]).tolist()]
         return captured
 
-    @staticmethod
-    def _compare_quantity(mode, th_fore, th_inst, fore, inst):
-        if mode == 'BOTH':
-            if fore and inst:
-                if fore >= th_fore and inst >= th_inst:
-                    return True
-        elif mode == 'FORE':
-            if fore:
-                if fore >= th_fore:
-                    return True
-        elif mode == 'INST':
-            if inst:
-                if inst >= th_inst:
-                    return True
-        return False
+    @classmethod
+    def capture_inst_cond_market(cls, db, th_fore, th_inst, days=3, group='1', start_date=None, end_date=None,
+                                 codes=None, refresh=False):
+        """
+        capture_inst_cond of all companies at once from the market panel of db.
+        quantities are float32 in the panel, so they are exact up to 16,777,216.
+        a date of the market without chart row of the company (missing bars, trading halt) breaks the run.
+        :param codes: [list] company codes to capture (default: all codes in the panel)
+        :param refresh: [bool] merge charts updated after the panel was made before reading
+        :return: [list] [code, date, group] ordered by code and date
+        """
+        if not (start_date and end_date):  # same with capture_inst_cond
+            start_date = end_date = None
+        with db:
+            dates, panel_codes, panel = db.get_market_panel(('close', 'fore', 'inst'), start_date, end_date, refresh)
+        if codes is not None:
+            selected = np.isin(panel_codes, list(codes))
+            panel_codes = panel_codes[selected]
+            panel = {col: matrix[:, selected] for col, matrix in panel.items()}
+
+        cond = flow_condition(panel['fore'], panel['inst'], th_fore, th_inst)
+        # dates without chart row of the code are NaN in every column
+        present = ~(np.isnan(panel['close']) & np.isnan(panel['fore']) & np.isnan(panel['inst']))
+        code_idx, date_idx = np.nonzero(run_hits(cond, present, days).T)
+        dates, panel_codes = dates.tolist(), panel_codes.tolist()
+        captured = [[panel_codes[j], dates[i], group] for j, i in zip(code_idx.tolist(), date_idx.tolist())]
+        return captured
+
+    @classmethod
+    def capture_rule(cls, db, rule, group='1', start_date=None, end_date=None, codes=None, refresh=False):
+        """
+        Capture dates where the screening rule is true for all companies at once from the market panel of db.
+        ex) capture_rule(db, "cross_over(close, ma(close, 20)) and run(inst > 0) >= 3")
+        :param rule: [str or Rule] rule expression (see screener module)
+        :param start_date: [date] first date to capture (dates before it are read for rolling windows)
+        :param end_date: [date] last date to capture
+        :param codes: [list] company codes to capture (default: all codes in the panel)
+        :param refresh: [bool] merge charts updated after the panel was made before reading
+        :return: [list] [code, date, group] ordered by code and date, it can be inserted into BackTester
+        """
+        if not isinstance(rule, Rule):
+            rule = compile_rule(rule)
+        columns = tuple(dict.fromkeys(('close', *rule.columns)))  # close finds dates without chart row
+        with db:
+            dates, panel_codes, panel = db.get_market_panel(columns, None, end_date, refresh)
+        start = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(start_date, 'D')))
+        first = max(start - rule.lookback, 0)
+        if codes is not None:
+            selected = np.isin(panel_codes, list(codes))
+            panel_codes = panel_codes[selected]
+            panel = {col: matrix[first:, selected] for col, matrix in panel.items()}
+        else:
+            panel = {col: matrix[first:] for col, matrix in panel.items()}
+
+        present = np.zeros(panel['close'].shape, dtype=np.bool_)
+        for matrix in panel.values():
+            present |= ~np.isnan(matrix)
+        hits = rule.evaluate(panel, present, start - first)[start - first:] & present[start - first:]
+        code_idx, date_idx = np.nonzero(hits.T)
+        dates, panel_codes = dates[start:].tolist(), panel_codes.tolist()
+        captured = [[panel_codes[j], dates[i], group] for j, i in zip(code_idx.tolist(), date_idx.tolist())]
+        return captured
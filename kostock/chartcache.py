@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+chartcache.py
+
+byte-bounded LRU cache of chart query results used by StockDB.
+each entry has chart version (update_date in meta_update table),
+entry of old version is dropped when it is read.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_MISS = object()
+
+
+def get_size(data):
+    """
+    Estimate memory size of chart query result.
+    :param data: query result (tuple of rows, numpy array, tuple of arrays or value)
+    :return: [int] bytes
+    """
+    if isinstance(data, np.ndarray):
+        return sys.getsizeof(data) + (0 if data.flags.owndata else data.nbytes)
+    if isinstance(data, (tuple, list)):
+        if data and isinstance(data[0], tuple):  # rows, every row has same columns
+            return sys.getsizeof(data) + len(data) * get_size(data[0])
+        return sys.getsizeof(data) + sum(get_size(d) for d in data)
+    return sys.getsizeof(data)
+
+
+class ChartCache:
+    def __init__(self, max_bytes=0):
+        """
+        :param max_bytes: [int] maximum bytes of cached data (0 means cache is disabled)
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # {key: (version, data, bytes)}, key[1] is company code
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def __getstate__(self):
+        # cache is not shared with another process
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def get(self, key, version):
+        """
+        :return: cached data, or _MISS when key does not exist or its version is different
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return _MISS
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, version, data):
+        size = get_size(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, data, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, code):
+        """
+        Drop all entries of the company.
+        :param code: [str] company code (6 digit)
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[1] == code]
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """
+        :return: [dict] hits, misses, evictions, invalidations, entries, bytes, max_bytes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
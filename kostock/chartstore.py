@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+chartstore.py
+
+this module handle local columnar chart store.
+every code has one directory and one memory-mapped numpy array per column
+(date, open, close, high, low, volume, fore, inst, indi).
+'null.npy' is (rows x value columns) bool mask of NULL values, they are stored as 0 in the column
+and returned as None like StockDB.
+rows after the last date are appended to the files in place (daily update),
+rows before the last date (history backfill) write every file again.
+ChartStore has the same chart method names as StockDB, so it can be used instead of StockDB
+in ChartExtractor, BackTester and Update.
+"""
+import datetime
+import io
+import os
+import shutil
+
+import numpy as np
+
+from kostock._pattern import Singleton
+from kostock.configurer import Configurer
+from kostock import qutils
+
+CHART_COLUMNS = ('date', 'open', 'close', 'high', 'low', 'volume', 'fore', 'inst', 'indi')
+OHLC_COLUMNS = ('open', 'close', 'high', 'low', 'volume')
+INVESTOR_COLUMNS = ('fore', 'inst', 'indi')
+# same value range with chart table in StockDB (DATE, INT UNSIGNED, INT)
+CHART_DTYPES = {'date': np.int32,
+                'open': np.uint32, 'close': np.uint32, 'high': np.uint32, 'low': np.uint32,
+                'volume': np.uint32,
+                'fore': np.int32, 'inst': np.int32, 'indi': np.int32}
+
+NULL_COLUMN = 'null'
+_CLOSE = CHART_COLUMNS.index('close') - 1  # close column in NULL mask
+_FILE_DTYPES = dict(CHART_DTYPES, null=np.bool_)
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def conv_date_to_day(date):
+    """
+    Convert date to day number(days from 1970-01-01).
+    :param date: [date, datetime or str(YYYY-MM-DD)]
+    :return: [int] day number
+    """
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date[:10], '%Y-%m-%d')
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return (date - _EPOCH).days
+
+
+def conv_day_to_date(day):
+    """
+    Convert day number(days from 1970-01-01) to date.
+    :param day: [int] day number
+    :return: [date]
+    """
+    return _EPOCH + datetime.timedelta(days=int(day))
+
+
+def get_grown_npy_header(path, old_shape, n_rows, dtype):
+    """
+    Header of npy file whose rows are grown in place.
+    :param path: [str] npy file path
+    :param old_shape: [tuple] shape the file must have now
+    :param n_rows: [int] number of rows after growing
+    :param dtype: [dtype] dtype the file must have
+    :return: [bytes] new header, None when the file can not be grown in place
+             (no file, other shape or dtype, fortran order or header length changes)
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version not in ((1, 0), (2, 0)):
+            return None
+        shape, fortran_order, file_dtype = getattr(np.lib.format, f"read_array_header_{version[0]}_0")(f)
+        header_size = f.tell()
+    if shape != tuple(old_shape) or fortran_order or file_dtype != np.dtype(dtype):
+        return None
+    buf = io.BytesIO()
+    getattr(np.lib.format, f"write_array_header_{version[0]}_0")(
+        buf, {'descr': np.lib.format.dtype_to_descr(file_dtype), 'fortran_order': False,
+              'shape': (n_rows, *shape[1:])})
+    return buf.getvalue() if len(buf.getvalue()) == header_size else None
+
+
+def write_grown_npy(path, header, old_shape, new_rows, index=None, values=None):
+    """
+    Write changed cells of old rows in place and append new rows at the end of npy file.
+    header is written last, so readers see old rows only until new rows are written.
+    :param header: [bytes] get_grown_npy_header result
+    :param new_rows: [array] rows appended after old rows (dtype of the file)
+    :param index: [tuple] index of changed cells in old rows array
+    :param values: [array] values of changed cells
+    """
+    if index is not None and len(values) and np.prod(old_shape):
+        arr = np.memmap(path, dtype=new_rows.dtype, mode='r+', offset=len(header), shape=tuple(old_shape))
+        arr[index] = values
+        arr.flush()
+        del arr
+    with open(path, 'r+b') as f:
+        f.seek(len(header) + int(np.prod(old_shape)) * new_rows.dtype.itemsize)
+        f.write(np.ascontiguousarray(new_rows).tobytes())
+        f.seek(0)
+        f.write(header)
+
+
+class ChartStore(metaclass=Singleton):
+    def __init__(self, path=None):
+        self.path = Configurer.CHART_STORE_PATH if path is None else path
+        self._columns = {}  # {code: {column: np.memmap}, ...}
+        self._pending = {}  # {code: {day: {column: value}}, ...} rows not committed yet
+
+    def __enter__(self):
+        self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # memory-mapped arrays are reopened in another process
+        state = self.__dict__.copy()
+        state['_columns'] = {}
+        return state
+
+    def set_path(self, path):
+        self.close()
+        self.path = path
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+
+    def close(self):
+        """
+        Write pending rows and release memory-mapped arrays.
+        """
+        self.commit()
+        self._columns.clear()
+
+    def commit(self):
+        for code, rows in self._pending.items():
+            self._merge_rows(code, rows)
+        self._pending.clear()
+
+    def rollback(self):
+        self._pending.clear()
+
+    #####################################################################
+    # CANDLE CHART METHOD
+    # ordered by DDL-DML
+    # chart DDL
+    def create_chart_schema(self, code):
+        # code[str] : company code (6 digit)
+        code_path = self._get_code_path(code)
+        os.makedirs(code_path)
+        columns = {col: np.empty(0, dtype=CHART_DTYPES[col]) for col in CHART_COLUMNS}
+        columns[NULL_COLUMN] = np.empty((0, len(CHART_COLUMNS) - 1), dtype=np.bool_)
+        self._write_columns(code, columns)
+
+    def drop_chart_schema(self, code):
+        # code[str] : company code (6 digit)
+        self._columns.pop(code, None)
+        self._pending.pop(code, None)
+        shutil.rmtree(self._get_code_path(code))
+
+    def drop_all_chart_schema(self):
+        for code in self.get_code_list():
+            self.drop_chart_schema(code)
+
+    def get_code_list(self):
+        """
+        get code list in chart store
+        :return :data[1dim] code list(code1, code2,...)
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(code for code in os.listdir(self.path)
+                      if os.path.isdir(self._get_code_path(code)))
+
+    # chart DML
+    def insert_ohlc_into_chart(self, code, date, p_open, p_close, p_high, p_low, volume_q):
+        values = (p_open, p_close, p_high, p_low, volume_q)
+        row = self._pending.setdefault(code, {}).setdefault(conv_date_to_day(date), {})
+        row.update(zip(OHLC_COLUMNS, values))
+
+    def insert_investor_into_chart(self, code, date, fore, inst, indi):
+        values = (fore, inst, indi)
+        row = self._pending.setdefault(code, {}).setdefault(conv_date_to_day(date), {})
+        row.update(zip(INVESTOR_COLUMNS, values))
+
+    def upsert_ohlc_df_into_chart(self, code, df, batch_size=None):
+        """
+        Insert or update ohlc rows of the whole DataFrame at once.
+        :param code: [str] company code (6 digit)
+        :param df: [DataFrame] req_opt10081 data, index[datetime]=date, columns=open, close, high, low, volume_q
+        :param batch_size: not used, columns are rewritten once per DataFrame
+        :return: [int] number of upserted rows
+        """
+        if df.empty:
+            return 0
+        days = self._conv_index_to_days(df.index)
+        updates = {col: (days, df[df_col].to_numpy())
+                   for col, df_col in zip(OHLC_COLUMNS, ('open', 'close', 'high', 'low', 'volume_q'))}
+        self._merge_columns(code, updates)
+        return len(days)
+
+    def upsert_investor_df_into_chart(self, code, df, batch_size=None):
+        """
+        Insert or update investor rows of the whole DataFrame at once.
+        :param code: [str] company code (6 digit)
+        :param df: [DataFrame] req_opt10060 data, index[datetime]=date, columns=fore, inst, indi
+        :param batch_size: not used, columns are rewritten once per DataFrame
+        :return: [int] number of upserted rows
+        """
+        if df.empty:
+            return 0
+        days = self._conv_index_to_days(df.index)
+        updates = {col: (days, df[col].to_numpy()) for col in INVESTOR_COLUMNS}
+        self._merge_columns(code, updates)
+        return len(days)
+
+    def get_chart_columns(self, code, start_date=None, end_date=None):
+        """
+        get chart columns without making row tuples.
+        returned arrays are read-only views of memory-mapped files.
+        :param code: company code
+        :param start_date: start date in chart (None means first date)
+        :param end_date: end date in chart (None means last date)
+        :return: [dict] {column: np.ndarray}, 'date' column is day number(days from 1970-01-01),
+                 'null' is (rows x value columns) bool array of NULL values (stored as 0 in the column)
+        """
+        columns = self._load_columns(code)
+        start, end = self._get_index_range(columns['date'], start_date, end_date)
+        return {col: arr[start:end] for col, arr in columns.items()}
+
+    def get_all_from_chart(self, code):
+        """
+        get all data from the one candle chart
+        parameter
+        * code[str] : company code (6 digit)
+        return
+        * data[2-dim] : data about price, volume etc
+        """
+        return self._conv_columns_to_rows(self.get_chart_columns(code), CHART_COLUMNS)
+
+    def get_one_from_chart(self, code, date=None):
+        """
+        get one data from the one candle chart
+        if date is None, func returns latest data
+        parameter
+        * code[str] : company code (6 digit)
+        * date[date] : date
+        return
+        * data[1-dim] : data about price, volume etc
+        """
+        columns = self._load_columns(code)
+        days = columns['date']
+        if date is None:
+            idx = len(days) - 1
+        else:
+            idx = int(np.searchsorted(days, conv_date_to_day(date)))
+            if idx == len(days) or days[idx] != conv_date_to_day(date):
+                return None
+        if idx < 0:
+            return None
+        one = {col: arr[idx:idx + 1] for col, arr in columns.items()}
+        return self._conv_columns_to_rows(one, CHART_COLUMNS)[0]
+
+    def get_range_from_chart(self, code, start_date, end_date):
+        """
+        return chart column value(price, indi,fore,inst quantity)
+        :param code: company code
+        :param start_date: start date in chart
+        :param end_date: end date in chart
+        :return: chart data from start date to end date
+        """
+        return self._conv_columns_to_rows(self.get_chart_columns(code, start_date, end_date), CHART_COLUMNS)
+
+    def get_ohlc_prev_from_chart(self, code, date, prev_days):
+        """
+        return chart colum value(price, institution quantity) from date-prev_days to date
+        :param code: code: company code
+        :param date: start date in chart
+        :param prev_days: it is used limit
+        :return: chart data from date-prev_days to date
+        """
+        columns = self._load_columns(code)
+        _, end = self._get_index_range(columns['date'], None, date)
+        start = max(end - prev_days, 0)
+        part = {col: columns[col][start:end] for col in ('date',) + OHLC_COLUMNS + (NULL_COLUMN,)}
+        return self._conv_columns_to_rows(part, ('date',) + OHLC_COLUMNS)
+
+    def get_recent_stock_price(self, code, date):
+        """
+        - this method returns stock price corresponding date and code
+        - if stock price doesn't exist in the date,
+          it is calculated in MOST RECENTRLY PREVIOUS DATE
+        """
+        columns = self._load_columns(code)
+        _, end = self._get_index_range(columns['date'], None, date)
+        if not end or columns[NULL_COLUMN][end - 1, _CLOSE]:
+            return None
+        return int(columns['close'][end - 1])
+
+    def get_future_price_list(self, code, date, number_of_days=130):
+        """
+        - same with StockDB.get_future_price_list
+        - price list is made of previous day price and later input date price
+        - its length is value of number_of_days + 2
+        - if actual data is less than number_of_days,
+          rest of data is filled with nan
+        """
+        columns = self._load_columns(code)
+        idx = int(np.searchsorted(columns['date'], conv_date_to_day(date), side='left'))
+        if idx == 0:
+            return [float('nan') for _ in range(number_of_days + 2)]
+
+        price_list = columns['close'][idx - 1:idx + number_of_days + 1].tolist()
+        nulls = columns[NULL_COLUMN][idx - 1:idx + number_of_days + 1, _CLOSE]
+        if nulls.any():
+            price_list = [None if null else price for price, null in zip(price_list, nulls.tolist())]
+        if len(price_list) < number_of_days + 2:
+            nan_len = (number_of_days + 2) - len(price_list)
+            price_list.extend([float('nan') for _ in range(nan_len)])
+        return price_list
+
+    def get_close_series_from_chart(self, code):
+        """
+        get all close prices of the one candle chart
+        :param code: [str] company code (6 digit)
+        :return: [tuple] (day number array(days from 1970-01-01), close price array) ordered by date
+                 NULL close is NaN like StockDB
+        """
+        columns = self._load_columns(code)
+        nulls = columns[NULL_COLUMN][:, _CLOSE]
+        if nulls.any():
+            return columns['date'], np.where(nulls, np.nan, columns['close'])
+        return columns['date'], columns['close']
+
+    def get_future_price_matrix(self, entries, number_of_days=130):
+        """
+        - bulk version of get_future_price_list
+        :param entries: [(n, 2) dim] [(code, date), ...]
+        :param number_of_days: [int] it determines row length (number_of_days + 2)
+        :return: [(n, number_of_days + 2) float array] row is same with get_future_price_list
+        """
+        return qutils.make_future_price_matrix(entries, self.get_close_series_from_chart, number_of_days)
+
+    #####################################################################
+    def _get_code_path(self, code):
+        return os.path.join(self.path, code)
+
+    def _get_column_path(self, code, column):
+        return os.path.join(self.path, code, column + '.npy')
+
+    def _load_columns(self, code):
+        if code not in self._columns:
+            columns = {col: np.load(self._get_column_path(code, col), mmap_mode='r') for col in CHART_COLUMNS}
+            null_path = self._get_column_path(code, NULL_COLUMN)
+            if os.path.isfile(null_path):
+                columns[NULL_COLUMN] = np.load(null_path, mmap_mode='r')
+            else:  # store made before NULL mask
+                columns[NULL_COLUMN] = np.zeros((len(columns['date']), len(CHART_COLUMNS) - 1), dtype=np.bool_)
+            self._columns[code] = columns
+        return self._columns[code]
+
+    @staticmethod
+    def _get_index_range(days, start_date, end_date):
+        start = 0 if start_date is None else int(np.searchsorted(days, conv_date_to_day(start_date), side='left'))
+        end = len(days) if end_date is None else int(np.searchsorted(days, conv_date_to_day(end_date), side='right'))
+        return start, max(start, end)
+
+    @staticmethod
+    def _conv_columns_to_rows(columns, names):
+        dates = [conv_day_to_date(day) for day in columns['date'].tolist()]
+        values = []
+        for col in names[1:]:
+            column = columns[col].tolist()
+            nulls = columns[NULL_COLUMN][:, CHART_COLUMNS.index(col) - 1]
+            if nulls.any():
+                column = [None if null else value for value, null in zip(column, nulls.tolist())]
+            values.append(column)
+        return tuple(zip(dates, *values))
+
+    @staticmethod
+    def _conv_index_to_days(index):
+        return index.to_numpy(dtype='datetime64[D]').astype(np.int32)
+
+    def _merge_rows(self, code, rows):
+        """
+        merge pending rows into chart columns like 'INSERT ... ON DUPLICATE KEY UPDATE'.
+        """
+        updates = {}
+        for col in CHART_COLUMNS[1:]:
+            items = [(day, np.nan if values[col] is None else values[col])
+                     for day, values in rows.items() if col in values]
+            if items:
+                days, values = zip(*items)
+                updates[col] = (np.array(days, dtype=np.int32), np.array(values, dtype=np.float64))
+        self._merge_columns(code, updates)
+
+    def _merge_columns(self, code, updates):
+        """
+        merge new column values into chart columns like 'INSERT ... ON DUPLICATE KEY UPDATE'.
+        new dates after the last date are appended in place, dates before it write every file again.
+        :param updates: [dict] {column: (day number array, value array)}, NaN value is NULL
+        """
+        old = self._load_columns(code)
+        old_days = np.array(old['date'])
+        days = old_days
+        for new_days, _ in updates.values():
+            days = np.union1d(days, new_days)
+        days = days.astype(np.int32)
+
+        cells = {}  # {value column index: (row index array, value array, NULL array)}
+        for col, (new_days, values) in updates.items():
+            values = np.asarray(values, dtype=np.float64)
+            nulls = np.isnan(values)
+            cells[CHART_COLUMNS.index(col) - 1] = (np.searchsorted(days, new_days),
+                                                   np.where(nulls, 0, values).astype(CHART_DTYPES[col]), nulls)
+
+        if np.array_equal(days[:len(old_days)], old_days) and self._grow(code, len(old_days), days, cells):
+            return
+        merged = {'date': days}
+        old_idx = np.searchsorted(days, old_days)
+        for col in CHART_COLUMNS[1:]:
+            arr = np.zeros(len(days), dtype=CHART_DTYPES[col])
+            arr[old_idx] = old[col]
+            merged[col] = arr
+        merged[NULL_COLUMN] = np.ones((len(days), len(CHART_COLUMNS) - 1), dtype=np.bool_)  # not inserted is NULL
+        merged[NULL_COLUMN][old_idx] = old[NULL_COLUMN]
+        for i, (row_idx, values, nulls) in cells.items():
+            merged[CHART_COLUMNS[i + 1]][row_idx] = values
+            merged[NULL_COLUMN][row_idx, i] = nulls
+        self._columns.pop(code)  # release memory-mapped file before replacing it
+        self._write_columns(code, merged)
+
+    def _grow(self, code, n_old, days, cells):
+        """
+        Append rows of new days and write changed cells of old days in place.
+        date file is written last, so readers see old rows only until every column has new rows.
+        :return: [bool] False when a file can not be grown in place (nothing is written)
+        """
+        shapes = {col: (n_old,) for col in CHART_COLUMNS}
+        shapes[NULL_COLUMN] = (n_old, len(CHART_COLUMNS) - 1)
+        headers = {col: get_grown_npy_header(self._get_column_path(code, col), shape, len(days),
+                                             _FILE_DTYPES[col]) for col, shape in shapes.items()}
+        if any(header is None for header in headers.values()):
+            return False
+
+        self._columns.pop(code)  # release memory-mapped files before writing them
+        n_new = len(days) - n_old
+        new_nulls = np.ones((n_new, len(CHART_COLUMNS) - 1), dtype=np.bool_)  # not inserted is NULL
+        null_rows, null_cols, null_values = [], [], []
+        for i, col in enumerate(CHART_COLUMNS[1:]):
+            empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=CHART_DTYPES[col]), np.empty(0, dtype=np.bool_))
+            row_idx, values, nulls = cells.get(i, empty)
+            old = row_idx < n_old
+            new_rows = np.zeros(n_new, dtype=CHART_DTYPES[col])
+            new_rows[row_idx[~old] - n_old] = values[~old]
+            new_nulls[row_idx[~old] - n_old, i] = nulls[~old]
+            write_grown_npy(self._get_column_path(code, col), headers[col], shapes[col], new_rows,
+                            (row_idx[old],), values[old])
+            null_rows.append(row_idx[old])
+            null_cols.append(np.full(old.sum(), i, dtype=np.intp))
+            null_values.append(nulls[old])
+        write_grown_npy(self._get_column_path(code, NULL_COLUMN), headers[NULL_COLUMN], shapes[NULL_COLUMN],
+                        new_nulls, (np.concatenate(null_rows), np.concatenate(null_cols)),
+                        np.concatenate(null_values))
+        write_grown_npy(self._get_column_path(code, 'date'), headers['date'], shapes['date'], days[n_old:])
+        return True
+
+    def _write_columns(self, code, columns):
+        for col, arr in columns.items():
+            path = self._get_column_path(code, col)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(arr, dtype=_FILE_DTYPES[col]))
+            os.replace(tmp_path, path)
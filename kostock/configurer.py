@@ -26,6 +26,12 @@ class Configurer(metaclass=Singleton):
 
     UPDATE_BLACK_LIST = []
 
+    UPDATE_CHART_BACKEND = 'stockdb'
+    UPDATE_COMMIT_BATCH_SIZE = 1000
+    CHART_STORE_PATH = 'chart_store'
+    MARKET_PANEL_PATH = 'market_panel'
+    PATTERN_INDEX_PATH = 'pattern_index'
+
     def __init__(self, config_path=""):
         set_list = {"DB": self._set_db, "KIWOOM": self._set_kiwoom,
                     "UPDATE_HOLIDAY_KEY": self._set_update_holiday_key,
@@ -33,7 +39,12 @@ class Configurer(metaclass=Singleton):
                     "UPDATE_MANUAL_CHART_TRANSFER": self._set_update_manual_chart_transfer,
                     "UPDATE_NUMBER_OF_PROCESS": self._set_update_number_of_process,
                     "UPDATE_PICKLE_PATH": self._set_update_pickle_path, "UPDATE_LOG_PATH": self._set_update_log_path,
-                    "UPDATE_BLACK_LIST": self._set_update_black_list}
+                    "UPDATE_BLACK_LIST": self._set_update_black_list,
+                    "UPDATE_CHART_BACKEND": self._set_update_chart_backend,
+                    "UPDATE_COMMIT_BATCH_SIZE": self._set_update_commit_batch_size,
+                    "CHART_STORE_PATH": self._set_chart_store_path,
+                    "MARKET_PANEL_PATH": self._set_market_panel_path,
+                    "PATTERN_INDEX_PATH": self._set_pattern_index_path}
         if config_path:
             with open(config_path) as f:
                config = json.load(f)
@@ -82,4 +93,24 @@ class Configurer(metaclass=Singleton):
 
     @classmethod
     def _set_update_black_list(cls, list_):
-        cls.UPDATE_BLACK_LIST = list_
\ No newline at end of file
+        cls.UPDATE_BLACK_LIST = list_
+
+    @classmethod
+    def _set_update_chart_backend(cls, backend):
+        cls.UPDATE_CHART_BACKEND = backend
+
+    @classmethod
+    def _set_update_commit_batch_size(cls, batch_size):
+        cls.UPDATE_COMMIT_BATCH_SIZE = batch_size
+
+    @classmethod
+    def _set_chart_store_path(cls, path):
+        cls.CHART_STORE_PATH = path
+
+    @classmethod
+    def _set_market_panel_path(cls, path):
+        cls.MARKET_PANEL_PATH = path
+
+    @classmethod
+    def _set_pattern_index_path(cls, path):
+        cls.PATTERN_INDEX_PATH = path
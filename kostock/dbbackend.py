@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+dbbackend.py
+
+database backends of StockDB.
+backend makes connection and SQL which is different by database (upsert, table list, long chart schema).
+"""
+import datetime
+import sqlite3
+from abc import *
+
+
+def get_backend(config):
+    """
+    Make backend by DB config.
+    :param config: [dict] DB config, "BACKEND" is "mariadb"(default) or "sqlite"
+    :return: [DBBackend]
+    """
+    backend = config.get("BACKEND", "mariadb")
+    if backend == "mariadb":
+        return MariaDBBackend(config["USER_ID"], config["NORM_PWD"], config["STOCK_DB"])
+    elif backend == "sqlite":
+        return SQLiteBackend(config["SQLITE_PATH"])
+    else:
+        raise ValueError("BACKEND in DB config must be 'mariadb' or 'sqlite'.")
+
+
+class DBBackend(metaclass=ABCMeta):
+    placeholder = '%s'
+
+    @abstractmethod
+    def connect(self):
+        pass
+
+    @abstractmethod
+    def get_upsert_clause(self, keys, columns):
+        """
+        :param keys: [tuple] primary key columns
+        :param columns: [tuple] columns updated when key exists
+        :return: [str] clause after 'INSERT ... VALUES ...', new values are used
+        """
+        pass
+
+    @abstractmethod
+    def get_table_list_sql(self, like=None):
+        """
+        :param like: [str] LIKE pattern of table name (None means all tables)
+        :return: [str] SQL which returns table names
+        """
+        pass
+
+    @abstractmethod
+    def get_long_chart_schema_sql(self, columns, partition_years):
+        """
+        :param columns: [str] column definitions of chart table
+        :param partition_years: [range] partition years (not used if partition is not supported)
+        :return: [list] SQL list to create 'chart' table and indexes
+        """
+        pass
+
+
+class MariaDBBackend(DBBackend):
+    placeholder = '%s'
+
+    def __init__(self, user_id, norm_pwd, db_name):
+        self.user_id = user_id
+        self.norm_pwd = norm_pwd
+        self.db_name = db_name
+
+    def connect(self):
+        try:  # imported at first connection, SQLite backend can be used without mysqlclient
+            import MySQLdb as mysql
+        except ImportError:
+            raise ImportError("mysqlclient(MySQLdb) is needed for 'mariadb' BACKEND.")
+        return mysql.connect(host='localhost', user=self.user_id,
+                             passwd=self.norm_pwd, db=self.db_name)
+
+    def get_upsert_clause(self, keys, columns):
+        updates = ', '.join(f"{col}=VALUES({col})" for col in columns)
+        return f"ON DUPLICATE KEY UPDATE {updates}"
+
+    def get_table_list_sql(self, like=None):
+        if like is None:
+            return "SHOW TABLES;"
+        return "SHOW TABLES WHERE Tables_in_{0} LIKE '{1}';".format(self.db_name, like)
+
+    def get_long_chart_schema_sql(self, columns, partition_years):
+        partitions = ','.join(f"PARTITION p{year} VALUES LESS THAN ({year + 1})" for year in partition_years)
+        sql = f"CREATE TABLE IF NOT EXISTS chart({columns},"\
+              'PRIMARY KEY (code, date),'\
+              'INDEX ix_chart_date (date, close, volume)) '\
+              f"PARTITION BY RANGE (YEAR(date)) ({partitions},PARTITION pmax VALUES LESS THAN MAXVALUE);"
+        return [sql]
+
+
+_SQLITE_DATE_COLUMNS = ('date', 'update_date', 'listing_date')  # DATE columns of StockDB schema
+
+
+def _adapt_date(value):
+    return value.isoformat() if type(value) is datetime.date else value
+
+
+def _adapt_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: _adapt_date(value) for key, value in parameters.items()}
+    return tuple(map(_adapt_date, parameters))
+
+
+class _SQLiteCursor(sqlite3.Cursor):
+    """
+    date parameters are bound as 'YYYY-MM-DD' and DATE columns are returned as datetime.date like MySQLdb.
+    dates are converted here, not by sqlite3.register_adapter/register_converter,
+    which would change every sqlite3 connection of the process.
+    """
+    def execute(self, sql, parameters=()):
+        return super().execute(sql, _adapt_parameters(parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return super().executemany(sql, map(_adapt_parameters, seq_of_parameters))
+
+    def fetchone(self):
+        row = super().fetchone()
+        return row if row is None else self._convert_rows([row])[0]
+
+    def fetchmany(self, size=None):
+        return self._convert_rows(super().fetchmany(self.arraysize if size is None else size))
+
+    def fetchall(self):
+        return tuple(self._convert_rows(super().fetchall()))  # same type with MySQLdb
+
+    def _convert_rows(self, rows):
+        columns = [i for i, column in enumerate(self.description or ()) if column[0] in _SQLITE_DATE_COLUMNS]
+        if not columns or not rows:
+            return rows
+        rows = [list(row) for row in rows]
+        for row in rows:
+            for i in columns:
+                if isinstance(row[i], str):
+                    row[i] = datetime.date.fromisoformat(row[i][:10])
+        return [tuple(row) for row in rows]
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=_SQLiteCursor):
+        return super().cursor(factory)
+
+
+class SQLiteBackend(DBBackend):
+    placeholder = '?'
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        con = sqlite3.connect(self.path, check_same_thread=False, factory=_SQLiteConnection)
+        con.execute('PRAGMA journal_mode=WAL;')  # readers are not blocked by a writer
+        con.execute('PRAGMA synchronous=NORMAL;')
+        return con
+
+    def get_upsert_clause(self, keys, columns):
+        updates = ', '.join(f"{col}=excluded.{col}" for col in columns)
+        return f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"
+
+    def get_table_list_sql(self, like=None):
+        sql = "SELECT name FROM sqlite_master WHERE type='table'"
+        if like is None:
+            return sql + ";"
+        return sql + " AND name LIKE '{0}' ESCAPE '\\';".format(like)
+
+    def get_long_chart_schema_sql(self, columns, partition_years):
+        return [f"CREATE TABLE IF NOT EXISTS chart({columns}, PRIMARY KEY (code, date)) WITHOUT ROWID;",
+                "CREATE INDEX IF NOT EXISTS ix_chart_date ON chart(date, close, volume);"]
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+dbpool.py
+
+bounded database connection pool used by StockDB.
+connections are reused between 'with db:' blocks and checkout/wait times are measured.
+connections inherited by fork are never used, closed or garbage-collected in the child,
+because closing a copy (mysqlclient closes it when it is collected) closes the socket of the parent.
+"""
+import os
+import queue
+import threading
+import timeit
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=4, timeout=None):
+        """
+        :param connect: [callable] function which returns new DB-API connection, it must be picklable
+        :param max_size: [int] maximum number of connections
+        :param timeout: [float] seconds to wait for an idle connection (None means forever)
+        """
+        if max_size < 1:
+            raise ValueError('max_size must be 1 or more')
+        self._connect = connect
+        self._max_size = max_size
+        self._timeout = timeout
+        self._inherited = []  # connections of the parent process, kept until the process ends
+        self._reset()
+
+    def __getstate__(self):
+        # connections, lock and queue are made again in another process
+        return {'_connect': self._connect, '_max_size': self._max_size, '_timeout': self._timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._inherited = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._owned = set()  # ids of connections made by this process
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_time': 0., 'max_wait_time': 0.,
+                       'in_use': 0, 'peak_in_use': 0}
+
+    def _check_pid(self):
+        # connections inherited by fork must not be shared with the parent process
+        if self._pid != os.getpid():
+            while True:
+                try:
+                    self._inherited.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self._reset()
+
+    def keep_inherited(self, con):
+        """
+        Keep a connection (or its cursor) borrowed by the parent process before fork, it is not used or closed.
+        :param con: connection from self.acquire of the parent, or its cursor
+        """
+        self._inherited.append(con)
+
+    def acquire(self):
+        """
+        Borrow one connection. it waits when all connections are in use.
+        :return: DB-API connection
+        """
+        self._check_pid()
+        start = timeit.default_timer()
+        waited = False
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._size < self._max_size
+                if can_create:
+                    self._size += 1
+            if can_create:
+                try:
+                    con = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+                self._owned.add(id(con))
+            else:
+                waited = True
+                try:
+                    con = self._idle.get(timeout=self._timeout)
+                except queue.Empty:
+                    raise TimeoutError(f'no idle connection in {self._timeout} sec (pool size {self._max_size})')
+
+        wait_time = timeit.default_timer() - start
+        with self._lock:
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['waits'] += waited
+            stats['wait_time'] += wait_time
+            stats['max_wait_time'] = max(stats['max_wait_time'], wait_time)
+            stats['in_use'] += 1
+            stats['peak_in_use'] = max(stats['peak_in_use'], stats['in_use'])
+        return con
+
+    def release(self, con):
+        """
+        Give back the connection. uncommitted changes are rolled back.
+        :param con: connection from self.acquire
+        """
+        self._check_pid()
+        if id(con) not in self._owned:  # borrowed before fork
+            self.keep_inherited(con)
+            return
+        try:
+            con.rollback()
+        except Exception:
+            # broken connection is not reused
+            with self._lock:
+                self._owned.discard(id(con))
+                self._size -= 1
+                self._stats['in_use'] -= 1
+            return
+        with self._lock:
+            self._stats['in_use'] -= 1
+        self._idle.put(con)
+
+    def close_all(self):
+        """
+        Close idle connections. borrowed connections and connections inherited by fork are not closed.
+        """
+        self._check_pid()
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._owned.discard(id(con))
+                self._size -= 1
+
+    def get_stats(self):
+        """
+        :return: [dict] checkouts, waits(checkouts that waited), wait_time(sum, sec), max_wait_time(sec),
+                 in_use, peak_in_use, size(opened connections), max_size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+        stats['max_size'] = self._max_size
+        return stats
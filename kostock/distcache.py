@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+distcache.py
+
+threshold independent distance cache of chart pattern windows for parameter tuning.
+distance of a window to the pattern and its diff ratio do not depend on threshold, min_diff_ratio
+and max_diff_ratio, so they are computed once and captures of any threshold or ratio range are
+taken by walking the cached arrays again (window_move, or window_size after a match) without distances.
+window walk after a match is off the window_move grid, so windows are kept on the grid of
+gcd(window_size, window_move) which has every window the walk can reach.
+scores are frechet distances, or DTW path sums for dtw (compared with threshold ** 2 * window_size
+like the scan, so captures are same with patternscan.scan_chart_pattern).
+one cache directory has 'keys.json' ({query key: [update_date day number, file name]})
+and '{file name}.npz' of each query (scores, diff ratios and end day numbers of the windows).
+"""
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+from numba import jit, prange
+from numpy.lib.stride_tricks import sliding_window_view
+
+from kostock.dtw import _dtw_dp
+from kostock.frechetdist import _frdist_dp
+from kostock.patternscan import MEASURES, DTW, rolling_extrema, add_scan_stats, _get_scale
+
+
+class DistanceCache:
+    def __init__(self, path=None):
+        """
+        :param path: [str] cache directory (default: cache is kept in memory only)
+        """
+        self.path = path
+        self._keys = {}  # {query key: [update_date day number, file name]}
+        self._entries = {}  # {query key: {'scores', 'ratios', 'days'}} loaded or made in this process
+        self._dirty = set()
+        if path is not None and os.path.isfile(os.path.join(path, 'keys.json')):
+            with open(os.path.join(path, 'keys.json')) as f:
+                self._keys = json.load(f)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def make_key(code, pattern, window_size, window_move, price_opt, moving_avg, measure='frechet', band=None,
+                 start_date=None, end_date=None):
+        """
+        :return: [str] key of the query, every parameter which changes window distances is in it
+        """
+        return json.dumps([code, [float(value) for value in pattern], window_size, window_move, price_opt,
+                           moving_avg or 0, measure, band, str(start_date or ''), str(end_date or '')])
+
+    def get(self, key, version):
+        """
+        :param key: [str] query key
+        :param version: [int] update_date day number of the chart
+        :return: [dict] {'scores', 'ratios', 'days'} arrays, None when there is no entry or the chart is updated
+        """
+        if key not in self._keys or self._keys[key][0] != version:
+            return None
+        if key not in self._entries:
+            with np.load(os.path.join(self.path, self._keys[key][1])) as data:
+                self._entries[key] = {name: data[name] for name in data.files}
+        return self._entries[key]
+
+    def set(self, key, version, entry):
+        """
+        :param key: [str] query key
+        :param version: [int] update_date day number of the chart
+        :param entry: [dict] {'scores', 'ratios', 'days'} arrays
+        """
+        self._keys[key] = [int(version), hashlib.sha1(key.encode()).hexdigest()[:20] + '.npz']
+        self._entries[key] = entry
+        self._dirty.add(key)
+
+    def clear(self, code=None):
+        """
+        :param code: [str] remove entries of the code only (default: all entries)
+        """
+        keys = [key for key in self._keys if code is None or json.loads(key)[0] == code]
+        for key in keys:
+            del self._keys[key]
+            self._entries.pop(key, None)
+            self._dirty.discard(key)
+
+    def save(self):
+        """
+        Write new entries and keys into the cache directory.
+        """
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for key in self._dirty:
+            path = os.path.join(self.path, self._keys[key][1])
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, **self._entries[key])
+            os.replace(path + '.tmp', path)
+        self._dirty = set()
+        path = os.path.join(self.path, 'keys.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._keys, f)
+        os.replace(path + '.tmp', path)
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def _window_scores(windows, scales, min_pat, fr_pat, measure, band):
+    """
+    Full distance (no threshold) of every window, flat windows are NaN.
+    :param windows: [(n, window_size) float array] window prices minus window min
+    """
+    scores = np.full(windows.shape[0], np.nan)
+    for k in prange(windows.shape[0]):
+        if not np.isfinite(scales[k]):
+            continue
+        window = windows[k] * scales[k] + min_pat
+        if measure == DTW:
+            scores[k] = _dtw_dp(window, fr_pat[:, 1], band, math.inf)
+        else:
+            points = np.empty((len(window), 2), dtype=np.float64)
+            for j in range(len(window)):
+                points[j, 0] = j
+                points[j, 1] = window[j]
+            scores[k] = _frdist_dp(points, fr_pat, math.inf)
+    return scores
+
+
+@jit(nopython=True, cache=True)
+def _walk_scores(scores, ratios, step, window_move, window_size, limit, min_diff_ratio, max_diff_ratio):
+    # same walk with patternscan._walk_windows over cached windows on step grid
+    hits = np.empty(len(scores) * step // window_size + 1, dtype=np.int64)
+    n_hits = 0
+    windows = 0
+    skipped = 0
+    days = 0
+    while days // step < len(scores):
+        k = days // step
+        windows += 1
+        if not min_diff_ratio <= ratios[k] <= max_diff_ratio:  # NaN ratio of flat window is never in range
+            skipped += 1
+            days += window_move
+        elif scores[k] < limit:
+            hits[n_hits] = k
+            n_hits += 1
+            days += window_size
+        else:
+            days += window_move
+    return hits[:n_hits], windows, skipped
+
+
+def window_distances(prices, pattern, fr_pat, window_size, window_move, measure='frechet', band=None):
+    """
+    Scores and diff ratios of windows on gcd(window_size, window_move) grid.
+    :param prices: [(n,) float array] chart prices
+    :param pattern: [(1,) int list] pattern, window is normalized to its min-max range
+    :param fr_pat: [(window_size, 2) float array] pattern points
+    :param measure: [str] 'frechet' or 'dtw'
+    :param band: [int] band radius of dtw (default: window_size // 10)
+    :return: [dict] {'scores': float array, 'ratios': diff ratio array (percent unit, NaN for flat window)}
+    """
+    if window_move < 1:
+        raise ValueError('window_move must be 1 or more')
+    if measure not in MEASURES:
+        raise ValueError(f"measure must be one of {list(MEASURES)}")
+    band = window_size // 10 if band is None else int(band)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    if len(prices) < window_size:
+        return {'scores': np.empty(0), 'ratios': np.empty(0)}
+    starts = np.arange(0, len(prices) - window_size + 1, math.gcd(window_size, window_move))
+    max_vals, min_vals = rolling_extrema(prices, window_size)
+    min_vals, cht_diff = min_vals[starts], (max_vals - min_vals)[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = cht_diff / min_vals * 100  # percent unit
+    ratios[(min_vals == 0) | (cht_diff == 0)] = np.nan
+    scales = np.where(np.isnan(ratios), np.nan, _get_scale(pattern, cht_diff))
+    windows = sliding_window_view(prices, window_size)[starts] - min_vals[:, None]
+    scores = _window_scores(windows, scales, float(min(pattern)), np.asarray(fr_pat, dtype=np.float64),
+                            MEASURES[measure], band)
+    return {'scores': scores, 'ratios': ratios}
+
+
+def get_limit(threshold, window_size, measure='frechet'):
+    """
+    :return: [float] score limit of threshold, window matches when its score is less than it
+    """
+    return threshold * threshold * window_size if measure == 'dtw' else threshold
+
+
+def walk_distances(entry, window_size, window_move, threshold, min_diff_ratio=0, max_diff_ratio=float('inf'),
+                   measure='frechet', stats=None):
+    """
+    Matched windows of threshold and ratio range from cached window distances.
+    :param entry: [dict] window_distances result
+    :param stats: [dict] windows, skipped, evaluated and matched counts are added into it
+    :return: [int array] indexes of matched windows in entry arrays
+    """
+    step = math.gcd(window_size, window_move)
+    hits, windows, skipped = _walk_scores(entry['scores'], entry['ratios'], step, window_move, window_size,
+                                          float(get_limit(threshold, window_size, measure)),
+                                          float(min_diff_ratio), float(max_diff_ratio))
+    if stats is not None:
+        add_scan_stats(stats, {'windows': windows, 'skipped': skipped, 'evaluated': windows - skipped,
+                               'matched': len(hits)})
+    return hits
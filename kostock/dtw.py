@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+dtw.py
+
+dynamic time warping distance of two value sequences with a Sakoe-Chiba band.
+distance is sqrt(min sum of squared differences on a warping path / sequence length),
+a root mean square difference, so it is in price unit like the frechet distance.
+"""
+from numba import jit
+import numpy as np
+import math
+
+
+@jit(nopython=True, cache=True)
+def _dtw_dp(p, q, band, limit):
+    """
+    Sum of squared differences on the best warping path with two rolling rows.
+    cell (i, j) is used only when |i - j| <= band, and filling stops when every cell of a row is limit or more.
+    :param p: [(n,) float array] values
+    :param q: [(n,) float array] values
+    :param band: [int] Sakoe-Chiba band radius
+    :param limit: [float] sum limit
+    :return: [float] sum, or math.inf when it is limit or more (abandoned early)
+    """
+    n = p.shape[0]
+    prev = np.full(n + 1, math.inf)  # column 0 is the virtual start cell
+    curr = np.full(n + 1, math.inf)
+    prev[0] = 0.
+    for i in range(1, n + 1):
+        lo = max(1, i - band)
+        hi = min(n, i + band)
+        curr[lo - 1] = math.inf  # left of the band (written by the row before the last one)
+        row_min = math.inf
+        for j in range(lo, hi + 1):
+            diff = p[i - 1] - q[j - 1]
+            ca = diff * diff + min(prev[j - 1], prev[j], curr[j - 1])
+            curr[j] = ca
+            if ca < row_min:
+                row_min = ca
+        if row_min >= limit:
+            return math.inf
+        prev, curr = curr, prev
+    return math.inf if prev[n] >= limit else prev[n]
+
+
+def dtw(p, q, band=None, threshold=None):
+    """
+    Dynamic time warping distance of p and q.
+    :param p: [(n,) float list] values
+    :param q: [(n,) float list] values
+    :param band: [int] Sakoe-Chiba band radius, points i and j are coupled only when |i - j| <= band
+                 (default: no band)
+    :param threshold: [float] when the distance is threshold or more, math.inf is returned
+    :return: [float] sqrt(sum of squared differences on the best path / n)
+
+    >> dtw([1, 2, 3], [1, 1, 2])
+    >> 0.5773502691896257
+    """
+    p = np.array(p, np.float64)
+    q = np.array(q, np.float64)
+    if len(p) == 0 or len(q) == 0:
+        raise ValueError('Input sequences are empty.')
+    if p.ndim != 1 or p.shape != q.shape:
+        raise ValueError('Input sequences do not have the same length.')
+    band = len(p) if band is None else int(band)
+    if band < 0:
+        raise ValueError('band must be 0 or more')
+    limit = math.inf if threshold is None else float(threshold) ** 2 * len(p)
+    total = _dtw_dp(p, q, band, limit)
+    if math.isinf(total):
+        return math.inf
+    distance = math.sqrt(total / len(p))
+    return math.inf if threshold is not None and distance >= threshold else distance
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+flowscan.py
+
+investor flow screening used by ChartExtractor.
+buying condition of foreigner/institution quantity is evaluated for a (dates x codes) matrix at once,
+then consecutive days of each code are counted in one numba call.
+"""
+import numpy as np
+from numba import jit, prange
+
+
+def flow_condition(fore, inst, th_fore, th_inst):
+    """
+    Buying condition of ChartExtractor.capture_inst_cond.
+    quantity must be not 0 (NULL, NaN too) and threshold or more, zero threshold means the investor is not checked.
+    :param fore: [float array] foreigner quantity
+    :param inst: [float array] institution quantity
+    :param th_fore: [int] threshold foreigner quantity
+    :param th_inst: [int] threshold institution quantity
+    :return: [bool array] condition of each value
+    """
+    if th_fore == 0 and th_inst == 0:
+        raise ValueError('th_fore or th_inst should be more than 0')
+    cond = np.ones(np.shape(fore if th_fore != 0 else inst), dtype=np.bool_)
+    with np.errstate(invalid='ignore'):  # float64 threshold is not rounded to float32 of market panel
+        if th_fore != 0:
+            cond &= (fore != 0) & (fore >= np.float64(th_fore))
+        if th_inst != 0:
+            cond &= (inst != 0) & (inst >= np.float64(th_inst))
+    return cond
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def run_hits(cond, present, days):
+    """
+    Dates where the condition is kept for days in a row (counted once per run).
+    dates without chart row of the code (missing bars, trading halt) break the run.
+    :param cond: [(dates, codes) bool array] condition
+    :param present: [(dates, codes) bool array] chart row exists
+    :param days: [int] continuous days
+    :return: [(dates, codes) bool array] True at the days-th date of each run
+    """
+    hits = np.zeros(cond.shape, dtype=np.bool_)
+    for j in prange(cond.shape[1]):
+        count = 0
+        for i in range(cond.shape[0]):
+            if present[i, j] and cond[i, j]:
+                count += 1
+            else:
+                count = 0
+            if count == days:
+                hits[i, j] = True
+    return hits
@@ -4,33 +4,110 @@ from numba import jit
 import numpy as np
 import math
 
-@jit(nopython=True)
-def _c(ca, i, j, p, q):
-
-    if ca[i, j] > -1:
-        return ca[i, j]
-    elif i == 0 and j == 0:
-        ca[i, j] = np.linalg.norm(p[i]-q[j])
-    elif i > 0 and j == 0:
-        ca[i, j] = max(_c(ca, i-1, 0, p, q), np.linalg.norm(p[i]-q[j]))
-    elif i == 0 and j > 0:
-        ca[i, j] = max(_c(ca, 0, j-1, p, q), np.linalg.norm(p[i]-q[j]))
-    elif i > 0 and j > 0:
-        ca[i, j] = max(
-            min(
-                _c(ca, i-1, j, p, q),
-                _c(ca, i-1, j-1, p, q),
-                _c(ca, i, j-1, p, q)
-            ),
-            np.linalg.norm(p[i]-q[j])
-            )
-    else:
-        ca[i, j] = math.inf
-
-    return ca[i, j]
-
-
-def frdist(p, q):
+@jit(nopython=True, cache=True)
+def _frdist_dp(p, q, threshold):
+    """
+    Discrete Fréchet distance by dynamic programming with two rolling rows (O(len_q) memory).
+    every monotone path from (0, 0) to the last cell passes through each row,
+    so the distance is threshold or more when every cell of a row is threshold or more.
+    :return: [float] distance, or math.inf when it is threshold or more (abandoned early)
+    """
+    len_p, len_q, dim = p.shape[0], q.shape[0], p.shape[1]
+    prev = np.empty(len_q, dtype=np.float64)
+    curr = np.empty(len_q, dtype=np.float64)
+    for i in range(len_p):
+        row_min = math.inf
+        for j in range(len_q):
+            sq = 0.
+            for k in range(dim):
+                diff = p[i, k] - q[j, k]
+                sq += diff * diff
+            d = math.sqrt(sq)
+            if i == 0 and j == 0:
+                ca = d
+            elif i == 0:
+                ca = max(curr[j - 1], d)
+            elif j == 0:
+                ca = max(prev[0], d)
+            else:
+                ca = max(min(prev[j], prev[j - 1], curr[j - 1]), d)
+            curr[j] = ca
+            if ca < row_min:
+                row_min = ca
+        if row_min >= threshold:
+            return math.inf
+        prev, curr = curr, prev
+    return math.inf if prev[len_q - 1] >= threshold else prev[len_q - 1]
+
+
+@jit(nopython=True, cache=True)
+def _block_boxes(p, factor):
+    # (m, dim) min and max of every block of factor points
+    m = (p.shape[0] + factor - 1) // factor
+    lo = np.empty((m, p.shape[1]), dtype=np.float64)
+    hi = np.empty((m, p.shape[1]), dtype=np.float64)
+    for b in range(m):
+        for k in range(p.shape[1]):
+            lo[b, k] = hi[b, k] = p[b * factor, k]
+        for i in range(b * factor + 1, min(p.shape[0], (b + 1) * factor)):
+            for k in range(p.shape[1]):
+                lo[b, k] = min(lo[b, k], p[i, k])
+                hi[b, k] = max(hi[b, k], p[i, k])
+    return lo, hi
+
+
+@jit(nopython=True, cache=True)
+def coarse_frdist(p, q, factor, threshold=math.inf, upper=False):
+    """
+    Bound of the discrete Fréchet distance from curves downsampled by factor.
+    every block of factor points is reduced to its bounding box and the coarse table has (len / factor) ** 2 cells.
+      - lower bound: cell is the nearest distance of two boxes (minimum of the fine cells in the block pair),
+        a fine coupling path mapped to blocks is a coarse coupling path
+      - upper bound (upper=True): cell is the farthest distance of two boxes,
+        a coarse coupling path can be walked by a fine coupling path inside its block pairs
+    so coarse_frdist(p, q, f) <= frdist(p, q) <= coarse_frdist(p, q, f, upper=True) for every factor f
+    (factor 1 is the exact distance for both).
+    :param p: [(n, dim) float array] curve
+    :param q: [(n, dim) float array] curve
+    :param factor: [int] points of one block
+    :param threshold: [float] math.inf is returned when the bound is threshold or more
+    :param upper: [bool] upper bound instead of lower bound
+    :return: [float] bound
+    """
+    p_lo, p_hi = _block_boxes(p, factor)
+    q_lo, q_hi = _block_boxes(q, factor)
+    len_p, len_q = p_lo.shape[0], q_lo.shape[0]
+    prev = np.empty(len_q, dtype=np.float64)
+    curr = np.empty(len_q, dtype=np.float64)
+    for i in range(len_p):
+        row_min = math.inf
+        for j in range(len_q):
+            sq = 0.
+            for k in range(p.shape[1]):
+                if upper:
+                    gap = max(q_hi[j, k] - p_lo[i, k], p_hi[i, k] - q_lo[j, k])
+                else:
+                    gap = max(q_lo[j, k] - p_hi[i, k], p_lo[i, k] - q_hi[j, k], 0.)
+                sq += gap * gap
+            d = math.sqrt(sq)
+            if i == 0 and j == 0:
+                ca = d
+            elif i == 0:
+                ca = max(curr[j - 1], d)
+            elif j == 0:
+                ca = max(prev[0], d)
+            else:
+                ca = max(min(prev[j], prev[j - 1], curr[j - 1]), d)
+            curr[j] = ca
+            if ca < row_min:
+                row_min = ca
+        if row_min >= threshold:
+            return math.inf
+        prev, curr = curr, prev
+    return math.inf if prev[len_q - 1] >= threshold else prev[len_q - 1]
+
+
+def frdist(p, q, threshold=None):
     """
     Computes the discrete Fréchet distance between
     two curves. The Fréchet distance between two curves in a
@@ -67,15 +144,22 @@ def frdist(p, q):
             return c(p, q);
         end.
 
+    The table is filled row by row with two rolling rows instead of recursion,
+    and filling stops when every cell of a row is `threshold` or more.
+
     Parameters
     ----------
     p : Input curve - two dimensional array of points
     q : Input curve - two dimensional array of points
+    threshold : float, optional
+        When the distance is `threshold` or more, math.inf is returned
+        without computing the rest of the table.
 
     Returns
     -------
     dist: float64
-        The discrete Fréchet distance between curves `P` and `Q`.
+        The discrete Fréchet distance between curves `P` and `Q`
+        (math.inf if it is not within `threshold`).
 
     Examples
     --------
@@ -101,7 +185,8 @@ def frdist(p, q):
     if len_p != len_q or len(p[0]) != len(q[0]):
         raise ValueError('Input curves do not have the same dimensions.')
 
-    ca = (np.ones((len_p, len_q), dtype=np.float64) * -1)
+    if threshold is None:
+        threshold = math.inf
 
-    dist = _c(ca, len_p-1, len_q-1, p, q)
+    dist = _frdist_dp(p, q, float(threshold))
     return dist
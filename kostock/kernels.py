@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+kernels.py
+
+warm-up of the numba kernels.
+kernels are compiled with cache=True, compiled code is saved in __pycache__ next to the module
+(or NUMBA_CACHE_DIR) and later processes load it instead of compiling.
+warmup runs the entry points on tiny inputs of the same types as real calls,
+so a new process (ex. PatternPool worker) pays loading or compiling before its first real call, not in it.
+numba does not notice changes of a kernel in another module, remove the cache files (*.nbi, *.nbc)
+after editing a kernel called from other modules (ex. frechetdist._frdist_dp from patternscan).
+"""
+import timeit
+
+import numpy as np
+
+KERNELS = ('distance', 'pattern_scan', 'flow_scan', 'screener')
+
+
+def _warm_distance():
+    from kostock.dtw import dtw
+    from kostock.frechetdist import frdist, coarse_frdist
+
+    curve = np.column_stack([np.arange(4.), [1., 2., 3., 2.]])
+    frdist(curve, curve)
+    coarse_frdist(curve, curve, 2)
+    coarse_frdist(curve, curve, 2, upper=True)
+    dtw(curve[:, 1], curve[:, 1], 1)
+
+
+def _warm_pattern_scan():
+    from kostock.chart_extractor import ChartExtractor
+    from kostock.patternscan import scan_chart_patterns
+
+    pattern = [1, 3, 2]
+    prices = np.array([10., 12., 11., 13., 12., 10., 14., 12.])
+    fr_pat = ChartExtractor._get_frpat(tuple(pattern), 4)
+    for kwargs in ({}, {'coarse': 2}, {'measure': 'dtw'}):
+        scan_chart_patterns(prices, [pattern], [fr_pat], 4, 2, [1.], **kwargs)
+
+
+def _warm_flow_scan():
+    from kostock.flowscan import run_hits
+
+    cond = np.ones((3, 2), dtype=np.bool_)
+    run_hits(cond, cond, 2)
+
+
+def _warm_screener():
+    from kostock.screener import Rule
+
+    panel = {'close': np.arange(6., dtype=np.float32).reshape(3, 2)}
+    Rule("run(close > ma(close, 2)) >= 1 or rmax(close, 2) > rmin(close, 2)").evaluate(
+        panel, np.ones((3, 2), dtype=np.bool_))
+
+
+_WARM_UPS = {'distance': _warm_distance, 'pattern_scan': _warm_pattern_scan, 'flow_scan': _warm_flow_scan,
+             'screener': _warm_screener}
+
+
+def warmup(kernels=KERNELS):
+    """
+    Load (or compile) numba kernels in this process.
+    :param kernels: [tuple] names in KERNELS
+    :return: [dict] {name: seconds}
+    """
+    elapsed = {}
+    for name in kernels:
+        if name not in _WARM_UPS:
+            raise ValueError(f"kernel must be one of {KERNELS}")
+        start = timeit.default_timer()
+        _WARM_UPS[name]()
+        elapsed[name] = timeit.default_timer() - start
+    return elapsed
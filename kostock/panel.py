@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+panel.py
+
+market-wide chart panel used by StockDB.
+every chart column is one float32 matrix (trading dates x codes) saved as memory-mapped numpy file,
+missing values are NaN. 'days.npy'(day numbers) and 'codes.npy' are the date and code indexes,
+'versions.npy' has update_date(day number) of each code in meta_update when the code was read.
+a refresh which adds only dates after the last date (daily update) appends rows at the end of the matrix files
+and writes changed cells in place, a new code (new column) or a date before the last date writes every matrix again.
+"""
+import datetime
+import os
+import shutil
+
+import numpy as np
+
+from kostock.chartstore import conv_date_to_day, get_grown_npy_header, write_grown_npy
+
+PANEL_COLUMNS = ('open', 'close', 'high', 'low', 'volume', 'fore', 'inst', 'indi')
+PRICE_COLUMNS = ('open', 'close', 'high', 'low')  # columns changed by price adjustment
+NO_VERSION = -1  # update_date of the code is NULL
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_INDEXES = {'days': np.int32, 'codes': '<U6', 'versions': np.int32}
+
+
+class MarketPanel:
+    def __init__(self, path):
+        """
+        :param path: [str] directory of panel files
+        """
+        self.path = path
+        self._arrays = {}  # {name: np.memmap}
+
+    def __getstate__(self):
+        # memory-mapped arrays are reopened in another process
+        state = self.__dict__.copy()
+        state['_arrays'] = {}
+        return state
+
+    def exists(self):
+        return os.path.isfile(self._get_path('days'))
+
+    def get_days(self):
+        """
+        :return: [int32 array] day numbers(days from 1970-01-01) of trading dates
+        """
+        return self._load('days')
+
+    def get_codes(self):
+        """
+        :return: [str array] company codes in column order
+        """
+        return self._load('codes')
+
+    def get_versions(self):
+        """
+        :return: [dict] {code: update_date day number when the code was read}
+        """
+        return dict(zip(self._load('codes').tolist(), self._load('versions').tolist()))
+
+    def get(self, columns=('close',), start_date=None, end_date=None):
+        """
+        :param columns: [tuple] panel columns
+        :param start_date: [date] first date (None means the first trading date)
+        :param end_date: [date] last date (None means the last trading date)
+        :return: [tuple] (date array(datetime64[D]), code array, {column: (dates x codes) float32 matrix})
+                 matrices are read-only memory-mapped slices
+        """
+        days = self._load('days')
+        start = 0 if start_date is None else int(np.searchsorted(days, conv_date_to_day(start_date), side='left'))
+        end = len(days) if end_date is None else int(np.searchsorted(days, conv_date_to_day(end_date), side='right'))
+        end = max(start, end)
+        matrices = {col: self._load(col)[start:end] for col in columns}
+        return days[start:end].astype('datetime64[D]'), self._load('codes'), matrices
+
+    def is_rewritten(self, code, rows):
+        """
+        Check chart history of the code is written again (e.g. prices adjusted after a split are downloaded again).
+        :param code: [str] company code
+        :param rows: [2-dim] chart rows of the code read again, same format with merge
+        :return: [bool] True when open, close, high or low of a row already in the panel is different
+        """
+        codes = self._load('codes')
+        col = int(np.searchsorted(codes, code))
+        if col == len(codes) or codes[col] != code or not rows:
+            return False
+        days = self._load('days')
+        row_days = np.array([row[1].toordinal() for row in rows], dtype=np.int32) - _EPOCH_ORDINAL
+        pos = np.minimum(np.searchsorted(days, row_days), len(days) - 1)
+        found = days[pos] == row_days
+        for i, name in enumerate(PANEL_COLUMNS):
+            if name not in PRICE_COLUMNS:
+                continue
+            old = self._load(name)[pos[found], col]
+            new = np.array([row[2 + i] for row in rows], dtype=np.float32)[found]  # NULL is NaN
+            if not np.array_equal(old[~np.isnan(old)], new[~np.isnan(old)]):
+                return True
+        return False
+
+    def merge(self, rows, versions):
+        """
+        Merge chart rows into the panel like 'INSERT ... ON DUPLICATE KEY UPDATE'.
+        new dates after the last date are appended to the matrix files (cost of the new rows only),
+        new codes or dates in the middle make every matrix again (cost of the whole panel).
+        :param rows: [2-dim] ((code, date, open, close, high, low, volume, fore, inst, indi), ...)
+        :param versions: [dict] {code: update_date day number} of read codes, codes without rows are added too
+        """
+        old_days, old_codes = np.array(self._load('days')), np.array(self._load('codes'))
+        old_versions = np.array(self._load('versions'))
+
+        codes = np.union1d(old_codes, np.array(list(versions), dtype='<U6'))
+        if rows:
+            row_codes = np.array([row[0] for row in rows], dtype='<U6')
+            row_days = np.array([row[1].toordinal() for row in rows], dtype=np.int32) - _EPOCH_ORDINAL
+            values = np.array([row[2:] for row in rows], dtype=np.float32)  # NULL is NaN
+        else:
+            row_codes = np.empty(0, dtype='<U6')
+            row_days = np.empty(0, dtype=np.int32)
+            values = np.empty((0, len(PANEL_COLUMNS)), dtype=np.float32)
+        days = np.union1d(old_days, row_days).astype(np.int32)
+
+        new_versions = np.full(len(codes), NO_VERSION, dtype=np.int32)
+        new_versions[np.searchsorted(codes, old_codes)] = old_versions
+        new_versions[np.searchsorted(codes, list(versions))] = list(versions.values())
+
+        old_idx = np.ix_(np.searchsorted(days, old_days), np.searchsorted(codes, old_codes))
+        row_idx = (np.searchsorted(days, row_days), np.searchsorted(codes, row_codes))
+        os.makedirs(self.path, exist_ok=True)
+        if self.exists() and len(codes) == len(old_codes) and np.array_equal(days[:len(old_days)], old_days) and \
+                self._grow(len(old_days), days, codes, row_idx, values):
+            self._arrays.clear()
+            for name, arr in (('days', days), ('versions', new_versions)):
+                os.replace(self._save_tmp(name, arr), self._get_path(name))
+            return
+        # every file is written before any is replaced, so readers never see mixed shapes
+        tmp_paths = {}
+        for i, col in enumerate(PANEL_COLUMNS):
+            matrix = np.full((len(days), len(codes)), np.nan, dtype=np.float32)
+            if old_days.size and old_codes.size:
+                matrix[old_idx] = self._load(col)[:len(old_days), :len(old_codes)]
+            matrix[row_idx] = values[:, i]
+            tmp_paths[col] = self._save_tmp(col, matrix)
+        for name, arr in (('days', days), ('codes', codes), ('versions', new_versions)):
+            tmp_paths[name] = self._save_tmp(name, arr)
+
+        self._arrays.clear()  # release memory-mapped files before replacing them
+        for name, tmp_path in tmp_paths.items():
+            os.replace(tmp_path, self._get_path(name))
+
+    def _grow(self, n_old, days, codes, row_idx, values):
+        """
+        Append rows of new days at the end of every matrix file and write changed cells of old days in place.
+        header shape is written last, so matrices have n_old rows until their new rows are written.
+        :return: [bool] False when a file can not be grown in place (nothing is written)
+        """
+        shape = (n_old, len(codes))
+        headers = {col: get_grown_npy_header(self._get_path(col), shape, len(days), np.float32)
+                   for col in PANEL_COLUMNS}
+        if any(header is None for header in headers.values()):
+            return False
+
+        self._arrays.clear()  # release memory-mapped files before writing them
+        old = row_idx[0] < n_old
+        for i, col in enumerate(PANEL_COLUMNS):
+            new_rows = np.full((len(days) - n_old, len(codes)), np.nan, dtype=np.float32)
+            new_rows[row_idx[0][~old] - n_old, row_idx[1][~old]] = values[~old, i]
+            write_grown_npy(self._get_path(col), headers[col], shape, new_rows,
+                            (row_idx[0][old], row_idx[1][old]), values[old, i])
+        return True
+
+    def clear(self):
+        self._arrays.clear()
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+    def _get_path(self, name):
+        return os.path.join(self.path, name + '.npy')
+
+    def _load(self, name):
+        if name not in self._arrays:
+            if not self.exists():
+                shape = (0, 0) if name in PANEL_COLUMNS else 0
+                return np.empty(shape, dtype=_INDEXES.get(name, np.float32))
+            self._arrays[name] = np.load(self._get_path(name), mmap_mode='r')
+        return self._arrays[name]
+
+    def _save_tmp(self, name, arr):
+        tmp_path = self._get_path(name) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, arr)
+        return tmp_path
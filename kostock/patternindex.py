@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+patternindex.py
+
+persistent symbolic window index for chart pattern queries.
+every window on the window_move grid of a chart is min-max normalized to [0, 1],
+averaged into n_segments PAA values and quantized into a SAX word of alphabet symbols.
+a pattern query rejects windows whose word can not be within threshold (admissible bound),
+so exact frechet distance is computed only for candidate windows and charts without candidates are not read.
+one index directory has one (window_size, window_move, price_opt, moving_avg) setting,
+'{code}.npy' has words of the code and 'versions.json' has update_date, chart length and the last chart row
+(day number, open, close, high, low) of each code.
+"""
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from kostock.chartstore import conv_date_to_day
+from kostock.panel import NO_VERSION
+from kostock.patternscan import make_envelope, rolling_extrema
+
+NEVER = 255  # flat window or min price is 0, it never matches
+UNKNOWN = 254  # window with NaN, it is always a candidate
+_EPS = 1e-6  # slack of bound for rounding of normalized values
+
+
+class PatternIndex:
+    def __init__(self, path, window_size=60, window_move=None, price_opt='c', moving_avg=None,
+                 n_segments=10, alphabet=16):
+        """
+        :param path: [str] index directory
+        :param window_size: [int] chart pattern window size
+        :param window_move: [int] window moving value in chart (default: window_size // 10)
+        :param price_opt: [str] price option of ChartExtractor (c:close, o:open, h:high, l:low)
+        :param moving_avg: [int] moving average of ChartExtractor
+        :param n_segments: [int] PAA segments of one window
+        :param alphabet: [int] SAX symbols (2 ~ 254)
+        """
+        if window_move is None:
+            window_move = window_size // 10
+        if not 2 <= alphabet < UNKNOWN:
+            raise ValueError('alphabet must be 2 ~ 253')
+        self.path = path
+        self.params = {'window_size': window_size, 'window_move': window_move, 'price_opt': price_opt,
+                       'moving_avg': moving_avg, 'n_segments': min(n_segments, window_size), 'alphabet': alphabet}
+        self._versions = None  # {code: [update_date day number, chart length, last chart row]}
+        self._words = {}  # {code: memory-mapped words}
+
+    def __getstate__(self):
+        # memory-mapped words are reopened in another process
+        state = self.__dict__.copy()
+        state['_words'] = {}
+        return state
+
+    @classmethod
+    def open_all(cls, path):
+        """
+        :param path: [str] parent directory of index directories
+        :return: [list] PatternIndex of every index directory under path
+        """
+        if not os.path.isdir(path):
+            return []
+        indexes = []
+        for name in sorted(os.listdir(path)):
+            params_path = os.path.join(path, name, 'params.json')
+            if os.path.isfile(params_path):
+                with open(params_path) as f:
+                    indexes.append(cls(os.path.join(path, name), **json.load(f)))
+        return indexes
+
+    def refresh(self, db, codes=None, rebuild=False):
+        """
+        Make words of charts whose update_date in meta_update changed.
+        only windows after the old chart end (and windows changed by centered moving average) are made again.
+        a chart whose row at the old chart end is different (history downloaded again with adjusted prices,
+        same check with StockDB.refresh_market_panel) or which became shorter is indexed again entirely.
+        :param db: [StockDB]
+        :param codes: [list] codes to refresh (default: every chart in meta_update)
+        :param rebuild: [bool] index every chart again
+        :return: [int] number of refreshed codes
+        """
+        from kostock.chart_extractor import ChartExtractor
+
+        os.makedirs(self.path, exist_ok=True)
+        self._write_json('params.json', self.params)
+        versions = {} if rebuild else self._get_versions()
+        with db:
+            meta = {row[0][2:]: row[1] for row in db.get_chart_from_meta()}
+            refreshed = 0
+            for code in (meta if codes is None else codes):
+                update_date = meta.get(code)
+                version = NO_VERSION if update_date is None else conv_date_to_day(update_date)
+                if code in versions and versions[code][0] == version:
+                    continue
+                rows = db.get_all_from_chart(code)
+                chart = ChartExtractor._choose_chart_price(rows, self.params['price_opt'], self.params['moving_avg'])
+                old_length = versions[code][1] if code in versions else 0
+                if old_length and self._is_rewritten(rows, versions[code]):
+                    old_length = 0
+                self._update_words(code, chart.to_numpy(dtype=np.float64), old_length)
+                versions[code] = [version, len(chart), self._get_row_key(rows[-1]) if rows else None]
+                refreshed += 1
+        self._write_json('versions.json', versions)
+        self._versions = versions
+        return refreshed
+
+    def get_candidates(self, code, update_date, pattern, fr_pat, threshold, window_size, window_move,
+                       price_opt='c', moving_avg=None):
+        """
+        Candidate windows of the query on its window_move grid, other windows are surely not matched.
+        :param code: [str] company code
+        :param update_date: [date] update_date of the code in meta_update, index is used only when it is same
+        :param pattern: [(1,) int list] pattern
+        :param fr_pat: [(window_size, 2) float array] pattern points
+        :param threshold: [float] frechet distance threshold
+        :return: [bool array] candidate flag of each grid window, or None when the index can not be used
+                 (different setting, window_move is not a multiple of index window_move or code is not fresh)
+        """
+        params = self.params
+        if (window_size, price_opt, moving_avg) != (params['window_size'], params['price_opt'], params['moving_avg']) \
+                or window_move % params['window_move'] != 0:
+            return None
+        version = self._get_versions().get(code)
+        if version is None or version[0] != (NO_VERSION if update_date is None else conv_date_to_day(update_date)):
+            return None
+        words = self._load_words(code)
+        if words is None:
+            return None
+        lower, upper = make_envelope(np.asarray(fr_pat, dtype=np.float64), threshold)
+        bounds = self._get_segments(window_size)
+        mean_lower = np.add.reduceat(lower, bounds[:-1]) / np.diff(bounds)
+        mean_upper = np.add.reduceat(upper, bounds[:-1]) / np.diff(bounds)
+        min_pat, pat_diff = min(pattern), max(pattern) - min(pattern)
+        slack = _EPS * max(pat_diff, 1)
+
+        words = np.asarray(words)[::window_move // params['window_move']]
+        alphabet = params['alphabet']
+        low = words / alphabet * pat_diff + min_pat  # segment mean of normalized window is in [low, high]
+        high = (words + 1) / alphabet * pat_diff + min_pat
+        candidates = ((low < mean_upper + threshold + slack) & (high > mean_lower - threshold - slack)).all(axis=1)
+        candidates |= (words == UNKNOWN).any(axis=1)
+        candidates &= words[:, 0] != NEVER
+        return candidates
+
+    @staticmethod
+    def _get_row_key(row):
+        # day number and prices of chart row, they are changed by price adjustment
+        return [conv_date_to_day(row[0]), *row[1:5]]
+
+    def _is_rewritten(self, rows, version):
+        old_length = version[1]
+        if len(version) < 3 or len(rows) < old_length:  # index made before the last row was kept
+            return True
+        return self._get_row_key(rows[old_length - 1]) != version[2]
+
+    def _update_words(self, code, prices, old_length):
+        window_size, window_move = self.params['window_size'], self.params['window_move']
+        old_words = self._load_words(code)
+        self._words.pop(code, None)
+        if old_words is None or len(prices) < old_length:
+            old_length = 0
+        # centered moving average of the last days changes with new days
+        keep_end = old_length - 1 - (self.params['moving_avg'] or 0)
+        n_keep = 0
+        if old_length:  # windows which end by keep_end
+            n_keep = min(max(0, (keep_end - window_size + 1) // window_move + 1), len(old_words))
+        starts = np.arange(n_keep * window_move, len(prices) - window_size + 1, window_move)
+        words = self._make_words(prices, starts)
+        if n_keep:
+            words = np.concatenate([np.asarray(old_words)[:n_keep], words])
+        path = os.path.join(self.path, f"{code}.npy")
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, words)
+        os.replace(path + '.tmp', path)
+
+    def _make_words(self, prices, starts):
+        window_size, alphabet = self.params['window_size'], self.params['alphabet']
+        bounds = self._get_segments(window_size)
+        words = np.empty((len(starts), len(bounds) - 1), dtype=np.uint8)
+        if len(starts) == 0:
+            return words
+        max_vals, min_vals = rolling_extrema(prices, window_size)
+        max_vals, min_vals = max_vals[starts], min_vals[starts]
+        windows = sliding_window_view(prices, window_size)[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            unit = (windows - min_vals[:, None]) / (max_vals - min_vals)[:, None]
+        paa = np.add.reduceat(unit, bounds[:-1], axis=1) / np.diff(bounds)
+        words[:] = np.clip(np.floor(np.nan_to_num(paa) * alphabet), 0, alphabet - 1)
+        words[np.isnan(windows).any(axis=1)] = UNKNOWN
+        words[(min_vals == 0) | (max_vals == min_vals)] = NEVER
+        return words
+
+    def _get_segments(self, window_size):
+        # PAA segment boundaries like np.array_split
+        sizes = [len(part) for part in np.array_split(np.arange(window_size), self.params['n_segments'])]
+        return np.concatenate([[0], np.cumsum(sizes)])
+
+    def _get_versions(self):
+        if self._versions is None:
+            path = os.path.join(self.path, 'versions.json')
+            self._versions = {}
+            if os.path.isfile(path):
+                with open(path) as f:
+                    self._versions = json.load(f)
+        return self._versions
+
+    def _load_words(self, code):
+        if code not in self._words:
+            path = os.path.join(self.path, f"{code}.npy")
+            if not os.path.isfile(path):
+                return None
+            self._words[code] = np.load(path, mmap_mode='r')
+        return self._words[code]
+
+    def _write_json(self, name, data):
+        path = os.path.join(self.path, name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+patternpool.py
+
+persistent process pool for chart pattern capture of many companies.
+workers read the charts of their share of codes in parallel when the pool starts (db is sent once to each worker),
+prices of all charts are saved in one memory-mapped file ('prices.npy', 'days.npy'),
+workers open it at their first query and receive only (code, offset, length) tasks,
+so charts are not read and StockDB is not pickled again for every query.
+results come back in completed order by imap_unordered.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from kostock.chartstore import conv_date_to_day, conv_day_to_date
+from kostock.kernels import warmup
+from kostock.patternscan import scan_chart_patterns, add_scan_stats
+from kostock.patternstate import scan_from
+
+_worker_arrays = {}  # price file path, chart source and memory-mapped prices and days of each worker
+
+
+def _init_worker(path, db, price_opt):
+    _worker_arrays.update({'path': path, 'db': db, 'price_opt': price_opt})
+    warmup(('pattern_scan',))  # kernels are loaded (or compiled) when the pool starts, not in the first task
+
+
+def _load_task(codes):
+    from kostock.chart_extractor import ChartExtractor
+
+    db, loaded = _worker_arrays['db'], []
+    with db:
+        for code in codes:
+            chart = ChartExtractor._choose_chart_price(db.get_all_from_chart(code), _worker_arrays['price_opt'])
+            days = np.array(chart.index.tolist(), dtype='datetime64[D]').astype(np.int32)
+            loaded.append((code, chart.to_numpy(dtype=np.float64), days))
+    return loaded
+
+
+def _get_worker_arrays():
+    if 'prices' not in _worker_arrays:  # price file is written after workers start
+        _worker_arrays['prices'] = np.load(os.path.join(_worker_arrays['path'], 'prices.npy'), mmap_mode='r')
+        _worker_arrays['days'] = np.load(os.path.join(_worker_arrays['path'], 'days.npy'), mmap_mode='r')
+    return _worker_arrays['prices'], _worker_arrays['days']
+
+
+def _capture_task(query, task):
+    from kostock.chart_extractor import ChartExtractor
+
+    code, offset, length, positions = task
+    all_prices, all_days = _get_worker_arrays()
+    prices = all_prices[offset:offset + length]
+    days = all_days[offset:offset + length]
+    if query['start_date'] and query['end_date']:
+        start = np.searchsorted(days, conv_date_to_day(query['start_date']), side='left')
+        end = np.searchsorted(days, conv_date_to_day(query['end_date']), side='right')
+        prices, days = prices[start:end], days[start:end]
+    if query['moving_avg']:  # same rolling mean with ChartExtractor._choose_chart_price
+        prices = pd.Series(prices).rolling(window=query['moving_avg'], center=True, min_periods=1).mean()
+
+    window_size = query['window_size']
+    fr_pats = [ChartExtractor._get_frpat(tuple(pattern), window_size) for pattern in query['patterns']]
+    stats = {}
+    prices = np.asarray(prices, dtype=np.float64)
+    if positions is None:
+        all_starts = scan_chart_patterns(prices, query['patterns'], fr_pats, window_size, query['window_move'],
+                                         query['thresholds'], query['min_diff_ratio'], query['max_diff_ratio'],
+                                         stats=stats, measure=query['measure'], band=query['band'],
+                                         coarse=query['coarse'])
+    else:  # PatternState
+        all_starts, positions = scan_from(prices, positions, query['patterns'], fr_pats, window_size,
+                                          query['window_move'], query['thresholds'], query['moving_avg'],
+                                          query['min_diff_ratio'], query['max_diff_ratio'], stats,
+                                          query['measure'], query['band'], query['coarse'])
+    captured = [[code, conv_day_to_date(days[start + window_size - 1]), group]
+                for starts, group in zip(all_starts, query['groups']) for start in starts.tolist()]
+    return code, captured, stats, positions
+
+
+class PatternPool:
+    def __init__(self, db, codes, process_count=1, price_opt='c', path=None):
+        """
+        Start worker processes and read prices of codes in them.
+        :param db: [StockDB or ChartStore] chart data source
+        :param codes: [list] company codes
+        :param process_count: [int] number of worker processes
+        :param price_opt: [str] price option of ChartExtractor (c:close, o:open, h:high, l:low)
+        :param path: [str] directory of price file (default: temporary directory removed by close)
+        """
+        self.price_opt = price_opt
+        self.process_count = process_count
+        self._tmp_dir = tempfile.mkdtemp(prefix='kostock_pool_') if path is None else None
+        self.path = self._tmp_dir if path is None else path
+        os.makedirs(self.path, exist_ok=True)
+        # fork after numba parallel threads started is not safe, workers are spawned on every platform
+        context = multiprocessing.get_context('spawn')
+        self._pool = context.Pool(process_count, initializer=_init_worker, initargs=(self.path, db, price_opt))
+
+        self._tasks = {}  # {code: (code, offset, length)}
+        prices, days = [], []
+        offset = 0
+        codes = list(codes)
+        size = max(1, -(-len(codes) // (process_count * 4)))  # about 4 chunks per worker
+        try:
+            for loaded in self._pool.imap(_load_task, [codes[i:i + size] for i in range(0, len(codes), size)]):
+                for code, code_prices, code_days in loaded:  # chunks come in codes order
+                    prices.append(code_prices)
+                    days.append(code_days)
+                    self._tasks[code] = (code, offset, len(code_prices))
+                    offset += len(code_prices)
+        except BaseException:
+            self.close()
+            raise
+        np.save(os.path.join(self.path, 'prices.npy'), np.concatenate(prices) if prices else np.empty(0))
+        np.save(os.path.join(self.path, 'days.npy'), np.concatenate(days) if days else np.empty(0, np.int32))
+        self._days = np.load(os.path.join(self.path, 'days.npy'), mmap_mode='r')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop workers and remove temporary price file.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._days = None
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def get_codes(self):
+        return list(self._tasks)
+
+    def _get_days(self, code):
+        _, offset, length = self._tasks[code]
+        return self._days[offset:offset + length]
+
+    def imap(self, patterns, thresholds=None, groups=None, window_size=60, window_move=None, moving_avg=None,
+             min_diff_ratio=0, max_diff_ratio=float('inf'), start_date=None, end_date=None, codes=None,
+             chunksize=None, progress=False, stats=None, measure='frechet', band=None, state=None, coarse=None):
+        """
+        ChartExtractor.capture_chart_patterns of codes in workers, results are yielded in completed order.
+        :param codes: [list] codes to capture (default: all codes of the pool)
+        :param chunksize: [int] tasks sent to a worker at once (default: about 4 chunks per worker)
+        :param progress: [bool] show progress bar
+        :param stats: [dict] window counts of all codes and patterns are added into it
+        :param measure: [str] 'frechet' or 'dtw'
+        :param band: [int] band radius of dtw (default: window_size // 10)
+        :param state: [PatternState] only windows after the state of the last query are tested,
+                      state is updated as results come (see ChartExtractor.capture_chart_patterns)
+        :param coarse: [int] downsampling factor of coarse frechet stage (see ChartExtractor.capture_chart_pattern)
+        :return: [generator] (code, captured)
+        """
+        from kostock.chart_extractor import ChartExtractor
+
+        if window_move is None:
+            window_move = window_size // 10
+        if thresholds is None:
+            thresholds = [None] * len(patterns)
+        if groups is None:
+            groups = [str(i + 1) for i in range(len(patterns))]
+        if not len(patterns) == len(thresholds) == len(groups):
+            raise ValueError('patterns, thresholds and groups must have same length')
+        thresholds = [ChartExtractor._get_default_threshold(pattern, window_size, measure) if threshold is None
+                      else threshold for pattern, threshold in zip(patterns, thresholds)]
+        query = {'patterns': [list(pattern) for pattern in patterns], 'thresholds': thresholds,
+                 'groups': list(groups), 'window_size': window_size, 'window_move': window_move,
+                 'moving_avg': moving_avg, 'min_diff_ratio': min_diff_ratio, 'max_diff_ratio': max_diff_ratio,
+                 'start_date': start_date, 'end_date': end_date, 'measure': measure, 'band': band,
+                 'coarse': coarse}
+        if state is not None and (start_date or end_date):
+            raise ValueError('state is used for whole chart only')
+        keys = {}  # {code: query key of each pattern}
+        tasks = []
+        for code in (self._tasks if codes is None else codes):
+            positions = None
+            if state is not None:
+                keys[code] = [state.make_key(code, pattern, threshold, window_size, window_move, self.price_opt,
+                                             moving_avg, min_diff_ratio, max_diff_ratio, measure, band)
+                              for pattern, threshold in zip(patterns, thresholds)]
+                positions = [state.get_position(key, self._get_days(code)) or 0 for key in keys[code]]
+            tasks.append((*self._tasks[code], positions))
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (self.process_count * 4))
+
+        results = self._pool.imap_unordered(partial(_capture_task, query), tasks, chunksize)
+        with tqdm(total=len(tasks), ascii=True, desc='Chart Pattern', disable=not progress) as pbar:
+            for code, captured, code_stats, positions in results:
+                if stats is not None:
+                    add_scan_stats(stats, code_stats)
+                if state is not None:
+                    for key, position in zip(keys[code], positions):
+                        state.set_position(key, self._get_days(code), position, moving_avg)
+                pbar.update(1)
+                yield code, captured
+
+    def capture(self, patterns, codes=None, **kwargs):
+        """
+        imap results in codes order like ChartExtractor.capture_chart_patterns_mp.
+        :return: [list] captured list of each code
+        """
+        codes = self.get_codes() if codes is None else codes
+        results = dict(self.imap(patterns, codes=codes, **kwargs))
+        return [results[code] for code in codes]
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+patternscan.py
+
+compiled chart pattern scan used by ChartExtractor.
+windows of one price array are filtered and normalized to the pattern range all at once,
+then compared with the pattern by discrete Fréchet distance (or DTW distance) in one numba call.
+only start indexes of matched windows return to Python.
+before the distance, cheap lower bounds reject windows which can not be within threshold:
+  - frechet: endpoint distance, then pattern envelope of threshold radius
+  - dtw: LB_Kim (endpoints), then LB_Keogh (pattern envelope of band radius),
+    then the banded DTW table is abandoned when a whole row is over threshold
+with coarse factor, frechet windows which pass the lower bounds are compared at 1/coarse resolution first.
+coarse lower and upper bounds (frechetdist.coarse_frdist) reject or accept most of them,
+and only windows between the bounds get the full table.
+"""
+import math
+
+import numpy as np
+from numba import jit, prange
+from numpy.lib.stride_tricks import sliding_window_view
+
+from kostock.dtw import _dtw_dp
+from kostock.frechetdist import _frdist_dp, coarse_frdist
+
+# window status
+SKIPPED = 0  # flat window or diff ratio out of range
+ENDPOINT_PRUNED = 1
+ENVELOPE_PRUNED = 2
+NOT_MATCHED = 3  # distance is evaluated
+MATCHED = 4
+INDEX_PRUNED = 5  # rejected by PatternIndex words
+COARSE_PRUNED = 6  # rejected by coarse lower bound
+COARSE_MATCHED = 7  # accepted by coarse upper bound
+
+# similarity measure
+FRECHET = 0
+DTW = 1
+MEASURES = {'frechet': FRECHET, 'dtw': DTW}
+
+SCAN_STATS = ('windows', 'skipped', 'index_pruned', 'endpoint_pruned', 'envelope_pruned', 'coarse_pruned',
+              'coarse_matched', 'evaluated', 'matched')
+
+
+def make_envelope(fr_pat, threshold):
+    """
+    Envelope of pattern values for lower bound.
+    window point i can be within threshold only from pattern points j with |i - j| < threshold
+    (x distance of the others is threshold or more), so its nearest pattern value is in [lower[i], upper[i]].
+    :param fr_pat: [(window_size, 2) float array] pattern points
+    :param threshold: [float] frechet distance threshold
+    :return: [tuple] (lower array, upper array)
+    """
+    values = fr_pat[:, 1]
+    radius = len(values) if threshold > len(values) else max(math.ceil(threshold) - 1, 0)
+    lower = np.empty(len(values), dtype=np.float64)
+    upper = np.empty(len(values), dtype=np.float64)
+    for i in range(len(values)):
+        band = values[max(i - radius, 0):i + radius + 1]
+        lower[i], upper[i] = band.min(), band.max()
+    return lower, upper
+
+
+def make_dtw_envelope(fr_pat, band):
+    """
+    LB_Keogh envelope of pattern values.
+    window point i is coupled only with pattern points j with |i - j| <= band,
+    so its nearest pattern value is in [lower[i], upper[i]].
+    :param fr_pat: [(window_size, 2) float array] pattern points
+    :param band: [int] Sakoe-Chiba band radius
+    :return: [tuple] (lower array, upper array)
+    """
+    values = fr_pat[:, 1]
+    lower = np.empty(len(values), dtype=np.float64)
+    upper = np.empty(len(values), dtype=np.float64)
+    for i in range(len(values)):
+        band_values = values[max(i - band, 0):i + band + 1]
+        lower[i], upper[i] = band_values.min(), band_values.max()
+    return lower, upper
+
+
+@jit(nopython=True, cache=True)
+def _lower_bound_status(window, fr_pat, lower, upper, threshold):
+    """
+    :return: [int] ENDPOINT_PRUNED or ENVELOPE_PRUNED when distance is surely threshold or more, else NOT_MATCHED
+    """
+    # first and last points are always coupled (their x is same, so distance is y difference)
+    n = window.shape[0]
+    for i in (0, n - 1):
+        diff = window[i, 1] - fr_pat[i, 1]
+        if math.sqrt(diff * diff) >= threshold:
+            return ENDPOINT_PRUNED
+    # every window point is coupled with at least one pattern point
+    for i in range(n):
+        value = window[i, 1]
+        if value > upper[i]:
+            diff = value - upper[i]
+        elif value < lower[i]:
+            diff = lower[i] - value
+        else:
+            continue
+        if math.sqrt(diff * diff) >= threshold:
+            return ENVELOPE_PRUNED
+    return NOT_MATCHED
+
+
+@jit(nopython=True, cache=True)
+def _dtw_lower_bound_status(window, values, lower, upper, limit):
+    """
+    :param limit: [float] limit of the sum of squared differences (threshold ** 2 * window_size)
+    :return: [int] ENDPOINT_PRUNED (LB_Kim) or ENVELOPE_PRUNED (LB_Keogh) when distance is surely threshold or more,
+             else NOT_MATCHED
+    """
+    # LB_Kim: first and last points are always coupled
+    n = window.shape[0]
+    diff = window[0] - values[0]
+    lb = diff * diff
+    if n > 1:
+        diff = window[n - 1] - values[n - 1]
+        lb += diff * diff
+    if lb >= limit:
+        return ENDPOINT_PRUNED
+    # LB_Keogh: every window point is coupled with a pattern point in its envelope, abandoned at limit
+    lb = 0.
+    for i in range(n):
+        value = window[i]
+        if value > upper[i]:
+            diff = value - upper[i]
+        elif value < lower[i]:
+            diff = lower[i] - value
+        else:
+            continue
+        lb += diff * diff
+        if lb >= limit:
+            return ENVELOPE_PRUNED
+    return NOT_MATCHED
+
+
+@jit(nopython=True, cache=True)
+def rolling_extrema(prices, window_size):
+    """
+    Max and min of every window prices[i:i + window_size] in O(n) by monotonic deques.
+    with NaN, every window is compared one by one like built-in max, min (NaN is skipped unless it is first).
+    :return: [tuple] (max array, min array), length is len(prices) - window_size + 1
+    """
+    n = len(prices) - window_size + 1
+    max_vals = np.empty(n, dtype=np.float64)
+    min_vals = np.empty(n, dtype=np.float64)
+    if np.isnan(prices).any():
+        for start in range(n):
+            max_val = min_val = prices[start]
+            for i in range(start + 1, start + window_size):
+                if prices[i] > max_val:
+                    max_val = prices[i]
+                if prices[i] < min_val:
+                    min_val = prices[i]
+            max_vals[start], min_vals[start] = max_val, min_val
+        return max_vals, min_vals
+
+    max_q = np.empty(len(prices), dtype=np.int64)  # indexes of decreasing values
+    min_q = np.empty(len(prices), dtype=np.int64)  # indexes of increasing values
+    max_head = max_tail = min_head = min_tail = 0
+    for i in range(len(prices)):
+        while max_tail > max_head and prices[max_q[max_tail - 1]] <= prices[i]:
+            max_tail -= 1
+        max_q[max_tail] = i
+        max_tail += 1
+        while min_tail > min_head and prices[min_q[min_tail - 1]] >= prices[i]:
+            min_tail -= 1
+        min_q[min_tail] = i
+        min_tail += 1
+        start = i - window_size + 1
+        if start >= 0:
+            if max_q[max_head] < start:
+                max_head += 1
+            if min_q[min_head] < start:
+                min_head += 1
+            max_vals[start] = prices[max_q[max_head]]
+            min_vals[start] = prices[min_q[min_head]]
+    return max_vals, min_vals
+
+
+def normalize_windows(prices, window_size, pattern, min_diff_ratio=0, max_diff_ratio=float('inf')):
+    """
+    Window filter and rescale factors of every window at once.
+    flat windows and windows out of diff ratio range are not valid,
+    valid window is rescaled by (prices - min_val) * scale + min(pattern).
+    :return: [tuple] (valid bool array, min array, scale array), length is len(prices) - window_size + 1
+    """
+    valid, min_vals, cht_diff = _filter_windows(prices, window_size, min_diff_ratio, max_diff_ratio)
+    return valid, min_vals, _get_scale(pattern, cht_diff)
+
+
+def _filter_windows(prices, window_size, min_diff_ratio, max_diff_ratio):
+    # pattern independent part of normalize_windows, (valid, min array, max - min array)
+    max_vals, min_vals = rolling_extrema(prices, window_size)
+    cht_diff = max_vals - min_vals
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cht_diff_ratio = cht_diff / min_vals * 100  # percent unit
+    valid = (min_vals != 0) & (cht_diff != 0) & (min_diff_ratio <= cht_diff_ratio) & \
+            (cht_diff_ratio <= max_diff_ratio)
+    return valid, min_vals, cht_diff
+
+
+def _get_scale(pattern, cht_diff):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (max(pattern) - min(pattern)) / cht_diff
+
+
+@jit(nopython=True, cache=True)
+def _match_window(window, fr_pat, threshold, prune, lower, upper, measure, band, coarse):
+    """
+    :param window: [(window_size,) float array] rescaled window prices
+    :param lower, upper: [float array] envelope of the measure (make_envelope or make_dtw_envelope)
+    :param coarse: [int] downsampling factor of the coarse frechet stage (1 or less: no coarse stage)
+    :return: [int] window status
+    """
+    if measure == DTW:
+        limit = threshold * threshold * len(window)
+        values = fr_pat[:, 1]
+        if prune:
+            status = _dtw_lower_bound_status(window, values, lower, upper, limit)
+            if status != NOT_MATCHED:
+                return status
+        if _dtw_dp(window, values, band, limit) < limit:
+            return MATCHED
+        return NOT_MATCHED
+    points = np.empty((len(window), 2), dtype=np.float64)
+    for j in range(len(window)):
+        points[j, 0] = j
+        points[j, 1] = window[j]
+    if prune:
+        status = _lower_bound_status(points, fr_pat, lower, upper, threshold)
+        if status != NOT_MATCHED:
+            return status
+    if coarse > 1:
+        if coarse_frdist(points, fr_pat, coarse, threshold) >= threshold:
+            return COARSE_PRUNED
+        if coarse_frdist(points, fr_pat, coarse, threshold, True) < threshold:
+            return COARSE_MATCHED
+    if _frdist_dp(points, fr_pat, threshold) < threshold:
+        return MATCHED
+    return NOT_MATCHED
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def _match_windows(windows, status, scales, min_pats, fr_pats, thresholds, prune, lowers, uppers, measure, band,
+                   coarse):
+    """
+    Test every pattern against every window, each window is rescaled to each pattern range.
+    :param windows: [(n, window_size) float array] window prices minus window min
+    :param status: [(patterns, n) int8 array] NOT_MATCHED where window is tested, status is written into it
+    :param scales: [(patterns, n) float array] rescale factor of each pattern and window
+    """
+    for k in prange(windows.shape[0]):
+        window = np.empty(windows.shape[1], dtype=np.float64)
+        for p in range(status.shape[0]):
+            if status[p, k] != NOT_MATCHED:
+                continue
+            for j in range(windows.shape[1]):
+                window[j] = windows[k, j] * scales[p, k] + min_pats[p]
+            status[p, k] = _match_window(window, fr_pats[p], thresholds[p], prune, lowers[p], uppers[p],
+                                         measure, band, coarse)
+
+
+@jit(nopython=True, cache=True)
+def _walk_windows(prices, status, window_move, window_size, valid, min_vals, scale, min_pat,
+                  fr_pat, threshold, prune, lower, upper, measure, band, coarse):
+    # window moves by window_move, or by window_size after a match.
+    # windows on window_move grid are already tested, the others are tested here
+    hits = np.empty(len(prices) // window_size + 1, dtype=np.int64)
+    off_grid = np.zeros(COARSE_MATCHED + 1, dtype=np.int64)  # status counts of windows tested here
+    n_hits = 0
+    days = 0
+    while days + window_size <= len(prices):
+        if days % window_move == 0:
+            window_status = status[days // window_move]
+        else:
+            window_status = SKIPPED
+            if valid[days]:
+                window = (prices[days:days + window_size] - min_vals[days]) * scale[days] + min_pat
+                window_status = _match_window(window, fr_pat, threshold, prune, lower, upper, measure, band,
+                                              coarse)
+            off_grid[window_status] += 1
+        hit = window_status == MATCHED or window_status == COARSE_MATCHED
+        if hit:
+            hits[n_hits] = days
+            n_hits += 1
+            days += window_size
+        else:
+            days += window_move
+    return hits[:n_hits], off_grid
+
+
+def scan_chart_pattern(prices, pattern, fr_pat, window_size, window_move, threshold,
+                       min_diff_ratio=0, max_diff_ratio=float('inf'), prune=True, candidates=None, stats=None,
+                       measure='frechet', band=None, coarse=None):
+    """
+    Find windows which match the pattern with ChartExtractor.capture_chart_pattern rules.
+    filter and rescale of all windows are vectorized, windows on window_move grid are tested in parallel,
+    then matches are taken from the start skipping window_size after each match.
+    :param prices: [(n,) float array] chart prices
+    :param pattern: [(1,) int list] pattern, window is normalized to its min-max range
+    :param fr_pat: [(window_size, 2) float array] pattern points from ChartExtractor._trans_pat_to_frpat
+    :param window_size: [int] chart pattern window size
+    :param window_move: [int] window moving value in chart
+    :param threshold: [float] distance threshold
+    :param min_diff_ratio: [float] minimum chart difference ratio (percent unit)
+    :param max_diff_ratio: [float] maximum chart difference ratio (percent unit)
+    :param prune: [bool] reject windows by lower bounds before the distance (result is same)
+    :param candidates: [bool array] candidate flag of each window on window_move grid from PatternIndex,
+                       the others are not matched (windows off the grid are always tested)
+    :param stats: [dict] window counts of SCAN_STATS keys are added into it
+    :param measure: [str] 'frechet' (discrete Fréchet distance of (x, price) points)
+                    or 'dtw' (DTW distance of prices, see dtw.dtw)
+    :param band: [int] Sakoe-Chiba band radius of dtw (default: window_size // 10)
+    :param coarse: [int] frechet windows are compared downsampled by this factor before the full table
+                   (ex. 4 for window_size 120 ~ 250, result is same, default: no coarse stage)
+    :return: [int array] start indexes of matched windows
+    """
+    return scan_chart_patterns(prices, [pattern], [fr_pat], window_size, window_move, [threshold],
+                               min_diff_ratio, max_diff_ratio, prune, [candidates], stats, measure, band,
+                               coarse)[0]
+
+
+def scan_chart_patterns(prices, patterns, fr_pats, window_size, window_move, thresholds,
+                        min_diff_ratio=0, max_diff_ratio=float('inf'), prune=True, candidates=None, stats=None,
+                        measure='frechet', band=None, coarse=None):
+    """
+    scan_chart_pattern of many patterns in one pass.
+    window filter and window min are computed once, every grid window is tested with all patterns in parallel.
+    each pattern has its own matches (window_size skip after a match is separate by pattern).
+    :param patterns: [list] patterns
+    :param fr_pats: [list] pattern points of each pattern
+    :param thresholds: [list] distance threshold of each pattern
+    :param candidates: [list] candidates of each pattern (None item means all windows)
+    :param stats: [dict] window counts of all patterns are added into it
+    :return: [list] start index array of each pattern
+    """
+    if window_move < 1:
+        raise ValueError('window_move must be 1 or more')
+    if measure not in MEASURES:
+        raise ValueError(f"measure must be one of {list(MEASURES)}")
+    band = window_size // 10 if band is None else int(band)
+    if band < 0:
+        raise ValueError('band must be 0 or more')
+    if coarse is not None and coarse > 1 and measure != 'frechet':
+        raise ValueError('coarse stage is for frechet measure only')
+    coarse = 0 if coarse is None else int(coarse)
+    if not len(patterns) == len(fr_pats) == len(thresholds):
+        raise ValueError('patterns, fr_pats and thresholds must have same length')
+    if not patterns:
+        return []
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    fr_pats = np.array(fr_pats, dtype=np.float64).reshape(len(patterns), -1, 2)
+    if fr_pats.shape[1] != window_size:
+        raise ValueError('fr_pat must have window_size points')
+    if candidates is None:
+        candidates = [None] * len(patterns)
+    if len(prices) < window_size:
+        return [np.empty(0, dtype=np.int64) for _ in patterns]
+    min_pats = np.array([min(pattern) for pattern in patterns], dtype=np.float64)
+    thresholds = np.array(thresholds, dtype=np.float64)
+    if measure == 'dtw':
+        envelopes = [make_dtw_envelope(fr_pat, band) for fr_pat in fr_pats]
+    else:
+        envelopes = [make_envelope(fr_pat, threshold) for fr_pat, threshold in zip(fr_pats, thresholds)]
+    lowers = np.array([lower for lower, _ in envelopes])
+    uppers = np.array([upper for _, upper in envelopes])
+
+    valid, min_vals, cht_diff = _filter_windows(prices, window_size, min_diff_ratio, max_diff_ratio)
+    scales = np.array([_get_scale(pattern, cht_diff) for pattern in patterns])
+    starts = np.arange(0, len(prices) - window_size + 1, window_move)
+    status = np.full((len(patterns), len(starts)), SKIPPED, dtype=np.int8)
+    status[:, valid[starts]] = NOT_MATCHED
+    for p, pattern_candidates in enumerate(candidates):
+        if pattern_candidates is not None:
+            if len(pattern_candidates) != len(starts):
+                raise ValueError('candidates must have a flag of every window on window_move grid')
+            status[p, (status[p] == NOT_MATCHED) & ~pattern_candidates] = INDEX_PRUNED
+    tested = (status == NOT_MATCHED).any(axis=0)
+    tested_starts = starts[tested]
+    windows = sliding_window_view(prices, window_size)[tested_starts] - min_vals[tested_starts, None]
+    tested_status = np.ascontiguousarray(status[:, tested])
+    _match_windows(windows, tested_status, np.ascontiguousarray(scales[:, tested_starts]), min_pats, fr_pats,
+                   thresholds, prune, lowers, uppers, MEASURES[measure], band, coarse)
+    status[:, tested] = tested_status
+
+    all_hits = []
+    counts = np.zeros(COARSE_MATCHED + 1, dtype=np.int64)
+    for p in range(len(patterns)):
+        hits, off_grid = _walk_windows(prices, status[p], window_move, window_size, valid, min_vals, scales[p],
+                                       min_pats[p], fr_pats[p], thresholds[p], prune, lowers[p], uppers[p],
+                                       MEASURES[measure], band, coarse)
+        all_hits.append(hits)
+        counts += np.bincount(status[p], minlength=COARSE_MATCHED + 1) + off_grid
+    if stats is not None:
+        add_scan_stats(stats, {'windows': int(counts.sum()),
+                               'skipped': int(counts[SKIPPED]),
+                               'index_pruned': int(counts[INDEX_PRUNED]),
+                               'endpoint_pruned': int(counts[ENDPOINT_PRUNED]),
+                               'envelope_pruned': int(counts[ENVELOPE_PRUNED]),
+                               'coarse_pruned': int(counts[COARSE_PRUNED]),
+                               'coarse_matched': int(counts[COARSE_MATCHED]),
+                               'evaluated': int(counts[NOT_MATCHED] + counts[MATCHED]),
+                               'matched': int(counts[MATCHED] + counts[COARSE_MATCHED])})
+    return all_hits
+
+
+def add_scan_stats(stats, other):
+    """
+    Add window counts of other into stats.
+    :param stats: [dict] {SCAN_STATS key: count}
+    :param other: [dict] {SCAN_STATS key: count}
+    """
+    for key in SCAN_STATS:
+        stats[key] = stats.get(key, 0) + other.get(key, 0)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+patternstate.py
+
+resume points of chart pattern scans, so a scan after the daily update tests only windows with new bars.
+window walk of a pattern is fixed from the chart start (window_move, or window_size after a match),
+so the walk position after the last tested window is all that is needed to continue it.
+a window is final when it ends before the last moving_avg bars (centered moving average of them changes
+with new bars), the walk stops at the first window which is not final and the next scan starts from it.
+position is kept as (date of a bar, bars after it) and the chart is read from that date,
+it must be moving_avg bars or more before the position for the moving average of the first new window.
+charts must only grow at the end, when the date is not in the chart any more the chart is scanned from the start.
+state file is a json of {query key: [day number of the date, bars after it]}.
+"""
+import json
+import os
+
+import numpy as np
+
+from kostock.chartstore import conv_date_to_day
+from kostock.patternscan import scan_chart_patterns
+
+
+class PatternState:
+    def __init__(self, path=None):
+        """
+        :param path: [str] state file (default: state is kept in memory only)
+        """
+        self.path = path
+        self._states = {}  # {query key: [day number, bars after it]}
+        if path is not None and os.path.isfile(path):
+            with open(path) as f:
+                self._states = json.load(f)
+
+    def __len__(self):
+        return len(self._states)
+
+    @staticmethod
+    def make_key(code, pattern, threshold, window_size, window_move, price_opt, moving_avg, min_diff_ratio,
+                 max_diff_ratio, measure='frechet', band=None):
+        """
+        :return: [str] key of the query, every parameter which changes the window walk is in it
+        """
+        return json.dumps([code, [float(value) for value in pattern], float(threshold), window_size, window_move,
+                           price_opt, moving_avg or 0, float(min_diff_ratio), float(max_diff_ratio), measure, band])
+
+    def get_read_day(self, keys):
+        """
+        :param keys: [list] query keys
+        :return: [int] day number the chart is read from for all keys, None when a key has no state
+        """
+        states = [self._states.get(key) for key in keys]
+        if not states or any(state is None for state in states):
+            return None
+        return min(day for day, _ in states)
+
+    def get_position(self, key, days):
+        """
+        :param key: [str] query key
+        :param days: [int array] day numbers of the chart bars
+        :return: [int] walk position in days, None when there is no state or its date is not in the chart
+        """
+        state = self._states.get(key)
+        if state is None:
+            return None
+        day, after = state
+        i = int(np.searchsorted(days, day))
+        if i == len(days) or days[i] != day:  # chart is changed
+            return None
+        return i + after
+
+    def set_position(self, key, days, position, moving_avg=None):
+        """
+        :param key: [str] query key
+        :param days: [int array] day numbers of the chart bars
+        :param position: [int] walk position in days
+        :param moving_avg: [int] moving average, the date is kept moving_avg bars before position
+        """
+        if len(days) == 0:
+            self._states.pop(key, None)
+            return
+        i = max(0, min(position - (moving_avg or 0), len(days) - 1))
+        self._states[key] = [int(days[i]), int(position - i)]
+
+    def clear(self, code=None):
+        """
+        :param code: [str] remove states of the code only (default: all states)
+        """
+        if code is None:
+            self._states = {}
+        else:
+            self._states = {key: state for key, state in self._states.items() if json.loads(key)[0] != code}
+
+    def save(self):
+        """
+        Write states into the state file.
+        """
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self._states, f)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def get_days(dates):
+    """
+    :param dates: [list] chart dates
+    :return: [int array] day numbers
+    """
+    return np.array([conv_date_to_day(date) for date in dates], dtype=np.int64)
+
+
+def scan_from(prices, positions, patterns, fr_pats, window_size, window_move, thresholds, moving_avg=None,
+              min_diff_ratio=0, max_diff_ratio=float('inf'), stats=None, measure='frechet', band=None, coarse=None):
+    """
+    Continue window walk of each pattern from its position over final windows.
+    patterns at same position are scanned together by scan_chart_patterns.
+    :param prices: [(n,) float array] chart prices
+    :param positions: [list] walk position of each pattern
+    :param moving_avg: [int] windows in the last moving_avg bars are not final
+    :return: [tuple] (start index array of each pattern, next walk position of each pattern)
+    """
+    final_length = len(prices) - (moving_avg or 0)
+    all_hits, next_positions = [None] * len(patterns), [None] * len(patterns)
+    for position in sorted(set(positions)):
+        group = [p for p in range(len(patterns)) if positions[p] == position]
+        group_hits = scan_chart_patterns(prices[position:max(final_length, position)],
+                                         [patterns[p] for p in group], [fr_pats[p] for p in group], window_size,
+                                         window_move, [thresholds[p] for p in group], min_diff_ratio,
+                                         max_diff_ratio, stats=stats, measure=measure, band=band, coarse=coarse)
+        for p, hits in zip(group, group_hits):
+            hits = hits + position
+            walk = hits[-1] + window_size if len(hits) else position
+            if walk + window_size <= final_length:  # steps of window_move until the window is not final
+                walk += -(-(final_length - window_size + 1 - walk) // window_move) * window_move
+            all_hits[p], next_positions[p] = hits, int(walk)
+    return all_hits, next_positions
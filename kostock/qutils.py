@@ -3,9 +3,9 @@
 qutils.py
 """
 import datetime
+from collections import defaultdict
 import numpy as np
 import timeit
-import requests
 import urllib.parse
 
 
@@ -48,6 +48,8 @@ def get_holidays(year, url, service_key):
     Return
     - dates[1-dim tuple] : market closed day (without weekends)
     """
+    import requests
+
     payload = {'solYear': str(year),
                'numOfRows': '50',
                '_type': 'json',
@@ -127,3 +129,43 @@ def nangmean(arr, axis=None):
     valids = np.sum(~np.isnan(arr), axis=axis)
     prod = np.nanprod(arr, axis=axis)
     return np.power(prod, 1. / valids)
+
+
+def slice_future_prices(days, closes, entry_days, number_of_days):
+    """
+    Slice previous day price and number_of_days + 1 prices from each entry day.
+    same with StockDB.get_future_price_list for many entries of one company.
+    :param days:[(n,) int array] sorted chart day numbers
+    :param closes:[(n,) array] close prices of days
+    :param entry_days:[(m,) int array] entry day numbers
+    :param number_of_days:[int] number of days after entry day
+    :return:[(m, number_of_days + 2) float array] price matrix, nan if price does not exist.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    idx = np.searchsorted(days, entry_days, side='left')  # first day >= entry day
+    pos = idx[:, None] + np.arange(-1, number_of_days + 1)
+    valid = (pos < len(days)) & (idx[:, None] > 0)  # no previous day, no prices
+    matrix = np.full(pos.shape, np.nan)
+    matrix[valid] = closes[pos[valid]]
+    return matrix
+
+
+def make_future_price_matrix(entries, get_close_series, number_of_days):
+    """
+    Make future price matrix of all entries, each company chart is read once.
+    :param entries:[(n, 2) dim] [(code, date), ...]
+    :param get_close_series:[function] code -> (sorted day number array, close array)
+    :param number_of_days:[int] number of days after entry date
+    :return:[(n, number_of_days + 2) float array] price matrix, nan if price does not exist.
+    """
+    matrix = np.full((len(entries), number_of_days + 2), np.nan)
+    if not entries:
+        return matrix
+    entry_days = np.array([date for _, date in entries], dtype='datetime64[D]').astype(np.int64)
+    groups = defaultdict(list)
+    for i, (code, _) in enumerate(entries):
+        groups[code].append(i)
+    for code, idx in groups.items():
+        days, closes = get_close_series(code)
+        matrix[idx] = slice_future_prices(days, closes, entry_days[idx], number_of_days)
+    return matrix
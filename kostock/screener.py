@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+screener.py
+
+screening rule language over the market panel, used by ChartExtractor.capture_rule.
+rule is a Python-like expression, ex) "cross_over(close, ma(close, 20)) and run(inst > 0) >= 3"
+  - columns: open, close, high, low, volume, fore, inst, indi
+  - numbers, + - * /, comparisons (< <= > >= == !=), and / or / not (& | ~ need parentheses)
+  - ma(x, n), rsum(x, n), rmax(x, n), rmin(x, n): rolling mean, sum, max, min of the last n dates
+  - shift(x, n): value n dates before
+  - cross_over(a, b), cross_under(a, b): a goes above (below) b on the date
+  - run(cond): number of dates in a row cond is true, counted from the start date
+rule is compiled once into steps over (dates x codes) matrices, same sub-expressions are computed once.
+elementwise steps are NumPy, rolling and run steps are numba loops parallel across codes.
+rows are trading dates of the panel. value of a date without chart row is NaN, so comparisons with it are false,
+rolling windows which include it are NaN and run skips it.
+"""
+import ast
+from functools import lru_cache
+
+import numpy as np
+from numba import jit, prange
+
+from kostock.panel import PANEL_COLUMNS
+
+_ROLLING = {'ma': 0, 'rsum': 1, 'rmax': 2, 'rmin': 3}
+_BIN_OPS = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div'}
+_CMP_OPS = {ast.Lt: 'lt', ast.LtE: 'le', ast.Gt: 'gt', ast.GtE: 'ge', ast.Eq: 'eq', ast.NotEq: 'ne'}
+_BOOL_OPS = {ast.And: 'and', ast.Or: 'or', ast.BitAnd: 'and', ast.BitOr: 'or'}
+_UFUNCS = {'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.divide, 'neg': np.negative,
+           'lt': np.less, 'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal, 'eq': np.equal,
+           'ne': np.not_equal, 'and': np.logical_and, 'or': np.logical_or, 'not': np.logical_not}
+NUM, BOOL = 'number', 'bool'
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def _rolling(x, n, op):
+    out = np.full(x.shape, np.nan, dtype=np.float64)
+    for j in prange(x.shape[1]):
+        for i in range(n - 1, x.shape[0]):
+            acc = x[i, j]
+            for k in range(i - n + 1, i):
+                value = x[k, j]
+                if op <= 1:
+                    acc += value
+                elif op == 2:
+                    acc = max(acc, value) if not np.isnan(value) else np.nan
+                else:
+                    acc = min(acc, value) if not np.isnan(value) else np.nan
+            out[i, j] = acc / n if op == 0 else acc
+    return out
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def _run(cond, present, start):
+    out = np.zeros(cond.shape, dtype=np.float64)
+    for j in prange(cond.shape[1]):
+        count = 0
+        for i in range(start, cond.shape[0]):
+            if not present[i, j]:
+                continue
+            count = count + 1 if cond[i, j] else 0
+            out[i, j] = count
+    return out
+
+
+def _shift(x, n):
+    if x.ndim == 0:  # constant
+        return x
+    out = np.full(x.shape, np.nan if x.dtype != np.bool_ else False, dtype=x.dtype)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+
+class Rule:
+    def __init__(self, expr):
+        """
+        :param expr: [str] rule expression (see module doc)
+        """
+        self.expr = expr
+        self.columns = []  # panel columns used by the rule
+        self._steps = []  # [(name, argument slots, parameters)], result of step k is slot k
+        self._slots = {}  # {sub-expression key: slot}
+        try:
+            tree = ast.parse(expr.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"invalid rule '{expr}': {e.msg}") from None
+        self._result, kind, self.lookback = self._compile(tree.body)  # lookback: dates needed before start
+        if kind != BOOL:
+            raise ValueError(f"rule '{expr}' must be a condition")
+
+    def __repr__(self):
+        return f"Rule({self.expr!r})"
+
+    def evaluate(self, panel, present, start=0):
+        """
+        :param panel: [dict] {column: (dates, codes) matrix} of self.columns
+        :param present: [(dates, codes) bool array] chart row exists
+        :param start: [int] row of the start date, run is counted from it
+        :return: [(dates, codes) bool array] rule result
+        """
+        values = []
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name, args, params in self._steps:
+                args = [values[arg] for arg in args]
+                if name == 'col':
+                    values.append(np.asarray(panel[params[0]], dtype=np.float64))
+                elif name == 'const':
+                    values.append(params[0])
+                elif name == 'shift':
+                    values.append(_shift(np.asarray(args[0]), *params))
+                elif name in _ROLLING:
+                    values.append(_rolling(np.ascontiguousarray(args[0], dtype=np.float64), params[0],
+                                           _ROLLING[name]))
+                elif name == 'run':
+                    cond = np.ascontiguousarray(np.broadcast_to(args[0], present.shape))
+                    values.append(_run(cond, present, start))
+                else:
+                    values.append(_UFUNCS[name](*args))
+        return np.broadcast_to(values[self._result], present.shape)
+
+    def _add(self, name, args=(), params=()):
+        # same sub-expression is one step
+        key = (name, *args, *params)
+        if key not in self._slots:
+            self._steps.append((name, args, params))
+            self._slots[key] = len(self._steps) - 1
+        return self._slots[key]
+
+    def _compile(self, node):
+        """
+        :return: [tuple] (slot, kind, lookback)
+        """
+        if isinstance(node, ast.Name):
+            if node.id not in PANEL_COLUMNS:
+                raise ValueError(f"unknown column '{node.id}' in rule, columns are {PANEL_COLUMNS}")
+            if node.id not in self.columns:
+                self.columns.append(node.id)
+            return self._add('col', params=(node.id,)), NUM, 0
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return self._add('const', params=(float(node.value),)), NUM, 0
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+            return self._compile_op('not', [node.operand], BOOL, BOOL, node)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self._compile_op('neg', [node.operand], NUM, NUM, node)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            return self._compile_op(_BIN_OPS[type(node.op)], [node.left, node.right], NUM, NUM, node)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BOOL_OPS:
+            return self._compile_op(_BOOL_OPS[type(node.op)], [node.left, node.right], BOOL, BOOL, node)
+        if isinstance(node, ast.BoolOp):
+            slot, _, lookback = self._compile_op(_BOOL_OPS[type(node.op)], node.values[:2], BOOL, BOOL, node)
+            for value in node.values[2:]:
+                other, kind, other_lookback = self._compile(value)
+                self._check(kind, BOOL, node)
+                slot, lookback = self._add(_BOOL_OPS[type(node.op)], (slot, other)), max(lookback, other_lookback)
+            return slot, BOOL, lookback
+        if isinstance(node, ast.Compare) and all(type(op) in _CMP_OPS for op in node.ops):
+            operands = [node.left, *node.comparators]  # a < b < c is (a < b) and (b < c)
+            slot, lookback = None, 0
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                cmp_slot, _, cmp_lookback = self._compile_op(_CMP_OPS[type(op)], [left, right], NUM, BOOL, node)
+                slot = cmp_slot if slot is None else self._add('and', (slot, cmp_slot))
+                lookback = max(lookback, cmp_lookback)
+            return slot, BOOL, lookback
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self._compile_call(node.func.id, node.args, node)
+        raise ValueError(f"unsupported syntax '{ast.unparse(node)}' in rule")
+
+    def _compile_op(self, name, operands, operand_kind, kind, node, params=()):
+        slots, lookback = [], 0
+        for operand in operands:
+            slot, slot_kind, operand_lookback = self._compile(operand)
+            self._check(slot_kind, operand_kind, node)
+            slots.append(slot)
+            lookback = max(lookback, operand_lookback)
+        return self._add(name, tuple(slots), params), kind, lookback
+
+    def _compile_call(self, name, args, node):
+        if name in _ROLLING or name == 'shift':
+            if len(args) != 2 or not isinstance(args[1], ast.Constant) or type(args[1].value) is not int \
+                    or args[1].value < 1:
+                raise ValueError(f"'{ast.unparse(node)}' in rule: {name}(x, n) needs positive integer n")
+            n = args[1].value
+            if name == 'shift':
+                slot, kind, lookback = self._compile(args[0])
+                return self._add('shift', (slot,), (n,)), kind, lookback + n
+            slot, kind, lookback = self._compile_op(name, args[:1], NUM, NUM, node, (n,))
+            return slot, kind, lookback + n - 1
+        if name in ('cross_over', 'cross_under'):
+            if len(args) != 2:
+                raise ValueError(f"'{ast.unparse(node)}' in rule: {name}(a, b) needs 2 arguments")
+            now_op, prev_op = ('gt', 'le') if name == 'cross_over' else ('lt', 'ge')
+            now, _, lookback = self._compile_op(now_op, args, NUM, BOOL, node)
+            a, b = self._steps[now][1]
+            prev = self._add(prev_op, (self._add('shift', (a,), (1,)), self._add('shift', (b,), (1,))))
+            return self._add('and', (now, prev)), BOOL, lookback + 1
+        if name == 'run':
+            if len(args) != 1:
+                raise ValueError(f"'{ast.unparse(node)}' in rule: run(cond) needs 1 argument")
+            return self._compile_op('run', args, BOOL, NUM, node)
+        raise ValueError(f"unknown function '{name}' in rule")
+
+    @staticmethod
+    def _check(kind, expected, node):
+        if kind != expected:
+            raise ValueError(f"'{ast.unparse(node)}' in rule needs {expected} operands")
+
+
+@lru_cache(maxsize=128)
+def compile_rule(expr):
+    """
+    :param expr: [str] rule expression
+    :return: [Rule] compiled rule (cached by expression)
+    """
+    return Rule(expr)
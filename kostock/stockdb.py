@@ -2,22 +2,89 @@
 """
 stockdb.py
 
-this module handle MariaDB stock database
+this module handle stock database (MariaDB or SQLite)
 """
 
-import MySQLdb as mysql
+import datetime
+import os
+import threading
+import timeit
+from functools import wraps
+
+import numpy as np
 
 from kostock._pattern import Singleton
 from kostock.configurer import Configurer
+from kostock import qutils
+from kostock.chartcache import ChartCache, _MISS
+from kostock.dbbackend import get_backend
+from kostock.dbpool import ConnectionPool
+from kostock.chartstore import conv_date_to_day, conv_day_to_date
+from kostock.panel import MarketPanel, PANEL_COLUMNS, NO_VERSION
+
+CHART_COLUMNS = 'date, open, close, high, low, volume, fore, inst, indi'
+
+
+def _conv_date(date):
+    """
+    Date parameter can be date, datetime or 'YYYY-MM-DD', it is bound as date.
+    """
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    if isinstance(date, str):
+        return datetime.datetime.strptime(date[:10], '%Y-%m-%d').date()
+    return date
+
+
+def _restore_stockdb(state):
+    """
+    Unpickle StockDB as singleton of the process,
+    so multiprocessing workers reuse one connection pool for every task.
+    """
+    if StockDB not in Singleton._instances:
+        db = StockDB.__new__(StockDB)
+        db.__dict__.update(state)
+        db._session = threading.local()
+        Singleton._instances[StockDB] = db
+    return Singleton._instances[StockDB]
+
+
+def _chart_cached(func):
+    """
+    Decorator of chart read method, method(self, code, ...) result is cached by StockDB chart cache.
+    """
+    @wraps(func)
+    def cached(self, code, *args, **kwargs):
+        if not self._cache.max_bytes:
+            return func(self, code, *args, **kwargs)
+        key = (func.__name__, code, *args, *sorted(kwargs.items()))
+        version = self._get_chart_version(code)
+        data = self._cache.get(key, version)
+        if data is _MISS:
+            data = func(self, code, *args, **kwargs)
+            self._cache.put(key, version, data)
+        return data
+    return cached
 
 
 class StockDB(metaclass=Singleton):
     def __init__(self):
-        self.user_id = Configurer.DB["USER_ID"]
-        self.norm_pwd = Configurer.DB["NORM_PWD"]
-        self.db_name = Configurer.DB["STOCK_DB"]
-        self._db = None
-        self.cur = None
+        self.user_id = Configurer.DB.get("USER_ID")
+        self.norm_pwd = Configurer.DB.get("NORM_PWD")
+        self.db_name = Configurer.DB.get("STOCK_DB")
+        self.chart_layout = Configurer.DB.get("CHART_LAYOUT", "per_code")  # 'per_code' or 'long'
+        if self.chart_layout not in ('per_code', 'long'):
+            raise ValueError("CHART_LAYOUT in DB config must be 'per_code' or 'long'.")
+        self._backend = get_backend(Configurer.DB)  # MariaDB or SQLite
+        self._pool = ConnectionPool(self._backend.connect, max_size=Configurer.DB.get("POOL_SIZE", 4),
+                                    timeout=Configurer.DB.get("POOL_TIMEOUT"))
+        self._session = threading.local()  # connection and cursor borrowed by each thread
+        self._cache = ChartCache(Configurer.DB.get("CACHE_BYTES", 0))
+        self._version_ttl = Configurer.DB.get("CACHE_VERSION_TTL", 60)  # sec
+        self._chart_versions = {}  # {code: update_date in meta_update}
+        self._versions_time = None
+        self._panel = MarketPanel(Configurer.MARKET_PANEL_PATH)
+        self._statements = {}  # {(query name, table): SQL}
 
     def __enter__(self):
         self.open()
@@ -25,15 +92,132 @@ class StockDB(metaclass=Singleton):
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
+    def __reduce__(self):
+        state = self.__dict__.copy()
+        del state['_session']
+        return _restore_stockdb, (state,)
+
+    @property
+    def _db(self):
+        return self._get_open_session().con
+
+    @property
+    def cur(self):
+        return self._get_open_session().cur
+
+    def _get_open_session(self):
+        # a connection borrowed outside open/close would never be released and would hold a pool slot
+        session = self._get_session()
+        if session.con is None:
+            raise RuntimeError("StockDB has no open connection in this thread, use 'with db:' or db.open()")
+        return session
+
+    def _get_session(self):
+        session = self._session
+        if getattr(session, 'pid', None) != os.getpid():  # thread-local data is copied by fork
+            if getattr(session, 'con', None) is not None:  # connection of the parent is not closed
+                self._pool.keep_inherited(session.con)
+                self._pool.keep_inherited(session.cur)
+            session.pid = os.getpid()
+            session.depth = 0
+            session.con = None
+            session.cur = None
+        return session
+
+    def _borrow(self, session):
+        session.con = self._pool.acquire()
+        session.cur = session.con.cursor()
+
+    def _prepare(self, key, make_sql):
+        """
+        Get SQL of the query shape. SQL is made once per (query name, table) and values are bound by the driver,
+        so SQLite reuses its compiled statement and MariaDB client does not format SQL again.
+        :param key: [tuple] (query name, table name or None)
+        :param make_sql: [callable] function which returns SQL with '%s' placeholders
+        :return: [str] SQL with placeholders of the backend
+        """
+        sql = self._statements.get(key)
+        if sql is None:
+            sql = self._statements[key] = make_sql().replace('%s', self._backend.placeholder)
+        return sql
+
+    def get_table_list(self):
+        """
+        get all table names in stock database
+        :return :data[1dim] table list(table1, table2,...)
+        """
+        self.cur.execute(self._backend.get_table_list_sql())
+        return [table[0] for table in self.cur.fetchall()]
+
+    def set_pool(self, pool):
+        """
+        Replace connection pool. connections borrowed from the old pool are not returned.
+        :param pool: [ConnectionPool]
+        """
+        self._pool = pool
+        self._session = threading.local()
+
+    def get_pool_stats(self):
+        """
+        Connection pool pressure (checkout count, wait times, in use connections).
+        :return: [dict] see ConnectionPool.get_stats
+        """
+        return self._pool.get_stats()
+
+    def set_chart_cache(self, max_bytes, version_ttl=60):
+        """
+        Set chart cache size. cached chart is dropped when update_date of the chart in meta_update changes.
+        :param max_bytes: [int] maximum bytes of cached chart data (0 means cache is disabled)
+        :param version_ttl: [float] seconds to reuse update dates read from meta_update
+        """
+        self._cache = ChartCache(max_bytes)
+        self._version_ttl = version_ttl
+        self._versions_time = None
+
+    def get_cache_stats(self):
+        """
+        :return: [dict] chart cache hits, misses, evictions, invalidations, entries, bytes, max_bytes
+        """
+        return self._cache.get_stats()
+
+    def clear_chart_cache(self):
+        self._cache.clear()
+
+    def get_chart_update_date(self, code):
+        """
+        :param code: [str] company code
+        :return: [date] update_date of the chart in meta_update (reused for version_ttl seconds of set_chart_cache)
+        """
+        return self._get_chart_version(code)
+
+    def _get_chart_version(self, code):
+        now = timeit.default_timer()
+        if self._versions_time is None or now - self._versions_time > self._version_ttl:
+            self._chart_versions = {row[0][2:]: row[1] for row in self.get_chart_from_meta()}
+            self._versions_time = now
+        return self._chart_versions.get(code)
+
     def open(self):
-        self._db = mysql.connect(host='localhost', user=self.user_id,
-                                 passwd=self.norm_pwd, db=self.db_name,
-                                 )
-        self.cur = self._db.cursor()
+        """
+        Borrow a connection from the pool for this thread.
+        nested open/close pairs use the same connection.
+        """
+        session = self._get_session()
+        if session.con is None:
+            self._borrow(session)
+        session.depth += 1
 
     def close(self):
-        self.cur.close()
-        self._db.close()
+        """
+        Return the connection of this thread to the pool when the outermost open is closed.
+        """
+        session = self._get_session()
+        session.depth = max(session.depth - 1, 0)
+        if session.depth == 0 and session.con is not None:
+            session.cur.close()
+            self._pool.release(session.con)
+            session.con = None
+            session.cur = None
     
     def commit(self):
         self._db.commit()
@@ -58,8 +242,8 @@ class StockDB(metaclass=Singleton):
     
     # sinfo DML - DELETE, INSERT, UPDATE
     def delete_row_from_sinfo(self, code):  # code[str] : company code (6 digit)
-        sql = "DELETE FROM stock_info WHERE code='{0}';".format(code)
-        self.cur.execute(sql)
+        sql = self._prepare(('delete_sinfo', None), lambda: "DELETE FROM stock_info WHERE code=%s;")
+        self.cur.execute(sql, (code,))
     
     def add_row_into_sinfo(self, code, name, wics_ls, wics_ms, market, num_stocks):
         """
@@ -69,12 +253,18 @@ class StockDB(metaclass=Singleton):
         :PARAM :code[str] company code(6 digit) :name[str] company name :wics_ls[str] wics large sector
         :wics_ms[str] wics middle sector :market[str] kospi/kosdaq :num_stocks[int] number of stocks in market
         """
-        values = (code, name, wics_ls, wics_ms, market, num_stocks, 0)
-        sql = "INSERT INTO stock_info VALUES {0} "\
-              "ON DUPLICATE KEY "\
-              "UPDATE name='{1}', wics_ls='{2}', wics_ms='{3}', market='{4}', num_stocks={5};"\
-              .format(values, name, wics_ls, wics_ms, market, num_stocks)
-        self.cur.execute(sql)
+        self.add_rows_into_sinfo([(code, name, wics_ls, wics_ms, market, num_stocks)])
+
+    def add_rows_into_sinfo(self, rows):
+        """
+        Insert or update many rows into stock info table with one executemany.
+        :param rows: [2-dim] ((code, name, wics_ls, wics_ms, market, num_stocks), ...)
+        """
+        def make_sql():
+            upsert = self._backend.get_upsert_clause(('code',), ('name', 'wics_ls', 'wics_ms', 'market', 'num_stocks'))
+            return f"INSERT INTO stock_info VALUES (%s, %s, %s, %s, %s, %s, 0) {upsert};"
+        sql = self._prepare(('add_sinfo', None), make_sql)
+        self.cur.executemany(sql, rows)
    
     # sinfo DML - SELECT
     def get_code_list_from_sinfo(self):
@@ -107,17 +297,49 @@ class StockDB(metaclass=Singleton):
         return
         * data[1-dim] : data about wics, name etc 
         """
-        sql = "SELECT * FROM stock_info WHERE code='{0}';".format(code)
-        self.cur.execute(sql)
+        sql = self._prepare(('one_sinfo', None), lambda: "SELECT * FROM stock_info WHERE code=%s;")
+        self.cur.execute(sql, (code,))
         data = self.cur.fetchone()
         return data
 
     #####################################################################
     # CANDLE CHART TABLE METHOD
     # ordered by DDL-DML
+    # chart layout 'per_code' : one table 'c_{code}' per company
+    # chart layout 'long' : one table 'chart' keyed by (code, date)
+    def _chart_table(self, code):
+        return 'chart' if self.chart_layout == 'long' else f"c_{code}"
+
+    def _chart_where(self, cond=''):
+        # WHERE clause of one company chart, code condition is added in 'long' layout
+        # so parameters must start with self._chart_key(code)
+        if self.chart_layout == 'long':
+            cond = f"code=%s AND {cond}" if cond else "code=%s"
+        return f" WHERE {cond}" if cond else ''
+
+    def _chart_into(self, code, columns):
+        # INSERT target of one company chart, values must start with code in 'long' layout
+        if self.chart_layout == 'long':
+            return f"chart(code, {columns})"
+        return f"c_{code}({columns})"
+
+    def _chart_key(self, code):
+        return (code,) if self.chart_layout == 'long' else ()
+
+    def _chart_key_columns(self):
+        return ('code', 'date') if self.chart_layout == 'long' else ('date',)
+
+    def _get_chart_tables(self):
+        sql = self._backend.get_table_list_sql(like='c\\_%')
+        self.cur.execute(sql)
+        return [table[0] for table in self.cur.fetchall()]
+
     # chart DDL
     def create_chart_schema(self, code):
         # code[str] : company code (6 digit)
+        if self.chart_layout == 'long':
+            self.create_long_chart_schema()
+            return
         sql = 'CREATE TABLE c_{0}('\
               'date DATE PRIMARY KEY NOT NULL UNIQUE,'\
               'open INT UNSIGNED,'\
@@ -129,37 +351,132 @@ class StockDB(metaclass=Singleton):
               'inst INT,'\
               'indi INT);'.format(code)
         self.cur.execute(sql)
-    
+
+    def create_long_chart_schema(self, first_year=1990, last_year=None):
+        """
+        Create one chart table for all companies if it does not exist.
+        (code, date) is clustered primary key, so one company range is read sequentially.
+        (date, close, volume) index covers cross section like 'all close prices in a date'.
+        table is partitioned by year from first_year to last_year (later years are in 'pmax').
+        :param first_year: [int] first partition year
+        :param last_year: [int] last partition year (default: next year)
+        """
+        if last_year is None:
+            last_year = datetime.date.today().year + 1
+        columns = 'code CHAR(6) NOT NULL,'\
+                  'date DATE NOT NULL,'\
+                  'open INT UNSIGNED,'\
+                  'close INT UNSIGNED,' \
+                  'high INT UNSIGNED,' \
+                  'low INT UNSIGNED,'\
+                  'volume INT UNSIGNED,'\
+                  'fore INT,'\
+                  'inst INT,'\
+                  'indi INT'
+        for sql in self._backend.get_long_chart_schema_sql(columns, range(first_year, last_year + 1)):
+            self.cur.execute(sql)
+
     def drop_chart_schema(self, code):
         # code[str] : company code (6 digit)
-        sql = "DROP TABLE c_{0};".format(code)
-        self.cur.execute(sql)    
+        self._cache.invalidate(code)
+        if self.chart_layout == 'long':
+            sql = self._prepare(('drop_chart', 'chart'), lambda: "DELETE FROM chart WHERE code=%s;")
+            self.cur.execute(sql, (code,))
+        else:
+            self.cur.execute("DROP TABLE c_{0};".format(code))
 
     def drop_all_chart_schema(self):
-        sql = "SHOW TABLES WHERE Tables_in_{0} LIKE 'c_%';".format(self.db_name)
-        self.cur.execute(sql)
-        tables = self.cur.fetchall()
-        for table in tables:
-            sql = "DROP TABLE {0}".format(table[0])
+        self._cache.clear()
+        if self.chart_layout == 'long':
+            self.cur.execute("DROP TABLE IF EXISTS chart;")
+            return
+        for table in self._get_chart_tables():
+            sql = "DROP TABLE {0}".format(table)
             self.cur.execute(sql)
 
+    def migrate_chart_to_long(self, drop_old=False):
+        """
+        Copy every 'c_{code}' table into the 'chart' table (one-shot migration to 'long' layout).
+        it can be run again, rows already copied are updated. it commits every company.
+        set CHART_LAYOUT of DB config to 'long' after migration.
+        :param drop_old: [bool] drop 'c_{code}' table after copying it
+        :return: [int] number of migrated companies
+        """
+        self.create_long_chart_schema()
+        columns = CHART_COLUMNS
+        upsert = self._backend.get_upsert_clause(('code', 'date'), columns.split(', ')[1:])
+        tables = self._get_chart_tables()
+        for table in tables:
+            # 'WHERE' is needed before upsert clause in SQLite
+            sql = f"INSERT INTO chart(code, {columns}) SELECT {self._backend.placeholder}, {columns} FROM {table} "\
+                  f"WHERE date IS NOT NULL {upsert};"
+            self.cur.execute(sql, (table[2:],))
+            if drop_old:
+                self.cur.execute(f"DROP TABLE {table};")
+            self.commit()
+        return len(tables)
+
     # chart DML
     def insert_ohlc_into_chart(self, code, date, p_open, p_close, p_high, p_low, volume_q):
-        date = date.strftime('%Y-%m-%d')
-        values = (date, p_open, p_close, p_high, p_low, volume_q)
-        sql = f"INSERT INTO c_{code}(date, open, close, high, low, volume) VALUES {values} "\
-              f"ON DUPLICATE KEY "\
-              f"UPDATE open={p_open}, close={p_close}, high={p_high}, low={p_low}, volume={volume_q};"
-        self.cur.execute(sql)
+        self._upsert_rows_into_chart(code, ('open', 'close', 'high', 'low', 'volume'), [_conv_date(date)],
+                                     [(p_open, p_close, p_high, p_low, volume_q)], batch_size=None)
 
     def insert_investor_into_chart(self, code, date, fore, inst, indi):
-        date = date.strftime('%Y-%m-%d')
-        values = (date, fore, inst, indi)
-        sql = f"INSERT INTO c_{code}(date, fore, inst, indi) VALUES {values} "\
-              f"ON DUPLICATE KEY "\
-              f"UPDATE fore={fore}, inst={inst}, indi={indi};"
-        self.cur.execute(sql)
+        self._upsert_rows_into_chart(code, ('fore', 'inst', 'indi'), [_conv_date(date)],
+                                     [(fore, inst, indi)], batch_size=None)
+
+    def upsert_ohlc_df_into_chart(self, code, df, batch_size=1000):
+        """
+        Insert or update ohlc rows of the whole DataFrame with multi-row statements.
+        :param code: [str] company code (6 digit)
+        :param df: [DataFrame] req_opt10081 data, index[datetime]=date, columns=open, close, high, low, volume_q
+        :param batch_size: [int] number of rows in one statement, it is committed every batch
+        :return: [int] number of upserted rows
+        """
+        if df.empty:
+            return 0
+        rows = df[['open', 'close', 'high', 'low', 'volume_q']].to_numpy().tolist()
+        return self._upsert_rows_into_chart(code, ('open', 'close', 'high', 'low', 'volume'),
+                                            df.index.strftime('%Y-%m-%d'), rows, batch_size)
+
+    def upsert_investor_df_into_chart(self, code, df, batch_size=1000):
+        """
+        Insert or update investor rows of the whole DataFrame with multi-row statements.
+        :param code: [str] company code (6 digit)
+        :param df: [DataFrame] req_opt10060 data, index[datetime]=date, columns=fore, inst, indi
+        :param batch_size: [int] number of rows in one statement, it is committed every batch
+        :return: [int] number of upserted rows
+        """
+        if df.empty:
+            return 0
+        rows = df[['fore', 'inst', 'indi']].to_numpy().tolist()
+        return self._upsert_rows_into_chart(code, ('fore', 'inst', 'indi'), df.index.strftime('%Y-%m-%d'),
+                                            rows, batch_size)
+
+    def _upsert_rows_into_chart(self, code, columns, dates, rows, batch_size):
+        """
+        :param batch_size: [int] rows are committed every batch (None means one batch without commit)
+        """
+        self._cache.invalidate(code)
+        # MySQLdb executemany sends 'INSERT ... VALUES (...), (...), ...' for each batch
+        key = self._chart_key(code)
+        rows = [(*key, date, *row) for date, row in zip(dates, rows)]
 
+        def make_sql():
+            holders = ', '.join(['%s'] * (len(key) + len(columns) + 1))
+            upsert = self._backend.get_upsert_clause(self._chart_key_columns(), columns)
+            return f"INSERT INTO {self._chart_into(code, 'date, ' + ', '.join(columns))} VALUES ({holders}) "\
+                   f"{upsert};"
+        sql = self._prepare(('upsert_chart', self._chart_table(code), columns), make_sql)
+        if batch_size is None:
+            self.cur.executemany(sql, rows)
+            return len(rows)
+        for i in range(0, len(rows), batch_size):
+            self.cur.executemany(sql, rows[i:i + batch_size])
+            self.commit()
+        return len(rows)
+
+    @_chart_cached
     def get_all_from_chart(self, code):
         """
         get all data from the one candle chart table
@@ -168,11 +485,14 @@ class StockDB(metaclass=Singleton):
         return
         * data[2-dim] : data about price, volume etc 
         """
-        sql = "SELECT * FROM c_{0};".format(code)
-        self.cur.execute(sql)
+        table = self._chart_table(code)
+        sql = self._prepare(('all_chart', table),
+                            lambda: f"SELECT {CHART_COLUMNS} FROM {table}{self._chart_where()} ORDER BY date;")
+        self.cur.execute(sql, self._chart_key(code))
         data = self.cur.fetchall()
         return data
 
+    @_chart_cached
     def get_one_from_chart(self, code, date=None):
         """
         get one data from the one candle chart table
@@ -183,15 +503,19 @@ class StockDB(metaclass=Singleton):
         return
         * data[1-dim] : data about price, volume etc 
         """
+        table = self._chart_table(code)
         if date is None:
-            sql = "SELECT * FROM c_{0} ORDER BY date DESC LIMIT 1".format(code)
+            sql = self._prepare(('latest_chart', table), lambda: f"SELECT {CHART_COLUMNS} FROM {table}"
+                                                                 f"{self._chart_where()} ORDER BY date DESC LIMIT 1;")
+            self.cur.execute(sql, self._chart_key(code))
         else:
-            date = date.strftime('%Y-%m-%d')
-            sql = "SELECT * FROM c_{0} WHERE date='{1}'".format(code, date)
-        self.cur.execute(sql)
+            sql = self._prepare(('one_chart', table),
+                                lambda: f"SELECT {CHART_COLUMNS} FROM {table}{self._chart_where('date=%s')};")
+            self.cur.execute(sql, (*self._chart_key(code), _conv_date(date)))
         data = self.cur.fetchone()
         return data
 
+    @_chart_cached
     def get_range_from_chart(self, code, start_date, end_date):
         """
         return chart column value(price, indi,fore,inst quantity)
@@ -200,11 +524,15 @@ class StockDB(metaclass=Singleton):
         :param end_date: end date in chart table
         :return: chart table data from start date to end date
         """
-        sql = "SELECT * FROM c_{0} WHERE date BETWEEN '{1}' AND '{2}';".format(code, start_date, end_date)
-        self.cur.execute(sql)
+        table = self._chart_table(code)
+        sql = self._prepare(('range_chart', table), lambda: f"SELECT {CHART_COLUMNS} FROM {table}"
+                                                            f"{self._chart_where('date BETWEEN %s AND %s')} "
+                                                            f"ORDER BY date;")
+        self.cur.execute(sql, (*self._chart_key(code), _conv_date(start_date), _conv_date(end_date)))
         data = self.cur.fetchall()
         return data
 
+    @_chart_cached
     def get_ohlc_prev_from_chart(self, code, date, prev_days):
         """
         return chart colum value(price, institution quantity) from date-prev_days to date
@@ -213,12 +541,133 @@ class StockDB(metaclass=Singleton):
         :param prev_days: it is used limit
         :return: chart table data from date-prev_days to date
         """
-        sql = f"SELECT date, open, close, high, low, volume FROM c_{code} WHERE date <= '{date}' "\
-              f"ORDER BY date DESC LIMIT {prev_days};"
-        self.cur.execute(sql)
+        table = self._chart_table(code)
+        sql = self._prepare(('ohlc_prev_chart', table), lambda: f"SELECT date, open, close, high, low, volume "
+                                                                f"FROM {table}{self._chart_where('date <= %s')} "
+                                                                f"ORDER BY date DESC LIMIT %s;")
+        self.cur.execute(sql, (*self._chart_key(code), _conv_date(date), prev_days))
         data = self.cur.fetchall()
         return data[::-1]
 
+    # chart DML - cross section
+    def get_cross_section_from_chart(self, date, columns=('close',)):
+        """
+        get values of all companies in one date.
+        in 'long' layout it is one indexed query, in 'per_code' layout it queries every table.
+        :param date: [date] date
+        :param columns: [tuple] chart columns
+        :return: [2-dim] ((code, column values...), ...) ordered by code
+        """
+        date = _conv_date(date)
+        columns = ', '.join(columns)
+        if self.chart_layout == 'long':
+            sql = self._prepare(('cross_section', 'chart', columns),
+                                lambda: f"SELECT code, {columns} FROM chart WHERE date=%s ORDER BY code;")
+            self.cur.execute(sql, (date,))
+            return self.cur.fetchall()
+
+        data = []
+        for table in sorted(self._get_chart_tables()):
+            sql = self._prepare(('cross_section', table, columns),
+                                lambda: f"SELECT {columns} FROM {table} WHERE date=%s;")
+            self.cur.execute(sql, (date,))
+            row = self.cur.fetchone()
+            if row:
+                data.append((table[2:], *row))
+        return tuple(data)
+
+    def get_range_from_all_chart(self, start_date, end_date, columns=('close',)):
+        """
+        get values of all companies from start date to end date.
+        :param start_date: [date] start date
+        :param end_date: [date] end date
+        :param columns: [tuple] chart columns
+        :return: [2-dim] ((code, date, column values...), ...) ordered by code and date
+        """
+        params = (_conv_date(start_date), _conv_date(end_date))
+        columns = ', '.join(columns)
+        if self.chart_layout == 'long':
+            sql = self._prepare(('range_all_chart', 'chart', columns),
+                                lambda: f"SELECT code, date, {columns} FROM chart WHERE date BETWEEN %s AND %s "
+                                        f"ORDER BY code, date;")
+            self.cur.execute(sql, params)
+            return self.cur.fetchall()
+
+        data = []
+        for table in sorted(self._get_chart_tables()):
+            sql = self._prepare(('range_all_chart', table, columns),
+                                lambda: f"SELECT date, {columns} FROM {table} WHERE date BETWEEN %s AND %s "
+                                        f"ORDER BY date;")
+            self.cur.execute(sql, params)
+            data.extend((table[2:], *row) for row in self.cur.fetchall())
+        return tuple(data)
+
+    # chart DML - market panel
+    def set_market_panel_path(self, path):
+        self._panel = MarketPanel(path)
+
+    def has_market_panel(self):
+        """
+        :return: [bool] market panel files exist (panel is made by the first get_market_panel)
+        """
+        return self._panel.exists()
+
+    def get_market_panel(self, columns=('close',), start_date=None, end_date=None, refresh=False):
+        """
+        get values of all companies aligned on trading dates from the market panel files.
+        panel is made when it does not exist.
+        :param columns: [tuple] chart columns except date
+        :param start_date: [date] first date (None means the first trading date)
+        :param end_date: [date] last date (None means the last trading date)
+        :param refresh: [bool] merge charts updated after the panel was made before reading
+        :return: [tuple] (date array(datetime64[D]), code array, {column: (dates x codes) float32 matrix})
+                 missing value is NaN, matrices are read-only memory-mapped slices
+        """
+        if refresh or not self._panel.exists():
+            self.refresh_market_panel()
+        return self._panel.get(columns, start_date, end_date)
+
+    def refresh_market_panel(self, rebuild=False):
+        """
+        Merge charts whose update_date in meta_update changed into the market panel.
+        changed companies are read from their old update date, new companies are read entirely.
+        a changed company whose prices of the old update date are different (history downloaded again
+        with adjusted prices, see Update.transmit_ohlc_data) is read entirely too.
+        dropped companies stay in the panel until it is rebuilt.
+        :param rebuild: [bool] make the panel again from all charts
+        :return: [int] number of read companies
+        """
+        if rebuild:
+            self._panel.clear()
+        old_versions = self._panel.get_versions()
+        rows = []
+        versions = {}
+        for table_name, update_date, _ in self.get_chart_from_meta():
+            code = table_name[2:]
+            version = NO_VERSION if update_date is None else conv_date_to_day(update_date)
+            old_version = old_versions.get(code)
+            if old_version == version:
+                continue
+            start_day = None if old_version in (None, NO_VERSION) else old_version
+            code_rows = self._get_panel_rows(code, start_day)
+            if start_day is not None and self._panel.is_rewritten(code, code_rows):
+                code_rows = self._get_panel_rows(code)
+            rows.extend(code_rows)
+            versions[code] = version
+        if versions:
+            self._panel.merge(rows, versions)
+        return len(versions)
+
+    def _get_panel_rows(self, code, start_day=None):
+        # chart rows from start day (all rows if None) with code in front
+        table = self._chart_table(code)
+        cond = '' if start_day is None else 'date >= %s'
+        sql = self._prepare(('panel_chart', table, cond), lambda: f"SELECT date, {', '.join(PANEL_COLUMNS)} "
+                                                                  f"FROM {table}{self._chart_where(cond)};")
+        params = () if start_day is None else (conv_day_to_date(start_day),)
+        self.cur.execute(sql, (*self._chart_key(code), *params))
+        return [(code, *row) for row in self.cur.fetchall()]
+
     #####################################################################
     # META UPDATE TABLE METHOD
     # ordered by DDL-DML(del, ins, upd)-DML(select)
@@ -235,28 +684,29 @@ class StockDB(metaclass=Singleton):
         """
         insert or update stock info update date
         """
-        update_date = update_date.strftime('%Y-%m-%d')
-        sql = "INSERT INTO meta_update(table_name, update_date) "\
-              "VALUES ('stock_info', '{0}') ON DUPLICATE KEY "\
-              "UPDATE update_date='{0}'".format(update_date)
-        self.cur.execute(sql)
+        sql = self._prepare(('sinfo_date_meta', None),
+                            lambda: "INSERT INTO meta_update(table_name, update_date) VALUES ('stock_info', %s) "
+                                    + self._backend.get_upsert_clause(('table_name',), ('update_date',)) + ";")
+        self.cur.execute(sql, (_conv_date(update_date),))
 
     def insert_listing_date_into_meta(self, code, listing_date):
-        listing_date = listing_date.strftime('%Y-%m-%d')
-        sql = "INSERT INTO meta_update(table_name, listing_date) "\
-              "VALUES ('c_{0}', '{1}') ON DUPLICATE KEY "\
-              "UPDATE listing_date='{1}'".format(code, listing_date)
-        self.cur.execute(sql)
+        sql = self._prepare(('listing_date_meta', None),
+                            lambda: "INSERT INTO meta_update(table_name, listing_date) VALUES (%s, %s) "
+                                    + self._backend.get_upsert_clause(('table_name',), ('listing_date',)) + ";")
+        self.cur.execute(sql, (f"c_{code}", _conv_date(listing_date)))
 
     def update_chart_date_in_meta(self, code, update_date):
-        update_date = update_date.strftime('%Y-%m-%d')
-        sql = "UPDATE meta_update SET update_date='{0}' "\
-              "WHERE table_name='c_{1}'".format(update_date, code)
-        self.cur.execute(sql)
+        update_date = _conv_date(update_date)
+        sql = self._prepare(('chart_date_meta', None),
+                            lambda: "UPDATE meta_update SET update_date=%s WHERE table_name=%s;")
+        self.cur.execute(sql, (update_date, f"c_{code}"))
+        # chart version is advanced, cached chart of the code is old
+        self._cache.invalidate(code)
+        self._chart_versions[code] = update_date
 
     def delete_chart_table_from_meta(self, code):
-        sql = "DELETE FROM meta_update WHERE table_name='c_{0}'".format(code)
-        self.cur.execute(sql)
+        sql = self._prepare(('delete_chart_meta', None), lambda: "DELETE FROM meta_update WHERE table_name=%s;")
+        self.cur.execute(sql, (f"c_{code}",))
 
     def get_sinfo_from_meta(self):
         """
@@ -275,8 +725,8 @@ class StockDB(metaclass=Singleton):
         return
         * data[2-dim] : data about wics, name etc 
         """
-        sql = "SELECT * FROM meta_update WHERE table_name LIKE 'c_%';"
-        self.cur.execute(sql)
+        sql = self._prepare(('chart_meta', None), lambda: "SELECT * FROM meta_update WHERE table_name LIKE %s;")
+        self.cur.execute(sql, ('c_%',))
         data = self.cur.fetchall()
         return data
 
@@ -291,8 +741,8 @@ class StockDB(metaclass=Singleton):
         output : * stock_name [str]
                  - KOREAN stock name 
         """
-        sql = "SELECT name FROM Stock WHERE code='{0}';".format(code)
-        self.cur.execute(sql)
+        sql = self._prepare(('code_to_name', None), lambda: "SELECT name FROM Stock WHERE code=%s;")
+        self.cur.execute(sql, (code,))
         stock_name = self.cur.fetchone()
         
         if stock_name is None:
@@ -310,8 +760,8 @@ class StockDB(metaclass=Singleton):
         output : * stock_code [str]
                  - stock code (6 digit) 
         """
-        db_cmd = "SELECT code FROM stock_info WHERE name='{0}';".format(name)
-        self.cur.execute(db_cmd)
+        db_cmd = self._prepare(('name_to_code', None), lambda: "SELECT code FROM stock_info WHERE name=%s;")
+        self.cur.execute(db_cmd, (name,))
         stock_code = self.cur.fetchone()
         if stock_code is None:
             return None
@@ -327,6 +777,7 @@ class StockDB(metaclass=Singleton):
         return stock_bucket
 
     # DML RELATED METHOD IN DAILY CANDLE TABLE ###
+    @_chart_cached
     def get_recent_stock_price(self, code, date):
         """
         ### _get_stock_price ###
@@ -340,8 +791,11 @@ class StockDB(metaclass=Singleton):
         output : * stock_price [int]
                  - stock price by input date and code
         """
-        sql = "SELECT close FROM c_{0} WHERE date <= '{1}' ORDER BY date DESC LIMIT 1;".format(code, date)
-        self.cur.execute(sql)
+        table = self._chart_table(code)
+        sql = self._prepare(('recent_price', table), lambda: f"SELECT close FROM {table}"
+                                                             f"{self._chart_where('date <= %s')} "
+                                                             f"ORDER BY date DESC LIMIT 1;")
+        self.cur.execute(sql, (*self._chart_key(code), _conv_date(date)))
         p_close = self.cur.fetchone()
         ret_val = p_close[0] if p_close else None
         return ret_val
@@ -368,20 +822,23 @@ class StockDB(metaclass=Singleton):
                  - price list by date
         """
         
-        date = date.strftime('%Y-%m-%d')
+        params = (*self._chart_key(code), _conv_date(date))
+        table = self._chart_table(code)
         price_list = []
-        sql = f"SELECT close FROM c_{code} WHERE date < '{date}' "\
-              f"ORDER BY date DESC LIMIT 1"
-        self.cur.execute(sql)
+        sql = self._prepare(('prev_price', table), lambda: f"SELECT close FROM {table}"
+                                                           f"{self._chart_where('date < %s')} "
+                                                           f"ORDER BY date DESC LIMIT 1;")
+        self.cur.execute(sql, params)
         prev_day = self.cur.fetchone()
         if prev_day:
             price_list.append(prev_day[0])
         else:
             return [float('nan') for _ in range(number_of_days + 2)]
 
-        sql = f"SELECT close FROM c_{code} WHERE date >= '{date}' "\
-              f"ORDER BY date ASC LIMIT {number_of_days + 1}"
-        self.cur.execute(sql)
+        sql = self._prepare(('next_prices', table), lambda: f"SELECT close FROM {table}"
+                                                            f"{self._chart_where('date >= %s')} "
+                                                            f"ORDER BY date ASC LIMIT %s;")
+        self.cur.execute(sql, (*params, number_of_days + 1))
         two_dim = self.cur.fetchall()
         price_list.extend([price for one_dim in two_dim for price in one_dim])
 
@@ -391,3 +848,31 @@ class StockDB(metaclass=Singleton):
             price_list.extend(nan_list)
         
         return price_list
+
+    @_chart_cached
+    def get_close_series_from_chart(self, code):
+        """
+        get all close prices of the one candle chart table
+        :param code: [str] company code (6 digit)
+        :return: [tuple] (day number array(days from 1970-01-01), close price array) ordered by date
+        """
+        table = self._chart_table(code)
+        sql = self._prepare(('close_series', table),
+                            lambda: f"SELECT date, close FROM {table}{self._chart_where()} ORDER BY date;")
+        self.cur.execute(sql, self._chart_key(code))
+        data = self.cur.fetchall()
+        days = np.array([row[0] for row in data], dtype='datetime64[D]').astype(np.int64)
+        closes = np.array([row[1] for row in data], dtype=np.float64)
+        days.flags.writeable = False  # arrays can be shared by chart cache
+        closes.flags.writeable = False
+        return days, closes
+
+    def get_future_price_matrix(self, entries, number_of_days=130):
+        """
+        - bulk version of get_future_price_list
+        - close prices of each company are read once and sliced for all its entries
+        :param entries: [(n, 2) dim] [(code, date), ...]
+        :param number_of_days: [int] it determines row length (number_of_days + 2)
+        :return: [(n, number_of_days + 2) float array] row is same with get_future_price_list
+        """
+        return qutils.make_future_price_matrix(entries, self.get_close_series_from_chart, number_of_days)
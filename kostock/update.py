@@ -6,20 +6,17 @@ Create and update stock database
 
 """
 import datetime
-import requests
 import sys
 from collections import defaultdict
 from os.path import isfile
 from os import remove
-from bs4 import BeautifulSoup
-from tqdm import tqdm
 from multiprocessing import Process, Lock, Queue
 import pickle
 import time
 
 from kostock.stockdb import StockDB
+from kostock.chartstore import ChartStore
 from kostock import qutils
-from kostock import kiwoom
 from kostock import logs
 from kostock import data
 from kostock.configurer import Configurer
@@ -31,6 +28,7 @@ class Update:
         log = logs.Log()
         logger = log.config_log(Configurer.UPDATE_LOG_PATH, name='file')
         db = StockDB()
+        chart_db = self.get_chart_db(db=db)
         with db:
         # Init Update
             is_init = self.check_init(db=db)
@@ -44,7 +42,7 @@ class Update:
             sinfo_date, chart_date = self.get_update_date()
             if self.check_sinfo_update(db=db, update_date=sinfo_date):
                 logger.info('Stock info update start...')
-                self.update_sinfo_and_schema(db=db, update_date=sinfo_date)
+                self.update_sinfo_and_schema(db=db, update_date=sinfo_date, chart_db=chart_db)
                 if self.check_manual_transfer():
                     logger.info('To transfer chart data manually, update end...')
                     return
@@ -56,15 +54,24 @@ class Update:
 
         if update_dict:
             logger.info('Chart update start...')
-            self.update_chart_tables(db=db, update_dict=update_dict, update_date=chart_date)
+            self.update_chart_tables(db=db, update_dict=update_dict, update_date=chart_date, chart_db=chart_db)
+            if chart_db is db:
+                from kostock.patternindex import PatternIndex
+
+                # only panel and indexes made by a user before are refreshed
+                if db.has_market_panel():
+                    logger.info('Market panel refresh start...')
+                    with db:
+                        db.refresh_market_panel()
+                for index in PatternIndex.open_all(Configurer.PATTERN_INDEX_PATH):
+                    logger.info(f"Pattern index refresh start... ({index.path})")
+                    index.refresh(db)
         else:
             logger.info('Chart table update is not necessary > skipped')
         logger.info('All update is done...')
 
     def check_init(self, db):
-        sql = 'show tables;'
-        db.cur.execute(sql)
-        tables = db.cur.fetchall()
+        tables = db.get_table_list()
         if not tables:
             is_init = True
         else:
@@ -102,9 +109,29 @@ class Update:
             whether_update = True
         return whether_update
 
-    def update_sinfo_and_schema(self, db, update_date):
+    def get_chart_db(self, db):
+        """
+        Choose the backend that chart data is written to.
+        stock info and meta update data are always written to StockDB.
+        :param db: [StockDB] stock database
+        :return: [StockDB or ChartStore] chart backend
+        """
+        if Configurer.UPDATE_CHART_BACKEND == 'stockdb':
+            return db
+        elif Configurer.UPDATE_CHART_BACKEND == 'chartstore':
+            chart_db = ChartStore()
+            chart_db.open()
+            return chart_db
+        else:
+            raise ReferenceError("UPDATE_CHART_BACKEND in config file must be 'stockdb' or 'chartstore'.")
+
+    def update_sinfo_and_schema(self, db, update_date, chart_db=None):
         # there is no data in the stock market closed day and before market open.
         # weekends, Jan 1, Dec 31 etc
+        import requests
+        from tqdm import tqdm
+
+        chart_db = db if chart_db is None else chart_db
 
         logger = logs.Log().get_logger('file')
         old_code_list = tuple(i[0] for i in db.get_code_list_from_sinfo())
@@ -118,6 +145,7 @@ class Update:
                 if response.status_code == 200:  #
                     json_list = response.json()  # dictionary
                     # response.text -> return str type
+                    sinfo_rows = []
                     for json in json_list['list']:
                         ls = json['SEC_NM_KOR']  # Large sector
                         ms = json['IDX_NM_KOR'][5:]  # Medium sector
@@ -126,12 +154,12 @@ class Update:
                         market, num_stocks = self.crowling_market_and_numstocks(code)
                         #market = kiwoom.get_master_stock_info(code,)[0][0]
                         #num_stocks = kiwoom.get_master_listed_stock_cnt(code)
-                        db.add_row_into_sinfo(code=code, name=name, wics_ls=ls,
-                                              wics_ms=ms, market=market, num_stocks=num_stocks)
+                        sinfo_rows.append((code, name, ls, ms, market, num_stocks))
                         new_code_list.append(code)
                         if code not in old_code_list:
                             only_new_list.append(code)
                         pbar.update(one_wics / len(json_list['list']))
+                    db.add_rows_into_sinfo(sinfo_rows)
                 else:
                     logger.error('request fail status={0}, WICS_code={1}'.format(response.status_code, wics_code))
                     pbar.update(one_wics)
@@ -139,7 +167,7 @@ class Update:
 
             # [pbar 10%] create chart schema
             for code in only_new_list:
-                db.create_chart_schema(code=code)
+                chart_db.create_chart_schema(code=code)
                 listing_date = self.crowling_listing_date(code=code)
                 db.insert_listing_date_into_meta(code=code, listing_date=listing_date)
                 pbar.update(10 / len(only_new_list)) # 10%
@@ -149,7 +177,7 @@ class Update:
                 if old_code not in new_code_list:
                     db.delete_row_from_sinfo(code=old_code)
                     db.delete_chart_table_from_meta(code=old_code)
-                    db.drop_chart_schema(code=old_code)
+                    chart_db.drop_chart_schema(code=old_code)
                 pbar.update(9 / len(old_code_list)) # 9%
 
             # [pbar 1%] commit
@@ -158,6 +186,9 @@ class Update:
             pbar.update(1)
 
     def crowling_market_and_numstocks(self, code):
+        import requests
+        from bs4 import BeautifulSoup
+
         logger = logs.Log().get_logger('file')
         html = requests.get(qutils.get_url(data.COMPANY_MAIN_URL, code))
         if html.status_code == 200:
@@ -184,6 +215,9 @@ class Update:
         return market, num_stocks
 
     def crowling_listing_date(self, code):
+        import requests
+        from bs4 import BeautifulSoup
+
         logger = logs.Log().get_logger('file')
         html = requests.get(qutils.get_url(data.COMPANY_CORP_URL, code))
         if html.status_code == 200:
@@ -229,7 +263,8 @@ class Update:
                 # latest : update start date
         return update_dict
 
-    def update_chart_tables(self, db, update_dict, update_date):
+    def update_chart_tables(self, db, update_dict, update_date, chart_db=None):
+        chart_db = db if chart_db is None else chart_db
         log = logs.Log()
         log_queue = Queue()
         logger = log.config_queue_log(log_queue, name='queue')
@@ -239,7 +274,7 @@ class Update:
         buffer = Queue()
 
         rc = Process(target=self.receive_chart_data,
-                     args=(buffer, db, len(update_dict), update_date))
+                     args=(buffer, db, len(update_dict), update_date, chart_db))
         rc.start()
 
         tr_ohlc = Process()
@@ -248,7 +283,7 @@ class Update:
             if (not tr_ohlc.is_alive()) and (tr_ohlc.exitcode != 0):
                 logger.debug(f'tr_ohlc terminated with code {tr_ohlc.exitcode}')
                 tr_ohlc = Process(target=self.transmit_ohlc_data,
-                                  args=(buffer, update_dict, update_date, lock, log_queue, db))
+                                  args=(buffer, update_dict, update_date, lock, log_queue, chart_db))
                 tr_ohlc.start()
             if (not tr_investor.is_alive()) and (tr_investor.exitcode != 0):
                 logger.debug(f'tr_investor terminated with code {tr_investor.exitcode}')
@@ -268,32 +303,33 @@ class Update:
             if isfile(file_path):
                 remove(file_path)
 
-    def receive_chart_data(self, buffer, db, update_len, update_date):
-        with tqdm(total=update_len*2, ascii=True, desc='Chart Table UPDATE') as pbar:
+    def receive_chart_data(self, buffer, db, update_len, update_date, chart_db=None):
+        from tqdm import tqdm
+
+        chart_db = db if chart_db is None else chart_db
+        with db, chart_db, tqdm(total=update_len*2, ascii=True, desc='Chart Table UPDATE') as pbar:
             proc_list = defaultdict(int)
             while True:
                 data = buffer.get()
                 if data:
                     code, opt, df, isEnd = data
                     if opt == 10081: # ohlc data
-                        for row in df.itertuples():
-                            db.insert_ohlc_into_chart(code, getattr(row, 'Index'), getattr(row, 'open'),
-                                                      getattr(row, 'close'), getattr(row, 'high'),
-                                                      getattr(row, 'low'), getattr(row, 'volume_q'))
+                        chart_db.upsert_ohlc_df_into_chart(code, df, Configurer.UPDATE_COMMIT_BATCH_SIZE)
                     elif opt == 10060: # investor data
-                        for row in df.itertuples():
-                            db.insert_investor_into_chart(code, getattr(row, 'Index'), getattr(row, 'fore'),
-                                                          getattr(row, 'inst'), getattr(row, 'indi'))
+                        chart_db.upsert_investor_df_into_chart(code, df, Configurer.UPDATE_COMMIT_BATCH_SIZE)
                     if isEnd:
                         pbar.update(1)
                         proc_list[code] += 1
                         if proc_list[code] == 2:
                             db.update_chart_date_in_meta(code, update_date)
+                            db.commit()
 
                 elif data is None:
                     break
 
     def transmit_ohlc_data(self, buffer, update_dict, update_date, lock, log_queue, db):
+        from kostock import kiwoom
+
         log = logs.Log()
         logger = log.config_queue_log(log_queue, 'queue')
 
@@ -320,7 +356,8 @@ class Update:
             else:
                 # check par value change or stock increase or decrease
                 if update_dict[code]['last']:
-                    before_price = db.get_recent_stock_price(code, data.index[-1])
+                    with db:
+                        before_price = db.get_recent_stock_price(code, data.index[-1])
                     after_price = data.iloc[-1]['close']
                     if before_price != after_price:  # if price is not equal at the same day
                         end = update_dict[code]['last']
@@ -351,6 +388,8 @@ class Update:
         exit(exit_code)
 
     def transmit_investor_data(self, buffer, update_dict, update_date, lock, log_queue):
+        from kostock import kiwoom
+
         log = logs.Log()
         logger = log.config_queue_log(log_queue, 'queue')
 
@@ -4,7 +4,7 @@ setup_requires = [
       ]
 
 install_requires = [
-      'numpy>=1.17.0',
+      'numpy>=1.20.0',
       'pandas>=1.0.5',
       'tqdm>=4.47.0',
       'matplotlib>=3.3.3',
@@ -30,10 +30,10 @@ setup(name='ko-stock-assistant',
       packages=find_packages(),
       install_requires=install_requires,
       setup_requires=setup_requires,
-      python_requires='=3.6',
+      python_requires='>=3.9',
       classifiers=[
             'Operating System :: Microsoft :: Windows',
-            'Programming Language :: Python :: 3.6',
+            'Programming Language :: Python :: 3.9',
       ],
       long_description=open('README.md').read(),
       zip_safe=False)
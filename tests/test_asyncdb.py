@@ -0,0 +1,60 @@
+import unittest
+import asyncio
+import datetime
+import os
+import tempfile
+
+from kostock.asyncdb import AsyncStockDB
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+CODES = [f"{i:06d}" for i in range(10)]
+
+
+class AsyncStockDBTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.DB = make_sqlite_db(os.path.join(cls.TMP_DIR.name, 'stock.db'), 'per_code')
+        with cls.DB:
+            for i, code in enumerate(CODES):
+                cls.DB.create_chart_schema(code)
+                cls.DB.insert_ohlc_into_chart(code, datetime.date(2000, 1, 4), 1, i, 1, 1, 1)
+            cls.DB.commit()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.DB._pool.close_all()
+        cls.TMP_DIR.cleanup()
+
+    def setUp(self) -> None:
+        self.adb = AsyncStockDB(self.__class__.DB, max_in_flight=3)
+
+    def tearDown(self) -> None:
+        self.adb.close()
+
+    def test_method(self):
+        price = asyncio.run(self.adb.get_recent_stock_price('000005', datetime.date(2000, 1, 5)))
+        self.assertEqual(price, 5)
+        with self.assertRaises(AttributeError):
+            self.adb.not_method
+
+    def test_as_completed(self):
+        async def read():
+            return {args[0]: data async for args, data in self.adb.as_completed('get_all_from_chart',
+                                                                                [(code,) for code in CODES])}
+        data = asyncio.run(read())
+        self.assertEqual(sorted(data), CODES)
+        self.assertEqual(data['000003'][0][2], 3)
+        self.assertLessEqual(self.DB.get_pool_stats()['peak_in_use'], 3)
+
+    def test_gather(self):
+        prices = asyncio.run(self.adb.gather('get_recent_stock_price',
+                                             [(code, datetime.date(2000, 1, 5)) for code in CODES]))
+        self.assertEqual(prices, list(range(len(CODES))))
+        # synchronous methods keep working
+        with self.DB:
+            self.assertEqual(self.DB.get_recent_stock_price('000001', datetime.date(2000, 1, 5)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,38 @@
 import unittest
 import datetime
 import os
+import tempfile
 from datetime import timedelta
 
-from kostock.configurer import Configurer
+import numpy as np
+import pandas as pd
+
 from kostock.backtester import BackTester
-from kostock.stockdb import StockDB
+from tests.test_patternindex import make_ohlc
+from tests.test_stockdb_sqlite import make_sqlite_db
 
 
 class BackTesterTestCase(unittest.TestCase):
-    Configurer("config.json")
-    DB = StockDB()
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.DB = make_sqlite_db(os.path.join(cls.TMP_DIR.name, 'stock.db'), 'per_code')
+        dates = pd.bdate_range('2000-06-01', '2001-12-31')
+        with cls.DB:
+            cls.DB.create_meta_schema()
+            cls.DB.create_chart_schema('005930')
+            cls.DB.insert_listing_date_into_meta('005930', datetime.date(1975, 6, 11))
+            cls.DB.upsert_ohlc_df_into_chart('005930', make_ohlc(0, dates))
+            cls.DB.update_chart_date_in_meta('005930', dates[-1].date())
+            cls.DB.commit()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.DB._pool.close_all()
+        cls.TMP_DIR.cleanup()
 
     def setUp(self) -> None:
-        self.bt = BackTester()
+        self.bt = BackTester(self.__class__.DB)
 
     # Test start #
     @unittest.skip
@@ -22,12 +41,21 @@ class BackTesterTestCase(unittest.TestCase):
         result = self.bt.back_test()
         result.show_profit_graph()
 
+    def test_back_test(self):
+        self.bt.insert(['005930', datetime.date(2000, 12, 30), '1'])
+        result = self.bt.back_test(10).get_result_data()
+        with self.DB:
+            price = self.DB.get_future_price_list('005930', datetime.date(2000, 12, 30), 10)
+        row = result[result['code'] == '005930_0'].iloc[0]
+        self.assertEqual((row['prev_price'], row['price']), (price[0], price[1]))
+        self.assertTrue(np.allclose(row[['_' + str(i) for i in range(1, 11)]].tolist(),
+                                    np.array(price[2:]) / price[1]))
+
     def test_back_test_all(self):
         self.bt.insert(['005930', datetime.date(2000, 12, 30), '1'])
         result = self.bt.back_test()
 
-        save_path = os.path.dirname(os.path.realpath(__file__))
-        path_name = result.save_result_to_html("UNITTEST", save_path)
+        path_name = result.save_result_to_html("UNITTEST", self.TMP_DIR.name)
         self.assertTrue(os.path.exists(path_name))
 
 
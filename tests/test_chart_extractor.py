@@ -1,20 +1,50 @@
+import datetime
+import os
+import tempfile
 import unittest
-import timeit
 
-from kostock.stockdb import StockDB
-from kostock.configurer import Configurer
+import pandas as pd
+
 from kostock.chart_extractor import ChartExtractor as ce
+from kostock.distcache import DistanceCache
+from tests.test_patternindex import make_ohlc
+from tests.test_stockdb_sqlite import make_sqlite_db
 
 
 class ChartExtractorTestCase(unittest.TestCase):
-    Configurer("config.json")
-    db = StockDB()
+    CODES = ["005930", "000660"]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.db = make_sqlite_db(os.path.join(cls.TMP_DIR.name, 'stock.db'), 'per_code')
+        dates = pd.bdate_range('2010-01-04', periods=400)
+        with cls.db:
+            cls.db.create_meta_schema()
+            for i, code in enumerate(cls.CODES):
+                cls.db.create_chart_schema(code)
+                cls.db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+                cls.db.upsert_ohlc_df_into_chart(code, make_ohlc(i, dates))
+                cls.db.update_chart_date_in_meta(code, dates[-1].date())
+            cls.db.commit()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.db._pool.close_all()
+        cls.TMP_DIR.cleanup()
 
     def test_capture_chart_pattern_mp(self):
         pattern = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-        captured_1 = ce.capture_chart_pattern_mp(self.__class__.db, ["005930", "000660"], pattern, process_count=1)
-        captured_2 = ce.capture_chart_pattern_mp(self.__class__.db, ["005930", "000660"], pattern, process_count=2)
+        kwargs = {'threshold': 4, 'window_size': 30}
+        captured_1 = ce.capture_chart_pattern_mp(self.__class__.db, self.CODES, pattern, process_count=1, **kwargs)
+        captured_2 = ce.capture_chart_pattern_mp(self.__class__.db, self.CODES, pattern, process_count=2, **kwargs)
         self.assertEqual(captured_1, captured_2)
+        self.assertTrue(all(captured_1))
+        self.assertEqual(ce.capture_chart_pattern_mp(self.__class__.db, self.CODES, pattern, index=None, cache=None,
+                                                     **kwargs), captured_1)
+        for name, value in (('index', object()), ('cache', DistanceCache())):
+            with self.assertRaises(ValueError):
+                ce.capture_chart_pattern_mp(self.__class__.db, self.CODES, pattern, **{name: value}, **kwargs)
 
     @unittest.skip
     def test_capture_chart_pattern(self):
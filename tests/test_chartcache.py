@@ -0,0 +1,45 @@
+import unittest
+import datetime
+
+from kostock.chartcache import ChartCache, get_size, _MISS
+
+
+class ChartCacheTestCase(unittest.TestCase):
+    ROWS = tuple((datetime.date(2000, 1, i), 100, 110, 120, 90, 1000, 0, 0, 0) for i in range(1, 11))
+
+    def setUp(self) -> None:
+        self.cache = ChartCache(max_bytes=get_size(self.ROWS) * 2)
+
+    def test_hit_and_miss(self):
+        key = ('get_all_from_chart', '005930')
+        self.assertIs(self.cache.get(key, datetime.date(2000, 1, 10)), _MISS)
+        self.cache.put(key, datetime.date(2000, 1, 10), self.ROWS)
+        self.assertIs(self.cache.get(key, datetime.date(2000, 1, 10)), self.ROWS)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_version(self):
+        key = ('get_all_from_chart', '005930')
+        self.cache.put(key, datetime.date(2000, 1, 10), self.ROWS)
+        self.assertIs(self.cache.get(key, datetime.date(2000, 1, 11)), _MISS)
+        self.assertEqual(self.cache.get_stats()['invalidations'], 1)
+
+    def test_eviction(self):
+        for code in ('005930', '000660', '035420'):
+            self.cache.put(('get_all_from_chart', code), None, self.ROWS)
+        self.cache.get(('get_all_from_chart', '000660'), None)
+        self.cache.put(('get_all_from_chart', '005380'), None, self.ROWS)
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['evictions'], 2)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        self.assertIsNot(self.cache.get(('get_all_from_chart', '000660'), None), _MISS)
+
+    def test_invalidate(self):
+        self.cache.put(('get_all_from_chart', '005930'), None, self.ROWS)
+        self.cache.put(('get_recent_stock_price', '005930', datetime.date(2000, 1, 5)), None, 110)
+        self.cache.invalidate('005930')
+        self.assertEqual(self.cache.get_stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
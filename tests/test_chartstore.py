@@ -0,0 +1,143 @@
+import unittest
+import datetime
+import os
+import tempfile
+import math
+
+import numpy as np
+import pandas as pd
+
+from kostock.chartstore import ChartStore
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+
+class ChartStoreTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.STORE = store = ChartStore()
+        store.set_path(os.path.join(cls.TMP_DIR.name, 'store'))
+        with store:
+            store.create_chart_schema('005930')
+            store.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 5), 5800, 5580, 6060, 5520, 74680200)
+            store.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 74198350)
+            store.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 6), 5750, 5620, 5780, 5580, 54390550)
+            store.insert_investor_into_chart('005930', datetime.date(2000, 1, 4), 10, -20, 10)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.STORE.close()
+        cls.TMP_DIR.cleanup()
+
+    def setUp(self) -> None:
+        self.store = self.__class__.STORE
+
+    def test_get_range_from_chart(self):
+        data = self.store.get_range_from_chart('005930', datetime.date(2000, 1, 2), datetime.date(2000, 1, 5))
+        answer = ((datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 74198350, 10, -20, 10),
+                  (datetime.date(2000, 1, 5), 5800, 5580, 6060, 5520, 74680200, None, None, None),
+                  )
+        self.assertEqual(data, answer)
+
+    def test_get_ohlc_limit_from_chart(self):
+        data = self.store.get_ohlc_prev_from_chart('005930', datetime.date(2000, 1, 5), 2)
+        answer = ((datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 74198350),
+                  (datetime.date(2000, 1, 5), 5800, 5580, 6060, 5520, 74680200),
+                  )
+        self.assertEqual(data, answer)
+
+    def test_get_one_from_chart(self):
+        self.assertEqual(self.store.get_one_from_chart('005930')[0], datetime.date(2000, 1, 6))
+        self.assertIsNone(self.store.get_one_from_chart('005930', datetime.date(2000, 1, 3)))
+
+    def test_get_future_price_list(self):
+        price = self.store.get_future_price_list('005930', datetime.date(2000, 1, 5), 2)
+        self.assertEqual(price[:3], [6110, 5580, 5620])
+        self.assertTrue(math.isnan(price[3]))
+        price = self.store.get_future_price_list('005930', datetime.date(2000, 1, 4), 2)
+        self.assertTrue(all(math.isnan(p) for p in price))
+
+    def test_get_future_price_matrix(self):
+        dates = [datetime.date(2000, 1, 4), datetime.date(2000, 1, 5), datetime.date(2000, 1, 6)]
+        matrix = self.store.get_future_price_matrix([('005930', date) for date in dates], 2)
+        for date, row in zip(dates, matrix):
+            price = self.store.get_future_price_list('005930', date, 2)
+            self.assertTrue(np.array_equal(row, price, equal_nan=True))
+
+    def test_upsert(self):
+        with self.store:
+            self.store.create_chart_schema('000660')
+            self.store.insert_ohlc_into_chart('000660', datetime.date(2000, 1, 4), 100, 110, 120, 90, 1)
+        with self.store:
+            self.store.insert_ohlc_into_chart('000660', datetime.date(2000, 1, 4), 100, 105, 120, 90, 1)
+            self.store.insert_investor_into_chart('000660', datetime.date(2000, 1, 4), 1, 2, 3)
+        data = self.store.get_all_from_chart('000660')
+        self.assertEqual(data, ((datetime.date(2000, 1, 4), 100, 105, 120, 90, 1, 1, 2, 3),))
+        self.assertEqual(self.store.get_recent_stock_price('000660', datetime.date(2000, 1, 7)), 105)
+
+    def test_upsert_df(self):
+        index = pd.to_datetime(['20000104', '20000105'], format='%Y%m%d')
+        ohlc = pd.DataFrame(data=[[1, 2, 3, 4, 5, 5], [6, 7, 8, 9, 10, 10]], index=index,
+                            columns=('open', 'close', 'high', 'low', 'volume_q', 'volume_p'))
+        investor = pd.DataFrame(data=[[-1, 2, 3]], index=index[1:], columns=('fore', 'inst', 'indi'))
+        with self.store:
+            self.store.create_chart_schema('035420')
+            self.assertEqual(self.store.upsert_ohlc_df_into_chart('035420', ohlc), 2)
+            self.assertEqual(self.store.upsert_investor_df_into_chart('035420', investor), 1)
+            self.assertEqual(self.store.upsert_investor_df_into_chart('035420', pd.DataFrame()), 0)
+        data = self.store.get_all_from_chart('035420')
+        answer = ((datetime.date(2000, 1, 4), 1, 2, 3, 4, 5, None, None, None),
+                  (datetime.date(2000, 1, 5), 6, 7, 8, 9, 10, -1, 2, 3),
+                  )
+        self.assertEqual(data, answer)
+
+    def test_null_same_with_stockdb(self):
+        # NULL values are None in both backends, 0 is still 0
+        db = make_sqlite_db(os.path.join(self.TMP_DIR.name, 'stock.db'), 'per_code')
+        date = datetime.date(2000, 1, 4)
+        try:
+            for chart in (self.store, db):
+                with chart:
+                    chart.create_chart_schema('068270')
+                    chart.insert_ohlc_into_chart('068270', date, 100, 110, 120, 90, 0)
+                    chart.insert_ohlc_into_chart('068270', datetime.date(2000, 1, 5), 100, None, 120, 90, 5)
+                    chart.insert_investor_into_chart('068270', date, 0, None, -3)
+                    chart.commit()
+            with db:
+                answer = db.get_all_from_chart('068270')
+                self.assertEqual(answer[0], (date, 100, 110, 120, 90, 0, 0, None, -3))
+                self.assertEqual(self.store.get_all_from_chart('068270'), answer)
+                self.assertEqual(self.store.get_one_from_chart('068270'), db.get_one_from_chart('068270'))
+                self.assertEqual(self.store.get_recent_stock_price('068270', datetime.date(2000, 1, 6)),
+                                 db.get_recent_stock_price('068270', datetime.date(2000, 1, 6)))
+                self.assertTrue(np.array_equal(self.store.get_close_series_from_chart('068270')[1],
+                                               db.get_close_series_from_chart('068270')[1], equal_nan=True))
+        finally:
+            db._pool.close_all()
+
+    def test_append_in_place(self):
+        index = pd.bdate_range('2001-01-01', periods=6)
+        ohlc = pd.DataFrame(data=np.arange(30).reshape(6, 5) + 1, index=index,
+                            columns=('open', 'close', 'high', 'low', 'volume_q'))
+        investor = pd.DataFrame(data=[[1.0, np.nan, -1.0]] * 6, index=index, columns=('fore', 'inst', 'indi'))
+        with self.store:
+            self.store.create_chart_schema('051910')
+            self.store.upsert_ohlc_df_into_chart('051910', ohlc.iloc[:3])
+            self.store.upsert_investor_df_into_chart('051910', investor.iloc[:2])
+        path = os.path.join(self.store.path, '051910', 'close.npy')
+        inode = os.stat(path).st_ino
+        with self.store:  # last stored date is updated and new dates are appended
+            self.store.upsert_ohlc_df_into_chart('051910', ohlc.iloc[2:])
+            self.store.upsert_investor_df_into_chart('051910', investor.iloc[1:])
+        self.assertEqual(os.stat(path).st_ino, inode)
+        answer = tuple((date.date(), *row, 1, None, -1) for date, row in zip(index, ohlc.values.tolist()))
+        self.assertEqual(self.store.get_all_from_chart('051910'), answer)
+
+        with self.store:  # backfill writes files again
+            self.store.insert_ohlc_into_chart('051910', datetime.date(2000, 12, 29), 1, 2, 3, 4, 5)
+        self.assertEqual(self.store.get_all_from_chart('051910'),
+                         ((datetime.date(2000, 12, 29), 1, 2, 3, 4, 5, None, None, None),) + answer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import gc
+import os
+import unittest
+import pickle
+import sqlite3
+import threading
+from functools import partial
+
+from kostock.dbpool import ConnectionPool
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = ConnectionPool(partial(sqlite3.connect, ':memory:', check_same_thread=False),
+                                   max_size=2, timeout=0.1)
+
+    def test_reuse(self):
+        con = self.pool.acquire()
+        self.pool.release(con)
+        self.assertIs(self.pool.acquire(), con)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_bounded(self):
+        cons = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+        self.assertEqual(self.pool.get_stats()['peak_in_use'], 2)
+
+        threading.Timer(0.01, self.pool.release, args=(cons[0],)).start()
+        self.assertIs(self.pool.acquire(), cons[0])
+        self.assertEqual(self.pool.get_stats()['waits'], 1)
+
+    def test_pickle(self):
+        self.pool.acquire()
+        pool = pickle.loads(pickle.dumps(self.pool))
+        stats = pool.get_stats()
+        self.assertEqual(stats['size'], 0)
+        self.assertEqual(stats['max_size'], 2)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork is not supported')
+    def test_fork(self):
+        # connections of the parent are not closed or collected in a forked child
+        closed = []
+
+        class Connection:
+            def rollback(self):
+                pass
+
+            def close(self):
+                closed.append(self)
+
+            def __del__(self):
+                closed.append(self)
+
+        pool = ConnectionPool(Connection, max_size=2)
+        idle, borrowed = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                con = pool.acquire()
+                pool.release(con)
+                pool.release(borrowed)
+                pool.close_all()
+                del idle
+                gc.collect()
+                os._exit(0 if con is not borrowed and closed == [con] else 1)
+            finally:
+                os._exit(2)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        self.assertEqual(closed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
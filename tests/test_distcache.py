@@ -0,0 +1,99 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.distcache import DistanceCache, window_distances, walk_distances
+from kostock.patternscan import scan_chart_pattern
+from tests.test_patternindex import make_ohlc
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+PATTERNS = [[1, 3, 2, 5, 4], [5, 1, 5]]
+
+
+class DistanceCacheTestCase(unittest.TestCase):
+    CODES = ('005930', '000660')
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = make_sqlite_db(os.path.join(self.tmp_dir.name, 'stock.db'), 'per_code')
+        self.dates = pd.bdate_range('2010-01-04', periods=600)
+        with self.db:
+            self.db.create_meta_schema()
+            for i, code in enumerate(self.CODES):
+                self.db.create_chart_schema(code)
+                self.db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+                self.db.upsert_ohlc_df_into_chart(code, make_ohlc(i, self.dates[:500]))
+                self.db.update_chart_date_in_meta(code, self.dates[499].date())
+            self.db.commit()
+
+    def tearDown(self) -> None:
+        self.db._pool.close_all()
+        self.tmp_dir.cleanup()
+
+    def test_same_with_scan(self):
+        prices = make_ohlc(0, self.dates)['close'].to_numpy(dtype=np.float64)
+        for window_size, window_move, measure in ((30, 3, 'frechet'), (30, 4, 'frechet'), (25, 10, 'dtw')):
+            for pattern in PATTERNS:
+                fr_pat = ce._get_frpat(tuple(pattern), window_size)
+                entry = window_distances(prices, pattern, fr_pat, window_size, window_move, measure)
+                step = np.gcd(window_size, window_move)
+                for threshold in (0.5, 1, 2, 4):
+                    for ratios in ((0, float('inf')), (5, 30)):
+                        hits = walk_distances(entry, window_size, window_move, threshold, *ratios, measure)
+                        answer = scan_chart_pattern(prices, pattern, fr_pat, window_size, window_move, threshold,
+                                                    *ratios, measure=measure)
+                        self.assertEqual((hits * step).tolist(), answer.tolist())
+
+    def test_capture(self):
+        cache = DistanceCache(os.path.join(self.tmp_dir.name, 'cache'))
+        kwargs = {'window_size': 30, 'window_move': 4, 'moving_avg': 3}
+        for thresholds, ratios in (((2, 1), (0, float('inf'))), ((3, 2), (5, 20)), ((None, None), (0, 50))):
+            for code in self.CODES:
+                answer = ce.capture_chart_patterns(code, PATTERNS, self.db, thresholds, min_diff_ratio=ratios[0],
+                                                   max_diff_ratio=ratios[1], **kwargs)
+                captured = ce.capture_chart_patterns(code, PATTERNS, self.db, thresholds, min_diff_ratio=ratios[0],
+                                                     max_diff_ratio=ratios[1], cache=cache, **kwargs)
+                self.assertEqual(captured, answer)
+        self.assertEqual(len(cache), len(self.CODES) * len(PATTERNS))
+        cache.save()
+
+        cache = DistanceCache(cache.path)
+        start, end = self.dates[100].date(), self.dates[300].date()
+        self.assertEqual(ce.capture_chart_patterns('005930', PATTERNS, self.db, (2, 1), cache=cache, **kwargs),
+                         ce.capture_chart_patterns('005930', PATTERNS, self.db, (2, 1), **kwargs))
+        self.assertEqual(ce.capture_chart_pattern('005930', PATTERNS[0], self.db, 3, start_date=start, end_date=end,
+                                                  cache=cache, **kwargs),
+                         ce.capture_chart_pattern('005930', PATTERNS[0], self.db, 3, start_date=start, end_date=end,
+                                                  **kwargs))
+        with self.db:  # cache entry of updated chart is made again
+            self.db.upsert_ohlc_df_into_chart('005930', make_ohlc(0, self.dates).iloc[500:])
+            self.db.update_chart_date_in_meta('005930', self.dates[-1].date())
+            self.db.commit()
+        self.assertEqual(ce.capture_chart_patterns('005930', PATTERNS, self.db, (2, 1), cache=cache, **kwargs),
+                         ce.capture_chart_patterns('005930', PATTERNS, self.db, (2, 1), **kwargs))
+
+        cache.clear('005930')
+        self.assertEqual(len(cache), len(PATTERNS))
+        with self.assertRaises(ValueError):
+            ce.capture_chart_pattern('005930', PATTERNS[0], self.db, state=object(), cache=cache)
+
+    def test_sweep(self):
+        thresholds = [0.5, 1, 2, 3]
+        cache = DistanceCache()
+        counts = ce.sweep_chart_pattern(self.db, self.CODES, PATTERNS[0], thresholds, cache, window_size=30,
+                                        min_diff_ratio=5)
+        answer = [sum(len(ce.capture_chart_pattern(code, PATTERNS[0], self.db, threshold, window_size=30,
+                                                   min_diff_ratio=5)) for code in self.CODES)
+                  for threshold in thresholds]
+        self.assertEqual(counts, answer)
+        self.assertTrue(0 < counts[-1])
+        self.assertEqual(len(cache), len(self.CODES))
+
+
+if __name__ == '__main__':
+    unittest.main()
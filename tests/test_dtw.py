@@ -0,0 +1,57 @@
+import math
+import unittest
+
+import numpy as np
+
+from kostock.dtw import dtw
+
+
+def dtw_by_table(p, q, band):
+    # full table of dynamic time warping
+    n = len(p)
+    table = np.full((n + 1, n + 1), math.inf)
+    table[0, 0] = 0
+    for i in range(1, n + 1):
+        for j in range(1, n + 1):
+            if abs(i - j) <= band:
+                table[i, j] = (p[i - 1] - q[j - 1]) ** 2 + min(table[i - 1, j - 1], table[i - 1, j], table[i, j - 1])
+    return math.sqrt(table[n, n] / n)
+
+
+class DTWTestCase(unittest.TestCase):
+    def test_dtw(self):
+        self.assertEqual(dtw([1, 2, 3], [1, 2, 3]), 0)
+        self.assertAlmostEqual(dtw([1, 2, 3], [1, 1, 2]), math.sqrt(1 / 3))
+        self.assertAlmostEqual(dtw([1, 2, 3], [1, 1, 2], band=0), math.sqrt(2 / 3))
+
+    def test_same_with_table(self):
+        rng = np.random.default_rng(4)
+        for n in (1, 2, 7, 40):
+            p, q = rng.normal(size=n), rng.normal(size=n)
+            for band in (0, 1, 3, n):
+                self.assertAlmostEqual(dtw(p, q, band), dtw_by_table(p, q, band))
+
+    def test_threshold(self):
+        rng = np.random.default_rng(5)
+        p, q = rng.normal(size=50), rng.normal(size=50)
+        distance = dtw(p, q, 5)
+        self.assertEqual(dtw(p, q, 5, threshold=distance * 1.01), distance)
+        self.assertEqual(dtw(p, q, 5, threshold=distance * 0.99), math.inf)
+        for _ in range(300):  # rows have cells under threshold but the distance is threshold or more
+            n, band = rng.integers(1, 30), rng.integers(0, 5)
+            p, q = rng.normal(size=n), rng.normal(size=n)
+            answer = dtw_by_table(p, q, band)
+            threshold = answer * rng.uniform(0.5, 1.5)
+            result = dtw(p, q, band, threshold)
+            if answer >= threshold:
+                self.assertEqual(result, math.inf)
+            else:
+                self.assertAlmostEqual(result, answer)
+        with self.assertRaises(ValueError):
+            dtw([1, 2], [1, 2, 3])
+        with self.assertRaises(ValueError):
+            dtw([1, 2], [1, 2], band=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
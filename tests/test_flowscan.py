@@ -0,0 +1,131 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.flowscan import flow_condition, run_hits
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+
+def inst_cond_by_loop(fore, inst, th_fore, th_inst, days):
+    # row loop of ChartExtractor.capture_inst_cond before the vectorized condition
+    if th_fore != 0 and th_inst != 0:
+        mode = 'BOTH'
+    elif th_fore != 0:
+        mode = 'FORE'
+    else:
+        mode = 'INST'
+    captured = []
+    day_cnt = 0
+    for i, (f, n) in enumerate(zip(fore, inst)):
+        if mode == 'BOTH':
+            matched = bool(f and n and f >= th_fore and n >= th_inst)
+        elif mode == 'FORE':
+            matched = bool(f and f >= th_fore)
+        else:
+            matched = bool(n and n >= th_inst)
+        day_cnt = day_cnt + 1 if matched else 0
+        if day_cnt == days:
+            captured.append(i)
+    return captured
+
+
+class FlowScanTestCase(unittest.TestCase):
+    def test_same_with_loop(self):
+        rng = np.random.default_rng(3)
+        fore = rng.integers(-100, 300, size=(400, 5)).astype(np.float64)
+        inst = rng.integers(-100, 300, size=(400, 5)).astype(np.float64)
+        fore[rng.random(fore.shape) < 0.05] = 0
+        inst[rng.random(inst.shape) < 0.05] = np.nan
+        present = np.ones(fore.shape, dtype=np.bool_)
+        for th_fore, th_inst in ((10, 10), (50, 0), (0, 20), (-50, 0)):
+            for days in (1, 2, 3):
+                hits = run_hits(flow_condition(fore, inst, th_fore, th_inst), present, days)
+                for j in range(fore.shape[1]):
+                    fore_j = [None if np.isnan(v) else v for v in fore[:, j]]
+                    inst_j = [None if np.isnan(v) else v for v in inst[:, j]]
+                    self.assertEqual(np.flatnonzero(hits[:, j]).tolist(),
+                                     inst_cond_by_loop(fore_j, inst_j, th_fore, th_inst, days))
+        with self.assertRaises(ValueError):
+            flow_condition(fore, inst, 0, 0)
+
+    def test_absent_rows(self):
+        # date without chart row breaks the run
+        cond = np.array([[True], [True], [True], [True], [True]])
+        present = np.array([[True], [False], [True], [True], [True]])
+        self.assertEqual(run_hits(cond, present, 2)[:, 0].tolist(), [False, False, False, True, False])
+
+
+class MarketInstCondTestCase(unittest.TestCase):
+    def test_same_with_capture_inst_cond(self):
+        rng = np.random.default_rng(5)
+        dates = pd.bdate_range('2015-01-01', periods=300)
+        codes = ('005930', '000660', '035720')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_sqlite_db(os.path.join(tmp_dir, 'stock.db'), 'per_code')
+            db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+            with db:
+                db.create_meta_schema()
+                for i, code in enumerate(codes):
+                    index = dates[i * 20:len(dates) - i * 10]
+                    index = index[rng.random(len(index)) > 0.05]  # suspended dates
+                    df = pd.DataFrame({'open': 1000, 'close': 1000, 'high': 1000, 'low': 1000, 'volume_q': 10,
+                                       'fore': rng.integers(-50, 200, size=len(index)),
+                                       'inst': rng.integers(-50, 200, size=len(index)),
+                                       'indi': 0}, index=index)
+                    db.create_chart_schema(code)
+                    db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 4))
+                    db.upsert_ohlc_df_into_chart(code, df)
+                    db.upsert_investor_df_into_chart(code, df.iloc[:-5])  # NULL investor values
+                    db.update_chart_date_in_meta(code, index[-1].date())
+                db.commit()
+
+            for th_fore, th_inst, days in ((10, 10, 2), (0, 50, 3), (30, 0, 1)):
+                for start_date, end_date in ((None, None), (datetime.date(2015, 3, 1), datetime.date(2015, 9, 1))):
+                    # row loop over market dates, suspended date is a row without values
+                    with db:
+                        charts = {code: db.get_all_from_chart(code) if start_date is None else
+                                  db.get_range_from_chart(code, start_date, end_date) for code in codes}
+                    market_dates = sorted({row[0] for chart in charts.values() for row in chart})
+                    answer = []
+                    for code in sorted(codes):
+                        values = {row[0]: (row[6], row[7]) for row in charts[code]}
+                        fore, inst = zip(*(values.get(date, (None, None)) for date in market_dates))
+                        answer.extend([code, market_dates[i], 'g']
+                                      for i in inst_cond_by_loop(fore, inst, th_fore, th_inst, days))
+                    captured = ce.capture_inst_cond_market(db, th_fore, th_inst, days, 'g', start_date, end_date)
+                    self.assertEqual(captured, answer)
+            self.assertTrue(answer)
+            self.assertEqual(ce.capture_inst_cond_market(db, 30, 0, 1, codes=['000660']),
+                             [row for row in ce.capture_inst_cond_market(db, 30, 0, 1) if row[0] == '000660'])
+            db._pool.close_all()
+
+    def test_gap(self):
+        # run of 000660 is broken by its trading halt on 2015-01-06
+        dates = pd.bdate_range('2015-01-05', periods=4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_sqlite_db(os.path.join(tmp_dir, 'stock.db'), 'per_code')
+            db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+            with db:
+                db.create_meta_schema()
+                for code, index in (('005930', dates), ('000660', dates.delete(1))):
+                    df = pd.DataFrame({'open': 1000, 'close': 1000, 'high': 1000, 'low': 1000, 'volume_q': 10,
+                                       'fore': 100, 'inst': 100, 'indi': 0}, index=index)
+                    db.create_chart_schema(code)
+                    db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 4))
+                    db.upsert_ohlc_df_into_chart(code, df)
+                    db.upsert_investor_df_into_chart(code, df)
+                    db.update_chart_date_in_meta(code, index[-1].date())
+                db.commit()
+            captured = ce.capture_inst_cond_market(db, 10, 10, 2)
+            self.assertEqual(captured, [['000660', datetime.date(2015, 1, 8), '1'],
+                                        ['005930', datetime.date(2015, 1, 6), '1']])
+            db._pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
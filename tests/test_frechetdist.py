@@ -1,5 +1,9 @@
 import unittest
-from kostock.frechetdist import frdist
+import math
+
+import numpy as np
+
+from kostock.frechetdist import frdist, coarse_frdist
 
 class FrechetDistTestCase(unittest.TestCase):
 
@@ -36,11 +40,77 @@ class FrechetDistTestCase(unittest.TestCase):
         self.assertEqual(res, ans)
 
     def test_frdist5(self):
+        # regression of row-by-row kernel against the full table, timing is in benchmarks/bench_frdist.py
+        rng = np.random.default_rng(5)
+        for _ in range(200):
+            N = rng.integers(2, 80)
+            P = [[i, v] for i, v in enumerate(rng.normal(size=N) * 100)]
+            Q = [[i, v] for i, v in enumerate(rng.normal(size=N) * 100)]
+            self.assertAlmostEqual(frdist(P, Q), _full_table_frdist(P, Q), places=9)
+
+    def test_frdist_threshold(self):
         N = 80
-        for _ in range(5000):
-            P = [[i, i] for i in range(N)]
-            Q = [[N+i, N+i] for i in range(N)]
-            res = frdist(P, Q)
+        P = [[i, i] for i in range(N)]
+        Q = [[N+i, N+i] for i in range(N)]
+        ans = 80 * (2**0.5)
+        self.assertEqual(frdist(P, Q, threshold=ans + 1), ans)
+        self.assertEqual(frdist(P, Q, threshold=ans), math.inf)
+        self.assertEqual(frdist(P, Q, threshold=1), math.inf)
+
+    def test_frdist_threshold_last_cell(self):
+        # rows have cells under threshold but the distance is threshold or more
+        rng = np.random.default_rng(11)
+        for _ in range(300):
+            N = rng.integers(2, 30)
+            P = [[i, v] for i, v in enumerate(rng.normal(size=N) * 10)]
+            Q = [[i, v] for i, v in enumerate(rng.normal(size=N) * 10)]
+            full = _full_table_frdist(P, Q)
+            threshold = full * rng.uniform(0.5, 1.5)
+            self.assertEqual(frdist(P, Q, threshold), math.inf if full >= threshold else frdist(P, Q))
+        P = [[0, 0], [1, 0], [2, 5]]
+        Q = [[0, 0], [1, 0], [2, 0]]
+        self.assertEqual(frdist(P, Q), 5)
+        self.assertEqual(frdist(P, Q, threshold=5), math.inf)
+
+    def test_coarse_frdist(self):
+        # coarse distances are lower and upper bounds of the exact distance, factor 1 is exact
+        rng = np.random.default_rng(1)
+        for n in (1, 5, 30, 97):
+            P = np.column_stack([np.arange(n), np.cumsum(rng.normal(size=n))])
+            Q = np.column_stack([np.arange(n), np.cumsum(rng.normal(size=n))])
+            dist = frdist(P, Q)
+            self.assertEqual(coarse_frdist(P, Q, 1), dist)
+            self.assertEqual(coarse_frdist(P, Q, 1, upper=True), dist)
+            for factor in (2, 4, 7, 200):
+                self.assertLessEqual(coarse_frdist(P, Q, factor), dist)
+                self.assertGreaterEqual(coarse_frdist(P, Q, factor, upper=True), dist)
+            self.assertEqual(coarse_frdist(P, Q, 2, threshold=coarse_frdist(P, Q, 2)), math.inf)
+        # bound is inf when it is threshold or more, in both modes
+        for _ in range(200):
+            n = rng.integers(2, 40)
+            P = np.column_stack([np.arange(n), np.cumsum(rng.normal(size=n))])
+            Q = np.column_stack([np.arange(n), np.cumsum(rng.normal(size=n))])
+            for upper in (False, True):
+                bound = coarse_frdist(P, Q, 3, upper=upper)
+                threshold = bound * rng.uniform(0.5, 1.5)
+                self.assertEqual(coarse_frdist(P, Q, 3, threshold, upper),
+                                 math.inf if bound >= threshold else bound)
+
+
+def _full_table_frdist(p, q):
+    ca = np.zeros((len(p), len(q)))
+    for i in range(len(p)):
+        for j in range(len(q)):
+            d = math.dist(p[i], q[j])
+            if i == 0 and j == 0:
+                ca[i, j] = d
+            elif i == 0:
+                ca[i, j] = max(ca[i, j-1], d)
+            elif j == 0:
+                ca[i, j] = max(ca[i-1, j], d)
+            else:
+                ca[i, j] = max(min(ca[i-1, j], ca[i-1, j-1], ca[i, j-1]), d)
+    return ca[-1, -1]
 
 
 if __name__ == '__main__':
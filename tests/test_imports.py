@@ -0,0 +1,17 @@
+import subprocess
+import sys
+import unittest
+
+LAZY = ('sqlalchemy', 'matplotlib', 'mplfinance', 'jinja2', 'MySQLdb', 'PyQt5', 'bs4', 'requests')
+
+
+class ImportTestCase(unittest.TestCase):
+    def test_lazy_import(self):
+        for module in ('stockdb', 'chartstore', 'backtester', 'update', 'patternpool', 'screener'):
+            code = f"import sys, kostock.{module}; print(','.join(n for n in {LAZY} if n in sys.modules))"
+            out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+            self.assertEqual(out.stdout.strip(), '', module)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.flowscan import run_hits, flow_condition
+from kostock.kernels import warmup, KERNELS
+from kostock.patternscan import scan_chart_patterns, _match_windows, _walk_windows, rolling_extrema
+from kostock.screener import Rule, _rolling, _run
+
+
+class KernelsTestCase(unittest.TestCase):
+    def test_warmup_signatures(self):
+        # real calls after warmup use compiled code of warmup
+        elapsed = warmup()
+        self.assertEqual(set(elapsed), set(KERNELS))
+        kernels = (_match_windows, _walk_windows, rolling_extrema, run_hits, _rolling, _run)
+        signatures = [len(kernel.signatures) for kernel in kernels]
+
+        rng = np.random.default_rng(0)
+        prices = 10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=500)))
+        patterns = [[1, 3, 2, 5, 4], [5, 1, 5]]
+        fr_pats = [ce._get_frpat(tuple(pattern), 60) for pattern in patterns]
+        for kwargs in ({}, {'coarse': 4}, {'measure': 'dtw', 'band': 3}, {'prune': False}):
+            scan_chart_patterns(prices, patterns, fr_pats, 60, 6, [3, 3], **kwargs)
+        panel = {'close': rng.normal(size=(50, 3)).astype(np.float32),
+                 'inst': rng.normal(size=(50, 3)).astype(np.float32)}
+        present = np.ones((50, 3), dtype=np.bool_)
+        run_hits(flow_condition(panel['inst'], panel['inst'], 0, 1), present, 3)
+        Rule("cross_over(close, ma(close, 5)) and run(inst > 0) >= 2 and rsum(inst, 3) > 0").evaluate(panel, present)
+        self.assertEqual([len(kernel.signatures) for kernel in kernels], signatures)
+
+        with self.assertRaises(ValueError):
+            warmup(('foo',))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import datetime
+import os
+import tempfile
+
+import numpy as np
+
+from kostock.panel import MarketPanel, NO_VERSION, PANEL_COLUMNS
+
+
+class MarketPanelTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.panel = MarketPanel(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.panel.clear()
+        self.tmp_dir.cleanup()
+
+    def test_empty(self):
+        self.assertFalse(self.panel.exists())
+        self.assertEqual(self.panel.get_versions(), {})
+        dates, codes, matrices = self.panel.get(('close',))
+        self.assertEqual(matrices['close'].shape, (0, 0))
+
+    def test_merge(self):
+        day = datetime.date(2000, 1, 4)
+        self.panel.merge([('005930', day, 1, 2, 3, 4, 5, 6, 7, None)], {'005930': 10960, '000660': NO_VERSION})
+        self.assertEqual(self.panel.get_versions(), {'000660': NO_VERSION, '005930': 10960})
+
+        # new date and overwritten value
+        self.panel.merge([('005930', day, 1, 20, 3, 4, 5, 6, 7, 8),
+                          ('000660', datetime.date(2000, 1, 5), 1, 30, 3, 4, 5, 6, 7, 8)],
+                         {'005930': 10961, '000660': 10961})
+        dates, codes, matrices = self.panel.get(('close', 'indi'))
+        self.assertEqual(dates.tolist(), [day, datetime.date(2000, 1, 5)])
+        self.assertEqual(codes.tolist(), ['000660', '005930'])
+        np.testing.assert_array_equal(matrices['close'], [[np.nan, 20], [30, np.nan]])
+        np.testing.assert_array_equal(matrices['indi'], [[np.nan, 8], [8, np.nan]])
+
+        dates, codes, matrices = self.panel.get(('close',), end_date=day)
+        np.testing.assert_array_equal(matrices['close'], [[np.nan, 20]])
+
+    def test_merge_append(self):
+        # new days are appended to the same files, new code makes them again, result is same with one merge
+        rng = np.random.default_rng(3)
+        days = [datetime.date(2000, 1, 3) + datetime.timedelta(days=i) for i in range(6)]
+        make_rows = lambda code, day_list: [(code, day, *rng.normal(size=7), None) for day in day_list]
+        merges = [(make_rows('005930', days[:3]) + make_rows('000660', days[1:3]), {'005930': 1, '000660': 1}),
+                  (make_rows('005930', days[2:4]) + make_rows('000660', days[4:5]), {'005930': 2, '000660': 2}),
+                  (make_rows('005930', days[5:]), {'005930': 3}),
+                  (make_rows('035720', days[3:]), {'035720': 3})]
+        inodes = []
+        for rows, versions in merges:
+            self.panel.merge(rows, versions)
+            inodes.append(os.stat(os.path.join(self.tmp_dir.name, 'close.npy')).st_ino)
+        self.assertEqual(inodes[0], inodes[1])
+        self.assertEqual(inodes[1], inodes[2])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            answer = MarketPanel(tmp_dir)
+            answer.merge([row for rows, _ in merges for row in rows], {'005930': 3, '000660': 2, '035720': 3})
+            self.assertEqual(self.panel.get_versions(), answer.get_versions())
+            result, expected = self.panel.get(PANEL_COLUMNS), answer.get(PANEL_COLUMNS)
+            np.testing.assert_array_equal(result[0], expected[0])
+            np.testing.assert_array_equal(result[1], expected[1])
+            for col in PANEL_COLUMNS:
+                np.testing.assert_array_equal(result[2][col], expected[2][col])
+            answer.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
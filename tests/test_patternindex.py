@@ -0,0 +1,133 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.patternindex import PatternIndex
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+
+def make_ohlc(seed, dates):
+    rng = np.random.default_rng(seed)
+    close = np.round(10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=len(dates)))))
+    close[100:130] = 5000  # flat part is never matched
+    return pd.DataFrame({'open': close, 'close': close, 'high': close * 1.01, 'low': close * 0.99,
+                         'volume_q': 1000}, index=dates)
+
+
+class PatternIndexTestCase(unittest.TestCase):
+    CODES = ('005930', '000660')
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = make_sqlite_db(os.path.join(self.tmp_dir.name, 'stock.db'), 'per_code')
+        self.dates = pd.bdate_range('2010-01-04', periods=900)
+        with self.db:
+            self.db.create_meta_schema()
+            for i, code in enumerate(self.CODES):
+                self.db.create_chart_schema(code)
+                self.db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+                self.db.upsert_ohlc_df_into_chart(code, make_ohlc(i, self.dates[:800]))
+                self.db.update_chart_date_in_meta(code, self.dates[799].date())
+            self.db.commit()
+
+    def tearDown(self) -> None:
+        self.db._pool.close_all()
+        self.tmp_dir.cleanup()
+
+    def capture(self, code, pattern, threshold, window_size, window_move, index=None, **kwargs):
+        stats = {}
+        captured = ce.capture_chart_pattern(code, pattern, self.db, threshold=threshold, window_size=window_size,
+                                            window_move=window_move, index=index, stats=stats, **kwargs)
+        return captured, stats
+
+    def test_same_with_scan(self):
+        pruned = 0
+        for moving_avg in (None, 5):
+            index = PatternIndex(os.path.join(self.tmp_dir.name, f"index_{moving_avg}"), window_size=30,
+                                 window_move=3, moving_avg=moving_avg)
+            self.assertEqual(index.refresh(self.db), 2)
+            for pattern in ([1, 3, 2, 5, 4], [5, 1, 5], [1, 2, 3]):
+                for threshold in (0.5, 2, 5, 20):
+                    for window_move in (3, 6):
+                        for code in self.CODES:
+                            answer, _ = self.capture(code, pattern, threshold, 30, window_move,
+                                                     moving_avg=moving_avg)
+                            captured, stats = self.capture(code, pattern, threshold, 30, window_move, index,
+                                                           moving_avg=moving_avg)
+                            self.assertEqual(captured, answer)
+                            pruned += stats['index_pruned']
+        self.assertGreater(pruned, 0)
+
+    def test_capture_chart_patterns(self):
+        index = PatternIndex(os.path.join(self.tmp_dir.name, 'index'), window_size=30, window_move=3)
+        index.refresh(self.db)
+        patterns = [[1, 3, 2, 5, 4], [5, 1, 5], [1, 2, 3]]
+        for query_index in (None, index):
+            answer = []
+            for pattern, threshold, group in zip(patterns, (3, 0.5, None), ('a', 'b', 'c')):
+                answer.extend(self.capture('005930', pattern, threshold, 30, 3, query_index, group=group)[0])
+            captured = ce.capture_chart_patterns('005930', patterns, self.db, (3, 0.5, None), 30, 3,
+                                                 groups=('a', 'b', 'c'), index=query_index)
+            self.assertEqual(captured, answer)
+        self.assertIn('a', {group for _, _, group in captured})
+        self.assertIs(ce._get_frpat((5, 1, 5), 30), ce._get_frpat((5, 1, 5), 30))
+
+    def test_not_used(self):
+        index = PatternIndex(os.path.join(self.tmp_dir.name, 'index'), window_size=30, window_move=3)
+        index.refresh(self.db)
+        fr_pat = ce._trans_pat_to_frpat([1, 3, 2], 30)
+        update_date = self.dates[799].date()
+        self.assertIsNotNone(index.get_candidates('005930', update_date, [1, 3, 2], fr_pat, 1, 30, 3))
+        self.assertIsNone(index.get_candidates('005930', self.dates[800].date(), [1, 3, 2], fr_pat, 1, 30, 3))
+        self.assertIsNone(index.get_candidates('005930', update_date, [1, 3, 2], fr_pat, 1, 30, 4))
+        self.assertIsNone(index.get_candidates('005930', update_date, [1, 3, 2], fr_pat, 1, 30, 3, price_opt='co'))
+        self.assertIsNone(index.get_candidates('035720', update_date, [1, 3, 2], fr_pat, 1, 30, 3))
+        # words bound frechet distance only
+        answer, _ = self.capture('005930', [1, 3, 2], 0.3, 30, 3, measure='dtw')
+        captured, stats = self.capture('005930', [1, 3, 2], 0.3, 30, 3, index, measure='dtw')
+        self.assertEqual(captured, answer)
+        self.assertEqual(stats['index_pruned'], 0)
+
+    def test_refresh(self):
+        path = os.path.join(self.tmp_dir.name, 'index')
+        PatternIndex(path, window_size=30, window_move=3, moving_avg=5).refresh(self.db)
+        with self.db:
+            self.db.upsert_ohlc_df_into_chart('005930', make_ohlc(0, self.dates).iloc[800:])
+            self.db.update_chart_date_in_meta('005930', self.dates[-1].date())
+            self.db.commit()
+
+        index, = PatternIndex.open_all(self.tmp_dir.name)
+        self.assertEqual(index.params['moving_avg'], 5)
+        self.assertEqual(index.refresh(self.db), 1)
+        self.assertEqual(index.refresh(self.db), 0)
+        rebuilt = PatternIndex(os.path.join(self.tmp_dir.name, 'rebuilt'), window_size=30, window_move=3,
+                               moving_avg=5)
+        rebuilt.refresh(self.db)
+        for code in self.CODES:
+            np.testing.assert_array_equal(index._load_words(code), rebuilt._load_words(code))
+        self.assertEqual(len(index._load_words('005930')), (900 - 30) // 3 + 1)
+
+    def test_refresh_rewritten(self):
+        # whole history is downloaded again with other prices (like adjusted prices after a split)
+        index = PatternIndex(os.path.join(self.tmp_dir.name, 'index'), window_size=30, window_move=3)
+        with self.db:
+            self.db.upsert_ohlc_df_into_chart('005930', make_ohlc(2, self.dates[:800]))
+            self.db.commit()
+        index.refresh(self.db, rebuild=True)
+        with self.db:
+            self.db.upsert_ohlc_df_into_chart('005930', make_ohlc(0, self.dates))
+            self.db.update_chart_date_in_meta('005930', self.dates[-1].date())
+            self.db.commit()
+        self.assertEqual(index.refresh(self.db), 1)
+        rebuilt = PatternIndex(os.path.join(self.tmp_dir.name, 'rebuilt'), window_size=30, window_move=3)
+        rebuilt.refresh(self.db)
+        np.testing.assert_array_equal(index._load_words('005930'), rebuilt._load_words('005930'))
+
+
+if __name__ == '__main__':
+    unittest.main()
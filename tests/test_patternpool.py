@@ -0,0 +1,66 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.patternpool import PatternPool
+from tests.test_patternindex import make_ohlc
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+
+class PatternPoolTestCase(unittest.TestCase):
+    CODES = ('005930', '000660', '035720')
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.DB = make_sqlite_db(os.path.join(cls.TMP_DIR.name, 'stock.db'), 'per_code')
+        dates = pd.bdate_range('2010-01-04', periods=600)
+        with cls.DB:
+            for i, code in enumerate(cls.CODES):
+                cls.DB.create_chart_schema(code)
+                cls.DB.upsert_ohlc_df_into_chart(code, make_ohlc(i, dates[i * 50:]))
+            cls.DB.commit()
+        cls.POOL = PatternPool(cls.DB, cls.CODES, process_count=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.POOL.close()
+        cls.DB._pool.close_all()
+        cls.TMP_DIR.cleanup()
+
+    def test_same_with_capture(self):
+        patterns = [[1, 3, 2, 5, 4], [5, 1, 5], [1, 2, 3]]
+        for kwargs in ({}, {'moving_avg': 5},
+                       {'start_date': datetime.date(2010, 6, 1), 'end_date': datetime.date(2011, 6, 1)},
+                       {'start_date': datetime.date(2010, 6, 1), 'end_date': datetime.date(2011, 6, 1),
+                        'moving_avg': 4, 'min_diff_ratio': 10}, {'measure': 'dtw', 'band': 4}):
+            answer = [ce.capture_chart_patterns(code, patterns, self.DB, (3, 1, None), 30, 3, **kwargs)
+                      for code in self.CODES]
+            stats = {}
+            captured = self.POOL.capture(patterns, thresholds=(3, 1, None), window_size=30, window_move=3,
+                                         stats=stats, **kwargs)
+            self.assertEqual(captured, answer)
+            self.assertGreater(stats['windows'], 0)
+        self.assertTrue(any(answer))
+
+    def test_imap(self):
+        results = dict(self.POOL.imap([[1, 3, 2, 5, 4]], [3], window_size=30, codes=self.CODES[1:], chunksize=1))
+        self.assertEqual(set(results), set(self.CODES[1:]))
+
+    def test_capture_chart_pattern_mp(self):
+        pattern = [1, 3, 2, 5, 4]
+        answer = [ce.capture_chart_pattern(code, pattern, self.DB, 3, 30, group='g') for code in self.CODES]
+        self.assertEqual(ce.capture_chart_pattern_mp(self.DB, self.CODES, pattern, threshold=3, window_size=30,
+                                                     group='g', pool=self.POOL), answer)
+        self.assertEqual(ce.capture_chart_pattern_mp(self.DB, self.CODES, pattern, process_count=1, threshold=3,
+                                                     window_size=30, group='g'), answer)
+        with self.assertRaises(ValueError):
+            ce.capture_chart_pattern_mp(self.DB, self.CODES, pattern, pool=self.POOL, price_opt='co')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.dtw import dtw
+from kostock.frechetdist import frdist
+from kostock.patternscan import scan_chart_pattern, scan_chart_patterns, rolling_extrema, normalize_windows
+
+
+def scan_by_loop(chart, pattern, threshold, window_size, window_move, min_diff_ratio=0, max_diff_ratio=float('inf'),
+                 band=None):
+    # window loop of ChartExtractor.capture_chart_pattern before the compiled scan
+    fr_pat = ce._trans_pat_to_frpat(pattern, window_size)
+    max_pat, min_pat = max(pattern), min(pattern)
+    pat_diff = max_pat - min_pat
+    days = 0
+    captured = []
+    while days < len(chart):
+        part_chart = chart[days:days + window_size]
+        if len(part_chart) < window_size:
+            break
+        max_val, min_val = max(part_chart), min(part_chart)
+        cht_diff = max_val - min_val
+        if min_val == 0 or cht_diff == 0:
+            days += window_move
+            continue
+        cht_diff_ratio = cht_diff / min_val * 100
+        if min_diff_ratio <= cht_diff_ratio <= max_diff_ratio:
+            fr_cht = (part_chart - min_val) * (pat_diff / cht_diff) + min_pat
+            if band is not None:  # dtw
+                distance = dtw(fr_cht, [value for _, value in fr_pat], band)
+            else:
+                distance = frdist([[j, data] for j, data in enumerate(fr_cht)], fr_pat)
+            if distance < threshold:
+                captured.append(days)
+                days += window_size
+                continue
+        days += window_move
+    return captured
+
+
+class PatternScanTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(12)
+        self.chart = pd.Series(10000 * np.exp(np.cumsum(rng.normal(scale=0.02, size=1500))))
+        self.chart[100:130] = 5000  # flat part is skipped
+
+    def test_same_with_loop(self):
+        pattern = [1, 3, 2, 5, 4]
+        for window_size, window_move in ((20, 2), (30, 7), (60, 6)):
+            for threshold in (1, 3, 10):
+                answer = scan_by_loop(self.chart, pattern, threshold, window_size, window_move)
+                starts = scan_chart_pattern(self.chart.to_numpy(), pattern,
+                                            ce._trans_pat_to_frpat(pattern, window_size),
+                                            window_size, window_move, threshold)
+                self.assertEqual(starts.tolist(), answer)
+        self.assertTrue(answer)
+
+    def test_prune(self):
+        pattern = [1, 3, 2, 5, 4]
+        fr_pat = ce._trans_pat_to_frpat(pattern, 30)
+        for threshold in (0, 1, 3, 10, float('inf')):
+            stats, full_stats = {}, {}
+            starts = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, threshold, stats=stats)
+            answer = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, threshold, prune=False,
+                                        stats=full_stats)
+            self.assertEqual(starts.tolist(), answer.tolist())
+            self.assertEqual(stats['windows'], full_stats['windows'])
+            self.assertEqual(stats['windows'], stats['skipped'] + stats['endpoint_pruned']
+                             + stats['envelope_pruned'] + stats['evaluated'])
+            self.assertEqual(full_stats['endpoint_pruned'] + full_stats['envelope_pruned'], 0)
+        self.assertGreater(stats['evaluated'], 0)
+        stats = {}
+        scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, 3, stats=stats)
+        self.assertGreater(stats['endpoint_pruned'] + stats['envelope_pruned'], 0)
+
+    def test_dtw(self):
+        pattern = [1, 3, 2, 5, 4]
+        fr_pat = ce._trans_pat_to_frpat(pattern, 30)
+        for band in (0, 3, 30):
+            for threshold in (0, 0.3, 0.6, float('inf')):
+                answer = scan_by_loop(self.chart, pattern, threshold, 30, 4, band=band)
+                stats, full_stats = {}, {}
+                starts = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, threshold, stats=stats,
+                                            measure='dtw', band=band)
+                full = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, threshold, prune=False,
+                                          stats=full_stats, measure='dtw', band=band)
+                self.assertEqual(starts.tolist(), answer)
+                self.assertEqual(full.tolist(), answer)
+                self.assertEqual(stats['windows'], full_stats['windows'])
+        self.assertTrue(answer)
+        stats = {}
+        scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, 0.3, stats=stats, measure='dtw', band=3)
+        self.assertGreater(stats['endpoint_pruned'], 0)
+        self.assertGreater(stats['envelope_pruned'], 0)
+        with self.assertRaises(ValueError):
+            scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, 1, measure='euclid')
+
+    def test_coarse(self):
+        pattern = [1, 3, 2, 5, 4, 6]
+        fr_pat = ce._trans_pat_to_frpat(pattern, 150)
+        accepted = 0
+        for threshold in (0, 5, 15, 40, float('inf')):
+            answer = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 150, 5, threshold)
+            for coarse in (1, 4, 8):
+                stats = {}
+                starts = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 150, 5, threshold, stats=stats,
+                                            coarse=coarse)
+                self.assertEqual(starts.tolist(), answer.tolist())
+                self.assertEqual(stats['windows'], stats['skipped'] + stats['endpoint_pruned']
+                                 + stats['envelope_pruned'] + stats['coarse_pruned'] + stats['coarse_matched']
+                                 + stats['evaluated'])
+                if coarse == 1:
+                    self.assertEqual(stats['coarse_pruned'] + stats['coarse_matched'], 0)
+                accepted += stats['coarse_matched']
+        self.assertTrue(answer.tolist())
+        self.assertGreater(accepted, 0)
+        with self.assertRaises(ValueError):
+            scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 150, 5, 1, measure='dtw', coarse=4)
+
+    def test_diff_ratio(self):
+        pattern = [1, 2, 3]
+        answer = scan_by_loop(self.chart, pattern, 5, 20, 3, min_diff_ratio=10, max_diff_ratio=30)
+        starts = scan_chart_pattern(self.chart.to_numpy(), pattern, ce._trans_pat_to_frpat(pattern, 20),
+                                    20, 3, 5, min_diff_ratio=10, max_diff_ratio=30)
+        self.assertEqual(starts.tolist(), answer)
+
+    def test_rolling_extrema(self):
+        prices = self.chart.to_numpy()
+        for window_size in (1, 2, 7, 60):
+            windows = [prices[i:i + window_size] for i in range(len(prices) - window_size + 1)]
+            max_vals, min_vals = rolling_extrema(prices, window_size)
+            self.assertEqual(max_vals.tolist(), [max(window) for window in windows])
+            self.assertEqual(min_vals.tolist(), [min(window) for window in windows])
+
+        prices = np.array([np.nan, 3, 1, np.nan, 2, 5])
+        max_vals, min_vals = rolling_extrema(prices, 3)
+        np.testing.assert_array_equal(max_vals, [np.nan, 3, 2, np.nan])
+        np.testing.assert_array_equal(min_vals, [np.nan, 1, 1, np.nan])
+
+    def test_normalize_windows(self):
+        valid, min_vals, scale = normalize_windows(np.array([1., 2, 2, 2, 4]), 2, [0, 10], 0, 60)
+        self.assertEqual(valid.tolist(), [False, False, False, False])
+        valid, min_vals, scale = normalize_windows(np.array([1., 2, 2, 2, 4]), 2, [0, 10], 0, 100)
+        self.assertEqual(valid.tolist(), [True, False, False, True])
+        self.assertEqual(scale[[0, 3]].tolist(), [10, 5])
+
+    def test_multi_patterns(self):
+        patterns = [[1, 3, 2, 5, 4], [5, 1, 5], [1, 2, 3], [10, 1]]
+        thresholds = [3, 0.5, 2, 5]
+        fr_pats = [ce._trans_pat_to_frpat(pattern, 30) for pattern in patterns]
+        stats, one_stats = {}, {}
+        all_starts = scan_chart_patterns(self.chart.to_numpy(), patterns, fr_pats, 30, 4, thresholds, stats=stats)
+        for pattern, fr_pat, threshold, starts in zip(patterns, fr_pats, thresholds, all_starts):
+            answer = scan_chart_pattern(self.chart.to_numpy(), pattern, fr_pat, 30, 4, threshold, stats=one_stats)
+            self.assertEqual(starts.tolist(), answer.tolist())
+        self.assertEqual(stats, one_stats)
+        self.assertEqual(scan_chart_patterns(self.chart.to_numpy(), [], [], 30, 4, []), [])
+
+    def test_short_chart(self):
+        pattern = [1, 2]
+        starts = scan_chart_pattern(np.ones(5), pattern, ce._trans_pat_to_frpat(pattern, 10), 10, 1, 1)
+        self.assertEqual(len(starts), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
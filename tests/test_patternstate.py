@@ -0,0 +1,120 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.patternpool import PatternPool
+from kostock.patternstate import PatternState
+from tests.test_patternindex import make_ohlc
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+PATTERNS = [[1, 3, 2, 5, 4], [5, 1, 5], [1, 2, 3]]
+THRESHOLDS = (3, 1, None)
+
+
+class PatternStateTestCase(unittest.TestCase):
+    CODES = ('005930', '000660')
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = make_sqlite_db(os.path.join(self.tmp_dir.name, 'stock.db'), 'per_code')
+        self.dates = pd.bdate_range('2010-01-04', periods=700)
+        with self.db:
+            self.db.create_meta_schema()
+            for code in self.CODES:
+                self.db.create_chart_schema(code)
+                self.db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+            self.db.commit()
+        self.append(0, 400)
+
+    def tearDown(self) -> None:
+        self.db._pool.close_all()
+        self.tmp_dir.cleanup()
+
+    def append(self, start, end):
+        with self.db:
+            for i, code in enumerate(self.CODES):
+                self.db.upsert_ohlc_df_into_chart(code, make_ohlc(i, self.dates).iloc[start:end])
+                self.db.update_chart_date_in_meta(code, self.dates[end - 1].date())
+            self.db.commit()
+
+    def capture(self, code, state=None, stats=None, **kwargs):
+        return ce.capture_chart_patterns(code, PATTERNS, self.db, THRESHOLDS, 30, 3, groups=('a', 'b', 'c'),
+                                         stats=stats, state=state, **kwargs)
+
+    def test_same_with_full_scan(self):
+        for kwargs in ({}, {'moving_avg': 5}, {'measure': 'dtw', 'min_diff_ratio': 5}):
+            self.tearDown()
+            self.setUp()
+            state = PatternState(os.path.join(self.tmp_dir.name, 'state.json'))
+            captured = {code: self.capture(code, state, **kwargs) for code in self.CODES}
+            for start, end in ((400, 401), (401, 450), (450, 451), (451, 452), (452, 700)):
+                self.append(start, end)
+                state.save()
+                state = PatternState(state.path)
+                stats = {}
+                for code in self.CODES:
+                    captured[code].extend(self.capture(code, state, stats, **kwargs))
+                if end - start == 1:  # windows with the new bar only
+                    self.assertLessEqual(stats.get('windows', 0), len(self.CODES) * len(PATTERNS))
+            for code in self.CODES:
+                key = lambda row: (row[2], row[1])
+                self.assertEqual(sorted(captured[code], key=key), sorted(self.capture(code, **kwargs), key=key))
+            self.assertTrue(any(captured.values()))
+            self.assertEqual(len(state), len(self.CODES) * len(PATTERNS))
+
+    def test_changed_chart(self):
+        state = PatternState()
+        captured = self.capture('005930', state)
+        self.assertEqual(self.capture('005930', state), [])
+        with self.db:  # chart is made again with other dates, the date kept in state is not in it
+            dates = pd.date_range('2010-01-03', periods=500, freq='W')
+            self.db.drop_chart_schema('005930')
+            self.db.create_chart_schema('005930')
+            self.db.upsert_ohlc_df_into_chart('005930', make_ohlc(0, dates))
+            self.db.update_chart_date_in_meta('005930', dates[-1].date())
+            self.db.commit()
+        self.assertEqual(self.capture('005930', state), self.capture('005930'))
+        self.assertTrue(captured)
+
+        state.clear('005930')
+        self.assertEqual(len(state), 0)
+        with self.assertRaises(ValueError):
+            self.capture('005930', state, start_date=self.dates[0].date(), end_date=self.dates[100].date())
+
+
+class PatternPoolStateTestCase(unittest.TestCase):
+    def test_pool_state(self):
+        codes = ('005930', '000660')
+        dates = pd.bdate_range('2010-01-04', periods=500)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_sqlite_db(os.path.join(tmp_dir, 'stock.db'), 'per_code')
+            with db:
+                for i, code in enumerate(codes):
+                    db.create_chart_schema(code)
+                    db.upsert_ohlc_df_into_chart(code, make_ohlc(i, dates[:400]))
+                db.commit()
+            state = PatternState()
+            kwargs = {'thresholds': THRESHOLDS, 'window_size': 30, 'window_move': 3, 'moving_avg': 4}
+            with PatternPool(db, codes) as pool:
+                captured = pool.capture(PATTERNS, state=state, **kwargs)
+            with db:
+                for i, code in enumerate(codes):
+                    db.upsert_ohlc_df_into_chart(code, make_ohlc(i, dates).iloc[400:])
+                db.commit()
+            with PatternPool(db, codes) as pool:
+                stats, full_stats = {}, {}
+                new = pool.capture(PATTERNS, state=state, stats=stats, **kwargs)
+                answer = pool.capture(PATTERNS, stats=full_stats, **kwargs)
+            key = lambda row: (row[2], row[1])
+            for old_rows, new_rows, rows in zip(captured, new, answer):
+                self.assertEqual(sorted(old_rows + new_rows, key=key), sorted(rows, key=key))
+            self.assertLess(stats['windows'], full_stats['windows'] / 2)
+            db._pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,27 @@
 import unittest
+import datetime
+
+import numpy as np
+
+from kostock import qutils
 
 
 class QutilTestCase(unittest.TestCase):
     def test_something(self):
         self.assertEqual(True, False)
 
+    def test_make_future_price_matrix(self):
+        days = np.array([10, 11, 12, 15])
+        closes = np.array([100, 110, 120, 150])
+        entries = [('A', datetime.date(1970, 1, 12)), ('A', datetime.date(1970, 1, 11)),
+                   ('B', datetime.date(1970, 1, 14)), ('A', datetime.date(1970, 1, 14))]
+        matrix = qutils.make_future_price_matrix(entries, lambda code: (days, closes), 2)
+        answer = [[100, 110, 120, 150],
+                  [np.nan] * 4,
+                  [120, 150, np.nan, np.nan],
+                  [120, 150, np.nan, np.nan]]
+        np.testing.assert_array_equal(matrix, answer)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,122 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from kostock.chart_extractor import ChartExtractor as ce
+from kostock.screener import Rule
+from tests.test_stockdb_sqlite import make_sqlite_db
+
+
+def run_length(cond):
+    count, counts = 0, []
+    for value in cond:
+        count = count + 1 if value else 0
+        counts.append(count)
+    return np.array(counts)
+
+
+class ScreenerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        self.close = 1000 + np.cumsum(rng.normal(size=(300, 4)), axis=0) * 10
+        self.inst = rng.integers(-100, 100, size=(300, 4)).astype(np.float64)
+        self.panel = {'close': self.close, 'inst': self.inst}
+        self.present = np.ones(self.close.shape, dtype=np.bool_)
+
+    def evaluate(self, expr):
+        return Rule(expr).evaluate(self.panel, self.present)
+
+    def test_same_with_pandas(self):
+        result = self.evaluate("cross_over(close, ma(close, 5)) and run(inst > 0) >= 2")
+        for j in range(self.close.shape[1]):
+            close = pd.Series(self.close[:, j])
+            ma = close.rolling(5).mean()
+            answer = (close > ma) & (close.shift(1) <= ma.shift(1)) & (run_length(self.inst[:, j] > 0) >= 2)
+            self.assertEqual(result[:, j].tolist(), answer.tolist())
+        self.assertTrue(result.any())
+
+        result = self.evaluate("rmax(close, 3) - rmin(close, 3) > rsum(inst, 4) / 10 or shift(close, 2) < -close")
+        for j in range(self.close.shape[1]):
+            close, inst = pd.Series(self.close[:, j]), pd.Series(self.inst[:, j])
+            answer = (close.rolling(3).max() - close.rolling(3).min() > inst.rolling(4).sum() / 10) \
+                | (close.shift(2) < -close)
+            self.assertEqual(result[:, j].tolist(), answer.tolist())
+
+        result = self.evaluate("990 < close <= 1010 and not cross_under(close, 1000)")
+        answer = (990 < self.close) & (self.close <= 1010) \
+            & ~((self.close < 1000) & (np.vstack([[np.nan] * 4, self.close[:-1]]) >= 1000))
+        self.assertEqual(result.tolist(), answer.tolist())
+
+    def test_missing_rows(self):
+        panel = {'close': np.array([[1.], [np.nan], [2], [3]]), 'inst': np.array([[1.], [np.nan], [1], [-1]])}
+        present = ~np.isnan(panel['close'])
+        rule = Rule("run(inst > 0) == 2")
+        self.assertEqual(rule.evaluate(panel, present)[:, 0].tolist(), [False, False, True, False])
+        self.assertEqual(rule.evaluate(panel, present, start=2)[:, 0].tolist(), [False, False, False, False])
+        self.assertEqual(Rule("ma(close, 2) > 0").evaluate(panel, present)[:, 0].tolist(),
+                         [False, False, False, True])
+
+    def test_common_subexpression(self):
+        rule = Rule("ma(close, 20) > close and ma(close, 20) < 2 * close and cross_over(close, ma(close, 20))")
+        self.assertEqual(sum(name == 'ma' for name, _, _ in rule._steps), 1)
+        self.assertEqual(sum(name == 'col' for name, _, _ in rule._steps), 1)
+        self.assertEqual(rule.columns, ['close'])
+        self.assertEqual(rule.lookback, 20)
+        self.assertEqual(Rule("shift(ma(close, 5), 3) > 0 or inst > 0").lookback, 7)
+
+    def test_invalid_rule(self):
+        for expr in ("close >", "price > 0", "foo(close) > 0", "close + 1", "ma(close, 0) > 0",
+                     "ma(close, inst) > 0", "run(close) > 0", "(close > 0) + 1", "close.real > 0",
+                     "close > 0 and 3", "close in [1]"):
+            with self.assertRaises(ValueError, msg=expr):
+                Rule(expr)
+
+
+class CaptureRuleTestCase(unittest.TestCase):
+    def test_capture_rule(self):
+        rng = np.random.default_rng(9)
+        dates = pd.bdate_range('2015-01-01', periods=200)
+        codes = ('005930', '000660')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_sqlite_db(os.path.join(tmp_dir, 'stock.db'), 'per_code')
+            db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+            with db:
+                db.create_meta_schema()
+                for i, code in enumerate(codes):
+                    index = dates[i * 30:]
+                    close = np.round(1000 + np.cumsum(rng.normal(size=len(index))) * 10)
+                    df = pd.DataFrame({'open': close, 'close': close, 'high': close, 'low': close, 'volume_q': 10,
+                                       'fore': 0, 'inst': rng.integers(-50, 100, size=len(index)), 'indi': 0},
+                                      index=index)
+                    db.create_chart_schema(code)
+                    db.insert_listing_date_into_meta(code, datetime.date(2000, 1, 4))
+                    db.upsert_ohlc_df_into_chart(code, df)
+                    db.upsert_investor_df_into_chart(code, df)
+                    db.update_chart_date_in_meta(code, index[-1].date())
+                db.commit()
+
+            expr = "close > ma(close, 10) and inst > 0"
+            captured = ce.capture_rule(db, expr, 'g')
+            self.assertTrue(captured)
+            self.assertEqual(captured, sorted(captured, key=lambda row: (row[0], row[1])))
+            for code in codes:
+                with db:
+                    chart = pd.DataFrame(list(db.get_all_from_chart(code))).set_index(0)
+                ma = chart[2].rolling(10).mean()
+                answer = [[code, date, 'g'] for date in chart.index[(chart[2] > ma) & (chart[7] > 0)]]
+                self.assertEqual([row for row in captured if row[0] == code], answer)
+
+            start_date, end_date = datetime.date(2015, 3, 2), datetime.date(2015, 6, 1)
+            ranged = ce.capture_rule(db, expr, 'g', start_date, end_date)
+            self.assertEqual(ranged, [row for row in captured if start_date <= row[1] <= end_date])
+            self.assertEqual(ce.capture_rule(db, expr, 'g', codes=['000660']),
+                             [row for row in captured if row[0] == '000660'])
+            db._pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,9 +6,15 @@ from kostock.configurer import Configurer
 
 
 class StockDBTestCase(unittest.TestCase):
-    Configurer("config.json")
-    DB = StockDB()
-    DB.open()
+    # runs against the configured MariaDB, SQLite backend is tested in test_stockdb_sqlite without a server
+    @classmethod
+    def setUpClass(cls) -> None:
+        Configurer("config.json")
+        cls.DB = StockDB()
+        try:
+            cls.DB.open()
+        except Exception as e:  # mysqlclient is not installed or the server is not reachable
+            raise unittest.SkipTest(f"configured DB is not available: {e}")
 
     @classmethod
     def tearDownClass(cls) -> None:
@@ -31,6 +37,10 @@ class StockDBTestCase(unittest.TestCase):
                   )
         self.assertEqual(data, answer)
 
+    def test_get_cross_section_from_chart(self):
+        data = self.db.get_cross_section_from_chart(datetime.date(2000, 1, 4), ('open', 'close'))
+        self.assertIn(('005930', 6000, 6110), data)
+
 
 if __name__ == '__main__':
     unittest.main()
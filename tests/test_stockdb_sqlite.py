@@ -0,0 +1,202 @@
+import unittest
+import datetime
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from kostock._pattern import Singleton
+from kostock.configurer import Configurer
+from kostock.stockdb import StockDB
+
+
+def make_sqlite_db(path, chart_layout):
+    # StockDB is singleton, so new instance is made without touching the configured one
+    config, instance = Configurer.DB, Singleton._instances.pop(StockDB, None)
+    Configurer.DB = {"BACKEND": "sqlite", "SQLITE_PATH": path, "CHART_LAYOUT": chart_layout}
+    try:
+        db = StockDB()
+    finally:
+        Configurer.DB = config
+        Singleton._instances.pop(StockDB, None)
+        if instance is not None:
+            Singleton._instances[StockDB] = instance
+    return db
+
+
+class SQLiteStockDBTestCase(unittest.TestCase):
+    CHART_LAYOUT = 'per_code'
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.TMP_DIR = tempfile.TemporaryDirectory()
+        cls.DB = make_sqlite_db(os.path.join(cls.TMP_DIR.name, 'stock.db'), cls.CHART_LAYOUT)
+        index = pd.to_datetime(['20000104', '20000105', '20000106'], format='%Y%m%d')
+        ohlc = pd.DataFrame(data=[[6000, 6110, 6110, 5660, 74198350],
+                                  [5800, 5580, 6060, 5520, 74680200],
+                                  [5750, 5620, 5780, 5580, 54390550]],
+                            index=index, columns=('open', 'close', 'high', 'low', 'volume_q'))
+        db = cls.DB
+        with db:
+            db.create_meta_schema()
+            db.create_sinfo_schema()
+            db.add_row_into_sinfo('005930', '삼성전자', 'IT', '반도체와반도체장비', '코스피', 5969782550)
+            for code in ('005930', '000660'):
+                db.create_chart_schema(code)
+                db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+                db.upsert_ohlc_df_into_chart(code, ohlc)
+            db.insert_investor_into_chart('005930', datetime.date(2000, 1, 4), 10, -20, 10)
+            db.update_chart_date_in_meta('005930', datetime.date(2000, 1, 6))
+            db.commit()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.DB._pool.close_all()
+        cls.TMP_DIR.cleanup()
+
+    def setUp(self) -> None:
+        self.db = self.__class__.DB
+        self.db.open()
+
+    def tearDown(self) -> None:
+        self.db.close()
+
+    def test_sinfo(self):
+        self.db.add_row_into_sinfo('005930', '삼성전자', 'IT', '반도체와반도체장비', '코스피', 100)
+        self.assertEqual(self.db.get_code_list_from_sinfo(), ['005930'])
+        self.assertEqual(self.db.get_one_from_sinfo('005930')[5], 100)
+        self.assertEqual(self.db.conv_name_to_code('삼성전자'), '005930')
+
+    def test_meta(self):
+        meta = {row[0]: row[1:] for row in self.db.get_chart_from_meta()}
+        self.assertEqual(meta['c_005930'], (datetime.date(2000, 1, 6), datetime.date(1975, 6, 11)))
+        self.assertEqual(meta['c_000660'], (None, datetime.date(1975, 6, 11)))
+
+    def test_get_range_from_chart(self):
+        data = self.db.get_range_from_chart('005930', datetime.date(2000, 1, 2), datetime.date(2000, 1, 5))
+        answer = ((datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 74198350, 10, -20, 10),
+                  (datetime.date(2000, 1, 5), 5800, 5580, 6060, 5520, 74680200, None, None, None),
+                  )
+        self.assertEqual(data, answer)
+
+    def test_get_ohlc_limit_from_chart(self):
+        data = self.db.get_ohlc_prev_from_chart('005930', datetime.date(2000, 1, 5), 2)
+        answer = ((datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 74198350),
+                  (datetime.date(2000, 1, 5), 5800, 5580, 6060, 5520, 74680200),
+                  )
+        self.assertEqual(data, answer)
+
+    def test_get_future_price_list(self):
+        price = self.db.get_future_price_list('005930', datetime.date(2000, 1, 5), 1)
+        self.assertEqual(price, [6110, 5580, 5620])
+        self.assertEqual(self.db.get_recent_stock_price('005930', datetime.date(2000, 1, 9)), 5620)
+
+    def test_date_parameter(self):
+        # datetime and 'YYYY-MM-DD' are same with date
+        answer = self.db.get_one_from_chart('005930', datetime.date(2000, 1, 5))
+        self.assertEqual(self.db.get_one_from_chart('005930', datetime.datetime(2000, 1, 5)), answer)
+        self.assertEqual(self.db.get_future_price_list('005930', datetime.datetime(2000, 1, 5), 1), [6110, 5580, 5620])
+        self.assertEqual(len(self.db.get_range_from_chart('005930', '2000-01-05', '2000-01-06 00:00:00')), 2)
+
+    def test_sqlite3_defaults(self):
+        # dates are converted in the backend cursor, adapters of other sqlite3 users are not changed
+        for func in list(sqlite3.adapters.values()) + list(sqlite3.converters.values()):
+            self.assertEqual(func.__module__, 'sqlite3.dbapi2')
+
+    def test_add_rows_into_sinfo(self):
+        self.db.add_rows_into_sinfo([('000660', 'SK하이닉스', 'IT', '반도체와반도체장비', '코스피', 10),
+                                     ('005930', '삼성전자', 'IT', '반도체와반도체장비', '코스피', 20)])
+        self.assertEqual(sorted(self.db.get_code_list_from_sinfo()), ['000660', '005930'])
+        self.assertEqual(self.db.get_one_from_sinfo('005930')[5], 20)
+        self.db.rollback()
+
+    def test_get_cross_section_from_chart(self):
+        data = self.db.get_cross_section_from_chart(datetime.date(2000, 1, 4), ('open', 'close'))
+        self.assertEqual(data, (('000660', 6000, 6110), ('005930', 6000, 6110)))
+
+    def test_get_table_list(self):
+        self.assertIn('stock_info', self.db.get_table_list())
+
+    def test_no_open_session(self):
+        # a connection is not borrowed (and never released) outside open/close
+        in_use = self.db.get_pool_stats()['in_use']
+        self.db.close()
+        try:
+            with self.assertRaises(RuntimeError):
+                self.db.get_table_list()
+            self.assertEqual(self.db.get_pool_stats()['in_use'], in_use - 1)
+        finally:
+            self.db.open()
+
+
+class SQLiteLongStockDBTestCase(SQLiteStockDBTestCase):
+    CHART_LAYOUT = 'long'
+
+
+class SQLiteMigrationTestCase(unittest.TestCase):
+    def test_migrate_chart_to_long(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'stock.db')
+            per_code, long = make_sqlite_db(path, 'per_code'), make_sqlite_db(path, 'long')
+            with per_code:
+                per_code.create_chart_schema('005930')
+                per_code.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 1)
+                per_code.commit()
+                self.assertEqual(per_code.migrate_chart_to_long(drop_old=True), 1)
+                self.assertEqual(per_code.get_table_list(), ['chart'])
+            with long:
+                self.assertEqual(long.get_all_from_chart('005930'),
+                                 ((datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 1, None, None, None),))
+            per_code._pool.close_all()
+            long._pool.close_all()
+
+
+class SQLiteMarketPanelTestCase(unittest.TestCase):
+    def test_refresh_market_panel(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = make_sqlite_db(os.path.join(tmp_dir, 'stock.db'), 'per_code')
+            db.set_market_panel_path(os.path.join(tmp_dir, 'panel'))
+            with db:
+                db.create_meta_schema()
+                for code in ('005930', '000660'):
+                    db.create_chart_schema(code)
+                    db.insert_listing_date_into_meta(code, datetime.date(1975, 6, 11))
+                db.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 4), 6000, 6110, 6110, 5660, 1)
+                db.insert_ohlc_into_chart('000660', datetime.date(2000, 1, 5), 500, 510, 520, 490, 2)
+                db.update_chart_date_in_meta('005930', datetime.date(2000, 1, 4))
+                db.commit()
+
+                self.assertFalse(db.has_market_panel())
+                dates, codes, panel = db.get_market_panel(('close', 'fore'))
+                self.assertTrue(db.has_market_panel())
+                self.assertEqual(dates.tolist(), [datetime.date(2000, 1, 4), datetime.date(2000, 1, 5)])
+                self.assertEqual(codes.tolist(), ['000660', '005930'])
+                self.assertEqual(panel['close'].dtype, 'float32')
+                np.testing.assert_array_equal(panel['close'], [[np.nan, 6110], [510, np.nan]])
+                np.testing.assert_array_equal(panel['fore'], [[np.nan, np.nan], [np.nan, np.nan]])
+                self.assertEqual(db.refresh_market_panel(), 0)
+
+                db.insert_ohlc_into_chart('005930', datetime.date(2000, 1, 6), 6100, 6200, 6300, 6000, 3)
+                db.update_chart_date_in_meta('005930', datetime.date(2000, 1, 6))
+                db.commit()
+                self.assertEqual(db.refresh_market_panel(), 1)
+                dates, codes, panel = db.get_market_panel(('close',), start_date=datetime.date(2000, 1, 5))
+                self.assertEqual(dates.tolist(), [datetime.date(2000, 1, 5), datetime.date(2000, 1, 6)])
+                np.testing.assert_array_equal(panel['close'], [[510, np.nan], [np.nan, 6200]])
+
+                # history downloaded again with adjusted prices is read entirely
+                for day, price in ((4, 1222), (6, 1240), (7, 1250)):
+                    db.insert_ohlc_into_chart('005930', datetime.date(2000, 1, day), price, price, price, price, 3)
+                db.update_chart_date_in_meta('005930', datetime.date(2000, 1, 7))
+                db.commit()
+                self.assertEqual(db.refresh_market_panel(), 1)
+                dates, codes, panel = db.get_market_panel(('close',))
+                self.assertEqual(len(dates), 4)
+                np.testing.assert_array_equal(panel['close'][:, 1], [1222, np.nan, 1240, 1250])
+            db._pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ from tests.test_backtester import BackTesterTestCase
 
 def suite():
     suite = unittest.TestSuite()
-    suite.addTest()
+    suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(BackTesterTestCase))
     print(suite)
     return suite
 